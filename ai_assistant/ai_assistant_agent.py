@@ -1,4 +1,5 @@
 import argparse
+import asyncio
 import time
 from fastapi import FastAPI, BackgroundTasks, Request
 from fastapi.responses import StreamingResponse
@@ -42,9 +43,14 @@ def create_agent(config: AppConfig) -> FastAPI:
         # Initialize the AI Assistant and store it in the application state
         app.state.ai_assistant = AiAssistant(
             inference_model_name=config.inference_model_name,
-            db_ip_address=config.db_ip_address
+            db_ip_address=config.db_ip_address,
+            collections_cache_ttl=config.collections_cache_ttl,
+            load_subsystems=False
         )
-        print("Ai Assistant agent is ready!")
+        # Subsystems load in the background, so the API answers right away and reports them in /ai_assistant/readiness
+        threading.Thread(
+            target=app.state.ai_assistant.load_subsystems, name="subsystems_loader", daemon=True).start()
+        print("Ai Assistant agent is up, loading its subsystems...")
 
         yield
 
@@ -82,6 +88,17 @@ def create_agent(config: AppConfig) -> FastAPI:
     # endregion
     # region AI Assistant gets
 
+    @app.get("/ai_assistant/readiness")
+    def get_readiness() -> dict:
+        """
+        Returns which subsystems of the AI assistant are loaded. The agent is ready for inferences once the
+        LLM is loaded, the database and the web extractor are used as soon as they are loaded as well.
+
+        Returns:
+            dict: Whether the agent is ready, the state of each subsystem and the current status.
+        """
+        return app.state.ai_assistant.get_readiness()
+
     @app.get("/ai_assistant/status")
     def get_status() -> dict:
         """
@@ -92,6 +109,40 @@ def create_agent(config: AppConfig) -> FastAPI:
         """
         return {"status": app.state.ai_assistant.get_assistant_status()}
 
+    @app.get("/ai_assistant/status/stream")
+    def get_status_stream(interval: float = 0.5, heartbeat: float = 15.0) -> StreamingResponse:
+        """
+        Pushes the status of the AI assistant as JSON lines every time it changes, so clients
+        do not need to poll the status endpoint.
+
+        Args:
+            interval (float, optional): Seconds between two reads of the status. Defaults to 0.5.
+            heartbeat (float, optional): Seconds after which the status is sent again even if it did not
+                change, so clients can detect a dead connection. Defaults to 15.0.
+
+        Returns:
+            StreamingResponse: Streamed status updates as JSON lines.
+        """
+        async def generate_status_stream():
+            """
+            Async generator yielding the status on change and on every heartbeat.
+            """
+            last_status = None
+            last_sent_at = 0.0
+            while True:
+                assistant_status = app.state.ai_assistant.get_assistant_status()
+                now = time.monotonic()
+                if assistant_status != last_status or now - last_sent_at >= heartbeat:
+                    yield json.dumps({"type": "status", "status": assistant_status}) + "\n"
+                    last_status = assistant_status
+                    last_sent_at = now
+                await asyncio.sleep(interval)
+
+        return StreamingResponse(
+            generate_status_stream(),
+            media_type="application/x-ndjson"
+        )
+
     @app.get("/ai_assistant/collections")
     def get_collections() -> dict:
         """
@@ -136,11 +187,23 @@ def create_agent(config: AppConfig) -> FastAPI:
         job_data = app.state.job_store.get(job_id)
         if not job_data:
             return {"error": "Job ID not found"}
-        return {"response": job_data.get("response"), "status_message": app.state.ai_assistant.get_assistant_status(), "status": job_data.get("status")}
+        return {"response": job_data.get("response"), "status_message": app.state.ai_assistant.get_assistant_status(), "status": job_data.get("status"),
+                "conversation_summary": job_data.get("conversation_summary"), "summary_version": job_data.get("summary_version")}
 
     # endregion
     # region AI Assistant posts
 
+    @app.post("/ai_assistant/collections/invalidate")
+    def invalidate_collections() -> dict:
+        """
+        Drops the cached collection list, called when collections are added or removed from the database.
+
+        Returns:
+            dict: A confirmation message.
+        """
+        app.state.ai_assistant.invalidate_collections_cache()
+        return {"message": "Collections cache invalidated"}
+
     @app.post("/ai_assistant/inference")
     def run_inference(payload: AiAssistantInferenceRequest, background_tasks: BackgroundTasks, request_obj: Request) -> dict:
         """
@@ -188,6 +251,8 @@ def create_agent(config: AppConfig) -> FastAPI:
             inference_thread.start()
             # List to store response chunks
             response_chunks = []
+            # Context used by this request, sent with the end message
+            context_string = ""
             while True:
                 try:
                     # Wait up to 2 seconds for a chunk
@@ -195,6 +260,7 @@ def create_agent(config: AppConfig) -> FastAPI:
                     assistant_status = app.state.ai_assistant.get_assistant_status()
                     # Check what to do based on the message type
                     if msg["type"] == "end":
+                        context_string = msg.get("context_string", "")
                         status_data = {
                             "type": "status",
                             "status": msg.get("data", assistant_status),
@@ -237,18 +303,23 @@ def create_agent(config: AppConfig) -> FastAPI:
             inference_thread.join()
             # Start thread to update conversation history summary without blocking the main thread
             full_response = "".join(response_chunks)
+            # The updated summary of this session is sent in the final message, so clients do not read the
+            # assistant summary back while another session may be replacing it
+            summary_result = {}
             history_thread = threading.Thread(target=history_update_worker, kwargs={
                 "user_query": payload.query,
-                "context_string": app.state.ai_assistant.get_context_string(),
-                "assistant_response": full_response
+                "context_string": context_string,
+                "assistant_response": full_response,
+                "summary": payload.conversation_summary,
+                "result": summary_result
             })
             history_thread.start()
-            assistant_status = app.state.ai_assistant.get_assistant_status()
             while history_thread.is_alive():
-                # While waiting for the history update to finish, we can yield keep-alive status updates
+                # While waiting for the history update to finish, we can yield keep-alive status updates.
+                # The status is read every time, clients trust it instead of asking for it.
                 keep_alive_data = {
                     "type": "status",
-                    "status": assistant_status
+                    "status": app.state.ai_assistant.get_assistant_status()
                 }
                 yield json.dumps(keep_alive_data) + "\n"
                 time.sleep(2)
@@ -257,7 +328,10 @@ def create_agent(config: AppConfig) -> FastAPI:
             final_data = {
                 "type": "complete",
                 "data": full_response,
-                "status": app.state.ai_assistant.get_assistant_status()
+                "status": app.state.ai_assistant.get_assistant_status(),
+                # The session keeps its previous summary if the update failed
+                "conversation_summary": summary_result.get("conversation_summary", payload.conversation_summary),
+                "summary_version": summary_result.get("summary_version")
             }
             yield json.dumps(final_data) + "\n"
 
@@ -278,19 +352,22 @@ def create_agent(config: AppConfig) -> FastAPI:
             queue (queue.Queue): Queue to put inference results into
         """
         try:
+            # Requests may arrive while the subsystems load, the LLM is the only one they need
+            if not app.state.ai_assistant.wait_for_subsystem("llm"):
+                raise RuntimeError("The inference model could not be loaded")
             # Treat the requested model and switch if it's different from the current one
             requested_model_name = inference_payload.inference_model_name
             if requested_model_name != app.state.ai_assistant.get_inference_model_name():
                 app.state.ai_assistant.switch_assistant_model(
                     inference_model_name=requested_model_name)
-            # Set the conversation history for the user session
-            app.state.ai_assistant.set_assistant_conversation_summary(
-                summary=inference_payload.conversation_summary
-            )
-            # Stream inference chunks
+            # Stream inference chunks, the prompt uses the conversation history of this session
             for response_chunk in app.state.ai_assistant.run_inference_pipeline(
                     user_query=inference_payload.query,
-                    collection_name=inference_payload.collection_name):
+                    collection_name=inference_payload.collection_name,
+                    document_names=inference_payload.document_names,
+                    first_page=inference_payload.first_page,
+                    last_page=inference_payload.last_page,
+                    history_summary=inference_payload.conversation_summary):
                 if response_chunk == "[END_OF_RESPONSE]":
                     queue.put({"type": "end"})
                 elif isinstance(response_chunk, dict):
@@ -300,7 +377,8 @@ def create_agent(config: AppConfig) -> FastAPI:
         except Exception as e:
             queue.put({"type": "error", "error": str(e)})
 
-    def history_update_worker(user_query: str, context_string: str, assistant_response: str) -> None:
+    def history_update_worker(user_query: str, context_string: str, assistant_response: str, summary: str,
+                              result: dict) -> None:
         """
         Worker to update the agent conversation history in a separate thread
 
@@ -308,13 +386,18 @@ def create_agent(config: AppConfig) -> FastAPI:
             user_query (str): The user's query that was sent for inference
             context_string (str): The context string that was used for the inference
             assistant_response (str): The response generated by the assistant for the given query and context
+            summary (str): The conversation summary of the session before this interaction
+            result (dict): Receives the updated "conversation_summary" and its "summary_version"
         """
         try:
-            app.state.ai_assistant.update_conversation_history_summary(
+            conversation_summary, summary_version = app.state.ai_assistant.update_conversation_history_summary(
                 user_query=user_query,
                 context_string=context_string,
                 assistant_response=assistant_response,
+                summary=summary,
             )
+            result["conversation_summary"] = conversation_summary
+            result["summary_version"] = summary_version
         except Exception as e:
             print(
                 f"Error updating conversation history summary: {str(e)}")
@@ -329,31 +412,41 @@ def create_agent(config: AppConfig) -> FastAPI:
             app (FastAPI): The FastAPI application instance to access the job store and AI assistant
         """
         try:
+            # Requests may arrive while the subsystems load, the LLM is the only one they need
+            if not app.state.ai_assistant.wait_for_subsystem("llm"):
+                raise RuntimeError("The inference model could not be loaded")
             # Treat the requested model and switch if it's different from the current one
             requested_model_name = inferece_payload.inference_model_name
             if requested_model_name != app.state.ai_assistant.get_inference_model_name():
                 app.state.ai_assistant.switch_assistant_model(
                     inference_model_name=requested_model_name)
-            # Set the conversation history for the user session
-            app.state.ai_assistant.set_assistant_conversation_summary(
-                summary=inferece_payload.conversation_summary
-            )
             response_chunks = []
+            context_string = ""
+            # The prompt uses the conversation history of this session
             for response_chunk in app.state.ai_assistant.run_inference_pipeline(
                 user_query=inferece_payload.query,
                 collection_name=inferece_payload.collection_name,
+                document_names=inferece_payload.document_names,
+                first_page=inferece_payload.first_page,
+                last_page=inferece_payload.last_page,
+                history_summary=inferece_payload.conversation_summary,
             ):
-                # Skip the end-of-response marker
-                if response_chunk != "[END_OF_RESPONSE]":
-                    response_chunks.append(response_chunk)
+                # Keep the text chunks and the context of the end event, skip the status updates
+                if response_chunk["type"] == "chunk":
+                    response_chunks.append(response_chunk["data"])
+                elif response_chunk["type"] == "end":
+                    context_string = response_chunk["context_string"]
 
             response = "".join(response_chunks)
-            app.state.ai_assistant.update_conversation_history_summary(
+            conversation_summary, summary_version = app.state.ai_assistant.update_conversation_history_summary(
                 user_query=inferece_payload.query,
-                context_string=app.state.ai_assistant.get_context_string(),
+                context_string=context_string,
                 assistant_response=response,
+                summary=inferece_payload.conversation_summary,
             )
             app.state.job_store[job_id]["response"] = response
+            app.state.job_store[job_id]["conversation_summary"] = conversation_summary
+            app.state.job_store[job_id]["summary_version"] = summary_version
             app.state.job_store[job_id]["status_message"] = app.state.ai_assistant.get_assistant_status(
             )
             app.state.job_store[job_id]["status"] = "completed"
@@ -377,13 +470,16 @@ def main():
     parser.add_argument("--db_ip_address", type=str, default="localhost")
     parser.add_argument("--inference_model_name",
                         type=str, default="gemma4:latest")
+    parser.add_argument("--collections_cache_ttl", type=float, default=30.0,
+                        help="Seconds the collection list is cached (default: 30)")
     args = parser.parse_args()
     # Create the application configuration and run the API server
     config = AppConfig(
         db_ip_address=args.db_ip_address,
         inference_model_name=args.inference_model_name,
         host=args.host,
-        port=args.port
+        port=args.port,
+        collections_cache_ttl=args.collections_cache_ttl
     )
     app = create_agent(config)
     uvicorn.run(app, host=args.host, port=args.port, log_level="info")
@@ -36,6 +36,29 @@ def wait_for_api(timeout: int = 30) -> None:
     sys.exit(1)
 
 
+def wait_for_subsystems(timeout: int = 300) -> None:
+    """
+    Wait until the agent is done loading its subsystems
+
+    Args:
+        timeout (int, optional): Time to wait for the subsystems. Defaults to 300.
+    """
+    print("Testing GET /ai_assistant/readiness")
+    start = time.time()
+    while time.time() - start < timeout:
+        response = httpx.get(f"{BASE_URL}/ai_assistant/readiness", timeout=2)
+        assert response.status_code == 200
+        subsystems = response.json()["subsystems"]
+        if all(state in ("ready", "failed") for state in subsystems.values()):
+            print("Response:", response.json(), "\n")
+            assert response.json()["ready"]
+            return
+        time.sleep(1)
+
+    print("ERROR: subsystems did not load in time")
+    sys.exit(1)
+
+
 def test_root():
     """Test the root endpoint of the API."""
     print("Testing GET root endpoint")
@@ -198,6 +221,7 @@ def main():
 
     # Run the tests
     wait_for_api()
+    wait_for_subsystems()
     test_root()
     test_status()
     test_collections()
@@ -4,40 +4,55 @@ from httpx import ConnectError, ConnectTimeout
 import chromadb
 from chromadb.utils import embedding_functions
 from chromadb.config import Settings
-from typing import Dict, Any, List, Generator
+from typing import Dict, Any, List, Generator, Optional, Tuple
+import itertools
 import subprocess
-from time import sleep
+import threading
+from time import monotonic, sleep
 import requests
-from modules.web_content_extractor import WebContentExtractor
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from modules.web_content_extractor import WebContentExtractor, WEB_REFERENCES_COLLECTION
+
+# Model used for the query improvement and the history summary
+INTERNAL_PROCESS_MODEL = "gemma4:latest"
+# Subsystems in loading order. Inferences only need the LLM, the others are used when loaded
+SUBSYSTEMS = ("llm", "database", "web")
 
 
 class AiAssistant:
     # region Initialization and Setup
-    def __init__(self, inference_model_name: str, db_ip_address: str = "localhost") -> None:
+    def __init__(self, inference_model_name: str, db_ip_address: str = "localhost",
+                 collections_cache_ttl: float = 30.0, load_subsystems: bool = True) -> None:
         """
         Initializes the AI Assistant with the specified models and database path.
 
         Args:
             inference_model_name (str): The name of the Ollama inference model to use.
             db_ip_address (str): The IP address of the ChromaDB server. Defaults to "localhost".
+            collections_cache_ttl (float): Seconds the collection list is served from memory before the
+                database is asked again. Defaults to 30.0.
+            load_subsystems (bool): Load the LLM, the database and the web extractor right away. When False,
+                call load_subsystems() later, e.g. from a background thread. Defaults to True.
         """
         self.inference_model_name = inference_model_name
         self.db_ip_address = db_ip_address
-        self.ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="Qwen/Qwen3-Embedding-0.6B",
-            device="cpu"
-        )
+        # Collection list cache, as (monotonic expiry, collections state)
+        self.collections_cache_ttl = collections_cache_ttl
+        self._collections_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+        self._collections_cache_lock = threading.Lock()
         self.status = "Iniciando o assistente de IA..."
-
-        # Connect to the ChromaDB server
-        print("Connecting to ChromaDB server...")
-        self.db_client = self._connect_to_chromadb()
-
-        # This assumes you have the model pulled and Ollama is running
-        self.expected_llm_models = self.get_available_ollama_models()
-        self.set_assistant_model(
-            inference_model_name=self.inference_model_name)
-        self.internal_process_llm = ChatOllama(model="gemma4:latest")
+        # Loading state of each subsystem (pending, loading, ready or failed), and an event set once it is done
+        self.subsystems_state = {name: "pending" for name in SUBSYSTEMS}
+        self._subsystems_loaded = {name: threading.Event() for name in SUBSYSTEMS}
+        # Filled by the subsystem loaders
+        self.expected_llm_models: List[str] = []
+        self.llm = None
+        self.ef = None
+        self.db_client = None
+        self.web_extractor = None
+        self.url_executor = None
+
+        self.internal_process_llm = ChatOllama(model=INTERNAL_PROCESS_MODEL)
         # Dealing with history of conversation
         HISTORY_SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
             (
@@ -60,6 +75,9 @@ class AiAssistant:
         ])
         self.history_summarizer = HISTORY_SUMMARY_PROMPT | self.internal_process_llm
         self.history_summary = ""
+        # Incremented on every summary update, returned with the summary so clients can order them
+        self.history_summary_version = 0
+        self._history_summary_versions = itertools.count(1)
         self.last_context_string = ""
         # Query improvement stage
         QUERY_IMPROVEMENT_PROMPT = ChatPromptTemplate.from_messages([
@@ -102,11 +120,111 @@ class AiAssistant:
         ])
         # Chunk parameters
         self.n_chunks = 3
-        # URL and Web content extractor
-        self.web_extractor = WebContentExtractor(device="cpu")
-        # Assistant status string for agent analysis
+        if load_subsystems:
+            self.load_subsystems()
+
+    def load_subsystems(self) -> None:
+        """
+        Loads the subsystems in order: the LLM, then the database connection, then the web content extractor.
+        Inferences can run as soon as the LLM is loaded, a subsystem that fails to load is skipped.
+        """
+        loaders = {
+            "llm": self._load_llm,
+            "database": self._load_database,
+            "web": self._load_web,
+        }
+        for name in SUBSYSTEMS:
+            self.subsystems_state[name] = "loading"
+            try:
+                loaders[name]()
+                self.subsystems_state[name] = "ready"
+            except Exception as e:
+                print(f"Failed to load the {name} subsystem: {e}")
+                self.subsystems_state[name] = "failed"
+            finally:
+                self._subsystems_loaded[name].set()
+        print(f"AI Assistant initialized: {self.subsystems_state}")
+
+    def _load_llm(self) -> None:
+        """Selects the inference model among the Ollama ones and loads the models in memory."""
+        self.status = "Carregando o modelo de linguagem."
+        # This assumes you have the model pulled and Ollama is running
+        self.expected_llm_models = self.get_available_ollama_models()
+        self.set_assistant_model(
+            inference_model_name=self.inference_model_name)
+        for model_name in dict.fromkeys([self.inference_model_name, INTERNAL_PROCESS_MODEL]):
+            self.preload_ollama_model(model_name)
+        # Assistant status string for agent analysis. The next subsystems load while inferences run,
+        # so they leave the status to them
         self.status = "Assistente inicializado e pronto para processar mensagens."
-        print("AI Assistant initialized successfully.")
+
+    def _load_database(self) -> None:
+        """Loads the embedding model and connects to the ChromaDB server."""
+        self.ef = embedding_functions.SentenceTransformerEmbeddingFunction(
+            model_name="Qwen/Qwen3-Embedding-0.6B",
+            device="cpu"
+        )
+        # Connect to the ChromaDB server
+        print("Connecting to ChromaDB server...")
+        self.db_client = self._connect_to_chromadb()
+        if self.db_client is None:
+            raise ConnectionError(f"ChromaDB unreachable at {self.db_ip_address}:8000")
+
+    def _load_web(self) -> None:
+        """Loads the URL and web content extractor."""
+        self.web_extractor = WebContentExtractor(device="cpu")
+        self.url_executor = ThreadPoolExecutor(
+            max_workers=4, thread_name_prefix="url_context")
+
+    def wait_for_subsystem(self, name: str, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until a subsystem is done loading.
+
+        Args:
+            name (str): The subsystem name (llm, database or web).
+            timeout (Optional[float]): Seconds to wait at most. Defaults to None, waiting as long as it takes.
+
+        Returns:
+            bool: Whether the subsystem loaded successfully.
+        """
+        self._subsystems_loaded[name].wait(timeout)
+        return self.subsystems_state[name] == "ready"
+
+    def get_readiness(self) -> Dict[str, Any]:
+        """
+        Returns the loading state of each subsystem. The assistant is ready once the LLM is loaded, the
+        database and the web extractor are used as soon as they are loaded as well.
+
+        Returns:
+            Dict[str, Any]: Whether inferences can run, the state of each subsystem and the assistant status.
+        """
+        return {
+            "ready": self.subsystems_state["llm"] == "ready",
+            "subsystems": dict(self.subsystems_state),
+            "status": self.status,
+        }
+
+    def preload_ollama_model(self, model_name: str, base_url: str = "http://127.0.0.1:11434",
+                             timeout: int = 300) -> None:
+        """
+        Loads an Ollama model in memory, so the first inference does not wait for it.
+
+        Args:
+            model_name (str): The Ollama model name.
+            base_url (str): The base URL of the Ollama API.
+            timeout (int): The request timeout in seconds.
+        """
+        try:
+            # A generate request without prompt only loads the model
+            r = requests.post(
+                f"{base_url}/api/generate",
+                json={"model": model_name},
+                timeout=timeout
+            )
+            r.raise_for_status()
+            print(f"Model {model_name} loaded in memory.")
+        except requests.RequestException as e:
+            print(f"Failed to preload model {model_name}: {e}")
 
     def _connect_to_chromadb(self) -> chromadb.api.client.Client:
         """
@@ -186,9 +304,11 @@ class AiAssistant:
 
     def close_assistant(self) -> None:
         """Closes the assistant and performs any necessary cleanup, especially in the models."""
+        if self.url_executor is not None:
+            self.url_executor.shutdown(wait=False, cancel_futures=True)
         subprocess.run(["ollama", "stop", self.inference_model_name])
-        if self.inference_model_name != "gemma4:latest":
-            subprocess.run(["ollama", "stop", "gemma4:latest"])
+        if self.inference_model_name != INTERNAL_PROCESS_MODEL:
+            subprocess.run(["ollama", "stop", INTERNAL_PROCESS_MODEL])
         print("Assistant closed and resources cleaned up.")
 
     def get_available_ollama_models(self, base_url: str = "http://127.0.0.1:11434", timeout: int = 5) -> List[str]:
@@ -234,18 +354,26 @@ class AiAssistant:
 
     def get_collections_state(self) -> Dict[str, Any]:
         """
-        Returns the current collection list together with its readiness state.
+        Returns the current collection list together with its readiness state. The list is cached for
+        collections_cache_ttl seconds, failures are not cached.
 
         Returns:
             Dict[str, Any]: Current collection names and whether the database is ready.
         """
+        with self._collections_cache_lock:
+            if self._collections_cache is not None and monotonic() < self._collections_cache[0]:
+                return dict(self._collections_cache[1])
         if self.db_client is not None:
             try:
                 collections = self.db_client.list_collections()
-                return {
+                collections_state = {
                     "collection_names": [col.name for col in collections],
                     "ready": True,
                 }
+                with self._collections_cache_lock:
+                    self._collections_cache = (
+                        monotonic() + self.collections_cache_ttl, collections_state)
+                return dict(collections_state)
             except Exception as e:
                 print(f"Error retrieving collections from the database: {e}")
                 return {"collection_names": [], "ready": False}
@@ -253,6 +381,11 @@ class AiAssistant:
             print("Database client is not initialized.")
             return {"collection_names": [], "ready": False}
 
+    def invalidate_collections_cache(self) -> None:
+        """Drops the cached collection list, so the next call reads it from the database."""
+        with self._collections_cache_lock:
+            self._collections_cache = None
+
     def get_inference_model_name(self) -> str:
         """
         Returns the name of the current inference model being used by the assistant.
@@ -274,44 +407,128 @@ class AiAssistant:
 # endregion
 # region webbased methods
 
-    def find_context_from_urls(self, urls: list, query: str, top_k: int = 5) -> str:
+    def find_context_from_urls(self, urls: list, query: str, top_k: int = 5, deadline: Optional[float] = None) -> str:
         """
-        Uses the web content extractor to find relevant context from predefined URLs.
+        Uses the web content extractor to find relevant context from predefined URLs. URLs already
+        indexed in the web references collection of the database are searched locally, the others are
+        fetched, chunked, embedded and searched in parallel, and the best passages across all URLs are
+        formatted as context chunks. The fetch is a single streamed GET, unreachable URLs and unsupported
+        content fail there and are skipped.
 
         Args:
             urls (list): A list of URLs to extract content from.
             query (str): The user's input query.
-            top_k (int): The number of top relevant sections to retrieve. Default is 5.
+            top_k (int): The number of top relevant passages to retrieve across all URLs. Default is 5.
+            deadline (Optional[float]): Monotonic deadline shared by all the URLs. Defaults to None.
 
         Returns:
-            str: The combined text of the most similar chunks from all URLs.
-        """
-        results = []
-        for url in urls:
-            content = self.web_extractor.query_content_from_url(
-                url=url, query=query, top_k=top_k)
+            str: The formatted context chunks of the most similar passages from all URLs.
+        """
+        urls = list(dict.fromkeys(urls))
+        # The query embedding is shared by every URL search
+        query_embeddings = self.web_extractor.ebf([query])
+        # Prefetched URLs do not need the network at all
+        passages, prefetched_urls = self._search_prefetched_urls(
+            urls, query_embeddings, top_k)
+        remote_urls = [url for url in urls if url not in prefetched_urls]
+        if prefetched_urls:
+            print(f"Using the local index for {len(prefetched_urls)} prefetched URLs.")
+        futures = {
+            self.url_executor.submit(
+                self.web_extractor.search_content_from_url,
+                url=url, query=query, top_k=top_k, deadline=deadline, query_embeddings=query_embeddings
+            ): url
+            for url in remote_urls
+        }
+        pending = set(futures)
+        try:
+            # Stop waiting at the deadline even if a fetch is stuck past its timeouts
+            timeout = None if deadline is None else max(0.0, deadline - monotonic())
+            for future in as_completed(futures, timeout=timeout):
+                pending.discard(future)
+                # A slow or dead host must not fail the whole query, so skip the URL
+                try:
+                    passages.extend(future.result())
+                except Exception as e:
+                    print(f"Skipping URL {futures[future]}: {e}")
+        except FuturesTimeoutError:
+            for future in pending:
+                future.cancel()
+                print(f"Skipping URL {futures[future]}: deadline exceeded")
+        # Keep the global top_k across all URLs
+        passages.sort(key=lambda passage: passage["distance"])
+        formatted_context_chunks = [
             self.document_prompt.format(
-                page_content=content,
-                source=url,
+                page_content=passage["content"],
+                source=passage["source"],
                 page="N/A",
             )
-            results.append({
-                "url": url,
-                "content": content
-            })
-        combined_text = "\n\n".join([item["content"] for item in results])
-        return combined_text
+            for passage in passages[:top_k]
+        ]
+        return "\n".join(formatted_context_chunks)
+
+    def _search_prefetched_urls(self, urls: list, query_embeddings: List, top_k: int) -> tuple:
+        """
+        Searches the URLs that were prefetched into the web references collection of the database.
+
+        Args:
+            urls (list): The URLs referenced by the query.
+            query_embeddings (List): The query embedding.
+            top_k (int): The number of top relevant passages to retrieve.
+
+        Returns:
+            tuple: The list of passages found and the set of URLs served from the local index.
+        """
+        if self.db_client is None or not urls:
+            return [], set()
+        try:
+            collection = self.db_client.get_collection(
+                name=WEB_REFERENCES_COLLECTION)
+            prefetched_urls = {
+                url for url in urls
+                if collection.get(where={"source": url}, limit=1, include=[])["ids"]
+            }
+            if not prefetched_urls:
+                return [], set()
+            where = {"source": next(iter(prefetched_urls))} if len(prefetched_urls) == 1 else {
+                "source": {"$in": list(prefetched_urls)}}
+            results = collection.query(
+                query_embeddings=query_embeddings,
+                n_results=top_k,
+                where=where,
+            )
+        except Exception as e:
+            print(f"Prefetched web references unavailable: {e}")
+            return [], set()
+        passages = [
+            {
+                "content": document,
+                "source": metadata.get("source", "unknown"),
+                "heading": metadata.get("heading", ""),
+                "distance": distance,
+            }
+            for document, metadata, distance in zip(
+                results["documents"][0], results["metadatas"][0], results["distances"][0])
+        ]
+        return passages, prefetched_urls
 
 # endregion
 # region Inference related methods
 
-    def build_rag_prompt(self, query: str, collection_name: str) -> Dict[str, Any]:
+    def build_rag_prompt(self, query: str, collection_name: str, document_names: Optional[List[str]] = None,
+                         first_page: Optional[int] = None, last_page: Optional[int] = None,
+                         history_summary: Optional[str] = None) -> Dict[str, Any]:
         """
         Retrieves documents from the vectorstore and builds the final RAG prompt.
 
         Args:
             query (str): The user's input query.
             collection_name (str): The name of the collection to use ('documents' or 'none').
+            document_names (Optional[List[str]]): Only search the chunks of these documents. Defaults to None.
+            first_page (Optional[int]): Only search the chunks ending at or after this page. Defaults to None.
+            last_page (Optional[int]): Only search the chunks starting at or before this page. Defaults to None.
+            history_summary (Optional[str]): Conversation summary of the session asking. Defaults to None,
+                using the last summary set in the assistant, which another session may have replaced.
 
         Returns:
             Dict[str, Any]: Contains the final prompt string, retrieved docs, and context string.
@@ -339,6 +556,8 @@ class AiAssistant:
                 results = collection.query(
                     query_texts=[improved_query],
                     n_results=self.n_chunks,
+                    where=self._build_where_filter(
+                        document_names, first_page, last_page),
                 )
                 formatted_context_chunks = [
                     self.document_prompt.format(
@@ -354,20 +573,27 @@ class AiAssistant:
                 self.status = "Base de dados inacessível. Não foi possível recuperar documentos."
 
         # Check if we have URLs to extract context from and add to context
-        urls = self.web_extractor.extract_and_validate_urls(text=query)
+        if self.web_extractor is None:
+            print("Web content extractor not loaded yet, URLs in the query are not used.")
+            urls = []
+        else:
+            urls = self.web_extractor.find_urls(text=query)
         if urls:
             print(
                 f"Found URLs in the query. Extracting relevant context from the web for {len(urls)} URLs...")
             self.status = "Extraindo contexto relevante das URLs fornecidas."
             url_context = self.find_context_from_urls(
-                urls, query, top_k=self.n_chunks)
-            context_string = "\n".join([context_string, url_context])
+                urls, query, top_k=self.n_chunks, deadline=self.web_extractor.new_deadline())
+            context_string = "\n".join(
+                part for part in [context_string, url_context] if part)
 
         # Fill the RAG prompt
         print("Filling the RAG prompt with retrieved context and conversation history...")
         self.status = "Preenchendo o prompt RAG final."
+        if history_summary is None:
+            history_summary = self.history_summary
         final_prompt_value = self.rag_prompt.format_prompt(
-            history_summary=self.history_summary if self.history_summary else "Nenhuma conversa anterior.",
+            history_summary=history_summary if history_summary else "Nenhuma conversa anterior.",
             context=context_string,
             input=query,
         )
@@ -384,7 +610,35 @@ class AiAssistant:
             "context_string": context_string,
         }
 
-    def update_conversation_history_summary(self, user_query: str, context_string: str, assistant_response: str) -> None:
+    def _build_where_filter(self, document_names: Optional[List[str]], first_page: Optional[int],
+                            last_page: Optional[int]) -> Optional[Dict[str, Any]]:
+        """
+        Builds the metadata filter that scopes the vectorstore search to some documents and pages.
+
+        Args:
+            document_names (Optional[List[str]]): Names of the documents to search.
+            first_page (Optional[int]): First page to search.
+            last_page (Optional[int]): Last page to search.
+
+        Returns:
+            Optional[Dict[str, Any]]: The ChromaDB where filter, or None to search the whole collection.
+        """
+        conditions = []
+        if document_names:
+            conditions.append({"document_name": {"$in": list(document_names)}})
+        # Chunks store the first and last page they cover, keep the ones overlapping the requested pages
+        if last_page is not None:
+            conditions.append({"first_page": {"$lte": last_page}})
+        if first_page is not None:
+            conditions.append({"last_page": {"$gte": first_page}})
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$and": conditions}
+
+    def update_conversation_history_summary(self, user_query: str, context_string: str, assistant_response: str,
+                                            summary: Optional[str] = None) -> Tuple[str, int]:
         """
         Updates the conversation summary memory based on the latest interaction.
 
@@ -392,16 +646,28 @@ class AiAssistant:
             user_query (str): The latest user input.
             context_string (str): Context used to answer the query.
             assistant_response (str): Final assistant response.
+            summary (Optional[str]): Summary of the session the interaction belongs to. Defaults to None,
+                using the last summary set in the assistant, which another session may have replaced.
+
+        Returns:
+            Tuple[str, int]: The updated summary and its version.
         """
         self.status = "Atualizando o resumo do histórico da conversa."
         summmary_result = self.history_summarizer.invoke({
-            "summary": self.history_summary,
+            "summary": self.history_summary if summary is None else summary,
             "new_lines": f"USUARIO: {user_query} \n CHUNKS DE CONTEXTO DA BASE DE DADOS: {context_string} \n ASSISTENTE: {assistant_response}",
         })
+        # next() on the counter is atomic, concurrent sessions never share a version
+        version = next(self._history_summary_versions)
         self.history_summary = summmary_result.content
+        self.history_summary_version = version
         self.status = "Inferência concluída com sucesso. Assistente está pronto para processar mensagens."
+        return summmary_result.content, version
 
-    def run_inference_pipeline(self, user_query: str, collection_name: str = "documents") -> Generator[Dict[str, str], None, None]:
+    def run_inference_pipeline(self, user_query: str, collection_name: str = "documents",
+                               document_names: Optional[List[str]] = None, first_page: Optional[int] = None,
+                               last_page: Optional[int] = None,
+                               history_summary: Optional[str] = None) -> Generator[Dict[str, str], None, None]:
         """
         Runs the inference pipeline: builds the prompt (with or without RAG), runs streamed inference,
         and yields each new text fragment generated by the model.
@@ -409,9 +675,15 @@ class AiAssistant:
         Args:
             user_query (str): The user's input query.
             collection_name (str): The name of the collection to use ('documents' or 'None').
+            document_names (Optional[List[str]]): Only search the chunks of these documents. Defaults to None.
+            first_page (Optional[int]): First page to search in the documents. Defaults to None.
+            last_page (Optional[int]): Last page to search in the documents. Defaults to None.
+            history_summary (Optional[str]): Conversation summary of the session asking. Defaults to None,
+                using the last summary set in the assistant.
 
         Yields:
-            str: Each streamed text chunk from the inference model.
+            Dict[str, str]: The status updates, each streamed text chunk from the inference model and a final
+                "end" event holding the "context_string" used, to update the summary of this session with.
         """
         # Step 1: Build the prompt
         print("Building RAG prompt...")
@@ -421,7 +693,8 @@ class AiAssistant:
             "data": self.status,
         }
         prompt_data = self.build_rag_prompt(
-            query=user_query, collection_name=collection_name)
+            query=user_query, collection_name=collection_name, document_names=document_names,
+            first_page=first_page, last_page=last_page, history_summary=history_summary)
         self.last_context_string = prompt_data["context_string"]
         # Step 2: Run inference
         print("Running inference...")
@@ -443,6 +716,7 @@ class AiAssistant:
         yield {
             "type": "end",
             "data": self.status,
+            "context_string": prompt_data["context_string"],
         }
 
 # endregion
@@ -490,17 +764,21 @@ if __name__ == "__main__":
         print("\n\n\n" + "-" * 80)
         print(f"--- Running Inference with {inference_model_name} ---")
         response_chunks = []
+        context_string = ""
         for response_chunk in ai_assistant.run_inference_pipeline(
             user_query=query["question"], collection_name="my_collection"
         ):
-            response_chunks.append(response_chunk)
-            # Add interactive print of the response as it's being generated
-            print(response_chunk, end="", flush=True)
+            if response_chunk["type"] == "end":
+                context_string = response_chunk["context_string"]
+            elif response_chunk["type"] == "chunk":
+                response_chunks.append(response_chunk["data"])
+                # Add interactive print of the response as it's being generated
+                print(response_chunk["data"], end="", flush=True)
 
         response = "".join(response_chunks)
         ai_assistant.update_conversation_history_summary(
             user_query=query["question"],
-            context_string=ai_assistant.get_context_string(),
+            context_string=context_string,
             assistant_response=response,
         )
 
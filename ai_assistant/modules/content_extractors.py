@@ -0,0 +1,363 @@
+import io
+import json
+import threading
+import traceback
+import zipfile
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+import trafilatura
+from docling.document_converter import DocumentConverter, PdfFormatOption
+from docling.datamodel.base_models import DocumentStream, InputFormat
+from docling.datamodel.pipeline_options import PdfPipelineOptions
+
+
+# Signatures that identify a binary format from the first bytes of a stream
+MAGIC_SIGNATURES = [
+    (b"%PDF-", "pdf"),
+    (b"PK\x03\x04", "zip"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "ole"),
+    (b"\x89PNG\r\n\x1a\n", "image"),
+    (b"\xff\xd8\xff", "image"),
+    (b"GIF87a", "image"),
+    (b"GIF89a", "image"),
+    (b"RIFF", "binary"),
+    (b"\x1f\x8b", "binary"),
+]
+# Content types that say nothing about the real payload
+GENERIC_CONTENT_TYPES = {"", "application/octet-stream",
+                         "text/plain", "binary/octet-stream"}
+# Zip based office formats, identified by their main folder inside the archive
+OOXML_FOLDERS = {"word/": "docx", "xl/": "xlsx", "ppt/": "pptx"}
+
+
+class DoclingExtractor:
+    # region Constructor
+    def __init__(self) -> None:
+        """
+        The DoclingExtractor constructor. Converts PDF, office documents and CSV files to markdown.
+        The docling converter is only created on first use, since it is expensive to build.
+        """
+        self.converter: Optional[DocumentConverter] = None
+        self.lock = threading.Lock()
+# endregion
+# region Public Methods
+
+    def __call__(self, data: bytes, url: str, kind: str) -> str:
+        """
+        Converts a downloaded document to markdown.
+
+        Args:
+            data (bytes): The raw document bytes.
+            url (str): The source URL, used to name the document.
+            kind (str): The document kind (pdf, docx, xlsx, pptx or csv).
+
+        Returns:
+            str: The markdown content of the document.
+        """
+        stream = DocumentStream(
+            name=f"document.{kind}", stream=io.BytesIO(data))
+        # Docling pipelines are not meant to be shared between threads
+        with self.lock:
+            if self.converter is None:
+                self.converter = self._create_converter()
+            try:
+                result = self.converter.convert(source=stream)
+            except Exception:
+                print(f"=== DOCLING PIPELINE FAILURE ({url}) ===")
+                traceback.print_exc()
+                raise
+        return result.document.export_to_markdown()
+# endregion
+# region Private Methods
+
+    def _create_converter(self) -> DocumentConverter:
+        """
+        Creates the docling converter for the supported formats.
+
+        Returns:
+            DocumentConverter: The docling converter.
+        """
+        # Configure Docling to convert PDF without extra processing
+        options = PdfPipelineOptions(
+            do_ocr=False,
+            do_table_structure=False,
+            generate_page_images=False,
+            generate_picture_images=False,
+            do_formula_enrichment=False,
+        )
+        return DocumentConverter(
+            allowed_formats=[InputFormat.PDF, InputFormat.DOCX,
+                             InputFormat.XLSX, InputFormat.PPTX, InputFormat.CSV],
+            format_options={
+                InputFormat.PDF: PdfFormatOption(pipeline_options=options)}
+        )
+# endregion
+
+
+class ContentExtractorRegistry:
+    # region Constructor
+    def __init__(self) -> None:
+        """
+        The ContentExtractorRegistry constructor. Maps content kinds to the functions that turn
+        the downloaded bytes into text, and detects the kind of a payload from its first bytes,
+        its Content-Type header and its URL.
+        """
+        self.extractors: Dict[str, Callable[[bytes, str, str], str]] = {}
+        self.content_types: Dict[str, str] = {}
+        self.extensions: Dict[str, str] = {}
+# endregion
+# region Public Methods
+
+    def register(self, kind: str, extractor: Callable[[bytes, str, str], str],
+                 content_types: tuple = (), extensions: tuple = ()) -> None:
+        """
+        Registers an extractor for a content kind.
+
+        Args:
+            kind (str): The content kind handled by the extractor (e.g. "pdf").
+            extractor (Callable[[bytes, str, str], str]): Function receiving the raw bytes, the URL and
+                the kind, returning the extracted text.
+            content_types (tuple): Content-Type values that map to this kind. Defaults to ().
+            extensions (tuple): URL path extensions that map to this kind. Defaults to ().
+        """
+        self.extractors[kind] = extractor
+        for content_type in content_types:
+            self.content_types[content_type] = kind
+        for extension in extensions:
+            self.extensions[extension] = kind
+
+    def is_supported(self, kind: Optional[str]) -> bool:
+        """
+        Checks if there is an extractor for a content kind.
+
+        Args:
+            kind (Optional[str]): The content kind.
+
+        Returns:
+            bool: True if the kind can be extracted.
+        """
+        return kind is not None and (kind in self.extractors or kind == "zip")
+
+    def detect(self, head: bytes, content_type: str, url: str) -> Optional[str]:
+        """
+        Detects the content kind of a payload. Magic bytes win over the Content-Type header,
+        which in turn wins over the URL extension and the textual sniffing.
+
+        Args:
+            head (bytes): The first bytes of the payload.
+            content_type (str): The Content-Type header value, possibly empty.
+            url (str): The URL of the payload.
+
+        Returns:
+            Optional[str]: The detected kind, or None if it could not be determined.
+        """
+        for signature, kind in MAGIC_SIGNATURES:
+            if head.startswith(signature):
+                if kind == "zip":
+                    # Office documents are zip files, the header or the URL may tell which one
+                    hints = [self._lookup_content_type(content_type),
+                             self._lookup_extension(url)]
+                    return next((hint for hint in hints if hint in OOXML_FOLDERS.values()), kind)
+                return kind
+        mime_type = content_type.split(";")[0].strip().lower()
+        if mime_type not in GENERIC_CONTENT_TYPES:
+            kind = self._lookup_content_type(mime_type)
+            if kind is not None:
+                return kind
+        sniffed = self._sniff_text(head)
+        if sniffed == "html":
+            return sniffed
+        return self._lookup_extension(url) or sniffed
+
+    def extract(self, kind: str, data: bytes, url: str) -> Dict:
+        """
+        Extracts the text of a payload with the extractor registered for its kind.
+
+        Args:
+            kind (str): The content kind, as returned by detect.
+            data (bytes): The full payload.
+            url (str): The URL of the payload.
+
+        Returns:
+            Dict: A dictionary containing the extracted content and metadata.
+        """
+        if kind == "zip":
+            kind = self._detect_ooxml(data)
+        if kind not in self.extractors:
+            raise NotImplementedError(f"Unsupported content kind: {kind}")
+        text = self.extractors[kind](data, url, kind)
+        if not text or not text.strip():
+            raise RuntimeError(f"No textual content extracted from {kind}")
+        return {
+            "source": url,
+            "type": kind,
+            "content": text,
+        }
+# endregion
+# region Private Methods
+
+    def _lookup_content_type(self, content_type: str) -> Optional[str]:
+        """
+        Maps a Content-Type header value to a registered kind.
+
+        Args:
+            content_type (str): The Content-Type header value.
+
+        Returns:
+            Optional[str]: The kind, or None if unknown.
+        """
+        return self.content_types.get(content_type.split(";")[0].strip().lower())
+
+    def _lookup_extension(self, url: str) -> Optional[str]:
+        """
+        Maps the extension of the URL path to a registered kind.
+
+        Args:
+            url (str): The URL.
+
+        Returns:
+            Optional[str]: The kind, or None if unknown.
+        """
+        path = urlsplit(url).path.lower()
+        if "." not in path.rsplit("/", 1)[-1]:
+            return None
+        return self.extensions.get(path.rsplit(".", 1)[-1])
+
+    def _sniff_text(self, head: bytes) -> Optional[str]:
+        """
+        Guesses the kind of a textual payload from its first bytes.
+
+        Args:
+            head (bytes): The first bytes of the payload.
+
+        Returns:
+            Optional[str]: "html", "json" or "text", or None if the payload looks binary.
+        """
+        if b"\x00" in head:
+            return None
+        text = head.decode("utf-8", errors="ignore").lstrip("\ufeff \t\r\n").lower()
+        if text.startswith(("<!doctype html", "<html", "<head", "<body")) or "<html" in text[:512]:
+            return "html"
+        if text.startswith(("{", "[")):
+            return "json"
+        return "text"
+
+    def _detect_ooxml(self, data: bytes) -> str:
+        """
+        Finds which office format a zip payload holds.
+
+        Args:
+            data (bytes): The full zip payload.
+
+        Returns:
+            str: "docx", "xlsx" or "pptx".
+        """
+        try:
+            names = zipfile.ZipFile(io.BytesIO(data)).namelist()
+        except zipfile.BadZipFile as e:
+            raise NotImplementedError(f"Unsupported zip payload: {e}")
+        for folder, kind in OOXML_FOLDERS.items():
+            if any(name.startswith(folder) for name in names):
+                return kind
+        raise NotImplementedError("Unsupported zip payload")
+# endregion
+
+
+def extract_html(data: bytes, url: str, kind: str) -> str:
+    """
+    Extracts the main content of an HTML page as markdown.
+
+    Args:
+        data (bytes): The raw HTML.
+        url (str): The page URL.
+        kind (str): The content kind.
+
+    Returns:
+        str: The extracted markdown.
+    """
+    return trafilatura.extract(
+        data,
+        url=url,
+        include_comments=False,
+        include_tables=True,
+        include_links=False,
+        include_images=False,
+        output_format="markdown",
+    )
+
+
+def extract_json(data: bytes, url: str, kind: str) -> str:
+    """
+    Pretty prints a JSON payload so it can be chunked, falling back to raw text when invalid.
+
+    Args:
+        data (bytes): The raw JSON.
+        url (str): The payload URL.
+        kind (str): The content kind.
+
+    Returns:
+        str: The formatted JSON text.
+    """
+    text = extract_text(data, url, kind)
+    try:
+        return json.dumps(json.loads(text), indent=2, ensure_ascii=False)
+    except json.JSONDecodeError:
+        return text
+
+
+def extract_text(data: bytes, url: str, kind: str) -> str:
+    """
+    Decodes a plain text payload.
+
+    Args:
+        data (bytes): The raw text.
+        url (str): The payload URL.
+        kind (str): The content kind.
+
+    Returns:
+        str: The decoded text.
+    """
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        # latin-1 would accept any bytes and turn them into mojibake, only mark the invalid ones
+        return data.decode("utf-8", errors="replace")
+
+
+def build_default_registry() -> ContentExtractorRegistry:
+    """
+    Builds the registry with the extractors supported out of the box.
+
+    Returns:
+        ContentExtractorRegistry: The registry for HTML, PDF, office documents, CSV, JSON and plain text.
+    """
+    registry = ContentExtractorRegistry()
+    docling_extractor = DoclingExtractor()
+    registry.register("html", extract_html,
+                      content_types=("text/html", "application/xhtml+xml"),
+                      extensions=("html", "htm"))
+    registry.register("pdf", docling_extractor,
+                      content_types=("application/pdf",),
+                      extensions=("pdf",))
+    registry.register("docx", docling_extractor,
+                      content_types=(
+                          "application/vnd.openxmlformats-officedocument.wordprocessingml.document",),
+                      extensions=("docx",))
+    registry.register("xlsx", docling_extractor,
+                      content_types=(
+                          "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",),
+                      extensions=("xlsx",))
+    registry.register("pptx", docling_extractor,
+                      content_types=(
+                          "application/vnd.openxmlformats-officedocument.presentationml.presentation",),
+                      extensions=("pptx",))
+    registry.register("csv", docling_extractor,
+                      content_types=("text/csv", "application/csv"),
+                      extensions=("csv",))
+    registry.register("json", extract_json,
+                      content_types=("application/json", "text/json"),
+                      extensions=("json",))
+    registry.register("text", extract_text,
+                      content_types=("text/plain", "text/markdown"),
+                      extensions=("txt", "md"))
+    return registry
@@ -0,0 +1,287 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from urllib.parse import urlsplit
+
+
+class HostUnavailableError(RuntimeError):
+    """Raised when a host is skipped because its circuit breaker is open."""
+
+
+class FetchDeadlineExceeded(TimeoutError):
+    """Raised when a fetch cannot start or finish before the request deadline."""
+
+
+class CircuitBreaker:
+    # region Constructor
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0) -> None:
+        """
+        The CircuitBreaker constructor. The breaker opens after consecutive failures and lets a
+        single trial request through once the reset timeout has elapsed (half-open state).
+
+        Args:
+            failure_threshold (int): Consecutive failures needed to open the breaker. Defaults to 3.
+            reset_timeout (float): Seconds the breaker stays open before a trial request. Defaults to 60.0.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+# endregion
+# region Public Methods
+
+    def allow(self) -> bool:
+        """
+        Checks if a request to the host may be attempted now.
+
+        Returns:
+            bool: True if the request is allowed, False if the breaker is open.
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        """Closes the breaker after a successful request."""
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Gives back a half-open trial that ended without telling anything about the host."""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Counts a failed request, opening the breaker when the threshold is reached."""
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+# endregion
+
+
+class FetchScheduler:
+    # region Constructor
+    def __init__(self, max_concurrency: int = 8, max_per_host: int = 2, failure_threshold: int = 3,
+                 reset_timeout: float = 60.0,
+                 failure_exceptions: Tuple[Type[BaseException], ...] = (Exception,)) -> None:
+        """
+        The FetchScheduler constructor. Bounds the number of simultaneous fetches globally and per host,
+        enforces per-request deadlines and skips hosts that keep failing.
+
+        Args:
+            max_concurrency (int): Maximum number of fetches running at the same time. Defaults to 8.
+            max_per_host (int): Maximum number of simultaneous fetches to a single host. Defaults to 2.
+            failure_threshold (int): Consecutive failures that open a host circuit breaker. Defaults to 3.
+            reset_timeout (float): Seconds before an open host is tried again. Defaults to 60.0.
+            failure_exceptions (Tuple[Type[BaseException], ...]): Exceptions counted as host failures.
+                Defaults to (Exception,).
+        """
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failure_exceptions = failure_exceptions
+        self.global_slots = threading.BoundedSemaphore(max_concurrency)
+        self.host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="fetch")
+# endregion
+# region Public Methods
+
+    @staticmethod
+    def deadline(seconds: float) -> float:
+        """
+        Creates a deadline that many seconds from now.
+
+        Args:
+            seconds (float): The time budget in seconds.
+
+        Returns:
+            float: The deadline as a monotonic timestamp.
+        """
+        return time.monotonic() + seconds
+
+    @staticmethod
+    def timeout_for(deadline: Optional[float], timeout: float) -> float:
+        """
+        Bounds a network timeout by the time left until the deadline.
+
+        Args:
+            deadline (Optional[float]): The monotonic deadline, or None for no deadline.
+            timeout (float): The timeout to use when the deadline is far enough.
+
+        Returns:
+            float: The timeout to use in seconds.
+        """
+        if deadline is None:
+            return timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise FetchDeadlineExceeded("Request deadline exceeded")
+        return min(timeout, remaining)
+
+    def is_host_available(self, url: str) -> bool:
+        """
+        Checks if the host of an URL is not blocked by its circuit breaker.
+
+        Args:
+            url (str): The URL to check.
+
+        Returns:
+            bool: True if the host circuit is closed.
+        """
+        breaker = self._get_breaker(self._get_host(url))
+        with breaker.lock:
+            return breaker.opened_at is None
+
+    def run(self, url: str, fn: Callable[..., Any], *args, deadline: Optional[float] = None, **kwargs) -> Any:
+        """
+        Runs a fetch function in the calling thread once a global and a per-host slot are available.
+
+        Args:
+            url (str): The URL being fetched, used to find its host.
+            fn (Callable[..., Any]): The function performing the fetch.
+            *args: Positional arguments for the function.
+            deadline (Optional[float]): Monotonic deadline for the whole operation. Defaults to None.
+            **kwargs: Keyword arguments for the function.
+
+        Returns:
+            Any: The value returned by the function.
+        """
+        host = self._get_host(url)
+        breaker = self._get_breaker(host)
+        if not breaker.allow():
+            raise HostUnavailableError(
+                f"Skipping {url}: host {host} is failing repeatedly")
+        # Wait for the host first so a busy host does not hold global slots
+        host_slot = self._get_host_slot(host)
+        if not host_slot.acquire(timeout=self._acquire_timeout(deadline)):
+            breaker.release_trial()
+            raise FetchDeadlineExceeded(
+                f"No slot available for host {host} before the deadline")
+        try:
+            if not self.global_slots.acquire(timeout=self._acquire_timeout(deadline)):
+                breaker.release_trial()
+                raise FetchDeadlineExceeded(
+                    f"No fetch slot available for {url} before the deadline")
+            try:
+                result = fn(*args, **kwargs)
+            except self.failure_exceptions:
+                breaker.record_failure()
+                raise
+            except BaseException:
+                breaker.release_trial()
+                raise
+            finally:
+                self.global_slots.release()
+            breaker.record_success()
+            return result
+        finally:
+            host_slot.release()
+
+    def map(self, urls: List[str], fn: Callable[[str], Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Runs a function for every URL concurrently, each call going through the scheduler limits.
+
+        Args:
+            urls (List[str]): The URLs to process.
+            fn (Callable[[str], Any]): The function to call with each URL.
+            deadline (Optional[float]): Monotonic deadline for all the calls. Defaults to None.
+
+        Returns:
+            Dict[str, Any]: The result for each URL, or the exception it raised.
+        """
+        futures = {
+            url: self.executor.submit(self.run, url, fn, url, deadline=deadline)
+            for url in dict.fromkeys(urls)
+        }
+        timeout = None if deadline is None else max(
+            deadline - time.monotonic(), 0)
+        wait(futures.values(), timeout=timeout)
+        results = {}
+        for url, future in futures.items():
+            if not future.done():
+                future.cancel()
+                results[url] = FetchDeadlineExceeded(
+                    f"Fetching {url} did not finish before the deadline")
+            elif future.exception() is not None:
+                results[url] = future.exception()
+            else:
+                results[url] = future.result()
+        return results
+# endregion
+# region Private Methods
+
+    def _get_host(self, url: str) -> str:
+        """
+        Extracts the host of an URL.
+
+        Args:
+            url (str): The URL.
+
+        Returns:
+            str: The lower case host name.
+        """
+        return (urlsplit(url).hostname or url).lower()
+
+    def _get_breaker(self, host: str) -> CircuitBreaker:
+        """
+        Gets the circuit breaker of a host, creating it if needed.
+
+        Args:
+            host (str): The host name.
+
+        Returns:
+            CircuitBreaker: The host circuit breaker.
+        """
+        with self.lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(
+                    failure_threshold=self.failure_threshold,
+                    reset_timeout=self.reset_timeout
+                )
+            return self.breakers[host]
+
+    def _get_host_slot(self, host: str) -> threading.BoundedSemaphore:
+        """
+        Gets the concurrency semaphore of a host, creating it if needed.
+
+        Args:
+            host (str): The host name.
+
+        Returns:
+            threading.BoundedSemaphore: The host semaphore.
+        """
+        with self.lock:
+            if host not in self.host_slots:
+                self.host_slots[host] = threading.BoundedSemaphore(
+                    self.max_per_host)
+            return self.host_slots[host]
+
+    def _acquire_timeout(self, deadline: Optional[float]) -> Optional[float]:
+        """
+        Computes how long to wait for a slot given the deadline.
+
+        Args:
+            deadline (Optional[float]): The monotonic deadline, or None for no deadline.
+
+        Returns:
+            Optional[float]: Seconds to wait, or None to wait forever.
+        """
+        if deadline is None:
+            return None
+        return max(deadline - time.monotonic(), 0)
+# endregion
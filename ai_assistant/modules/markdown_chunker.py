@@ -0,0 +1,226 @@
+import re
+from typing import Dict, List
+import tiktoken
+from langchain_text_splitters import TokenTextSplitter
+
+
+class MarkdownChunker:
+    # region Constructor
+    def __init__(self, target_tokens: int = 400, max_tokens: int = 800, overlap_tokens: int = 40,
+                 section_summary_tokens: int = 300, encoding_name: str = "gpt2") -> None:
+        """
+        The MarkdownChunker constructor. Splits markdown (as produced by trafilatura or docling) along its
+        structure: sections by headings, then passages packed from paragraphs, lists, code blocks and tables.
+
+        Args:
+            target_tokens (int): Passages are packed from whole blocks up to this size. Defaults to 400.
+            max_tokens (int): Blocks bigger than this are split on their own. Defaults to 800.
+            overlap_tokens (int): Token overlap used when a single block must be split. Defaults to 40.
+            section_summary_tokens (int): Size of the coarse text that represents a section. Defaults to 300.
+            encoding_name (str): The tiktoken encoding used to count tokens. Defaults to "gpt2".
+        """
+        self.target_tokens = target_tokens
+        self.max_tokens = max(max_tokens, target_tokens)
+        self.section_summary_tokens = section_summary_tokens
+        self.encoding = tiktoken.get_encoding(encoding_name)
+        # Fallback splitter for blocks that have no structure left to split on
+        self.block_splitter = TokenTextSplitter(
+            encoding_name=encoding_name,
+            chunk_size=target_tokens,
+            chunk_overlap=overlap_tokens
+        )
+        self.heading_regex = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+        self.fence_regex = re.compile(r"^\s*(```|~~~)")
+# endregion
+# region Public Methods
+
+    def chunk(self, text: str) -> List[Dict]:
+        """
+        Splits a markdown text into sections, each one holding its fine grained passages.
+
+        Args:
+            text (str): The markdown text to split.
+
+        Returns:
+            List[Dict]: One entry per non empty section with the keys "index", "heading", "summary"
+                (coarse text used for the first retrieval level) and "passages" (list of passage texts).
+        """
+        sections = []
+        for heading_path, lines in self._split_sections(text):
+            blocks = self._split_blocks(lines)
+            if not blocks:
+                continue
+            heading = " > ".join(heading_path)
+            passages = self._pack_blocks(blocks)
+            if heading:
+                passages = [f"{heading}\n\n{passage}" for passage in passages]
+            summary = self._truncate("\n\n".join(blocks), self.section_summary_tokens)
+            if heading:
+                summary = f"{heading}\n\n{summary}"
+            sections.append({
+                "index": len(sections),
+                "heading": heading,
+                "summary": summary,
+                "passages": passages,
+            })
+        return sections
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Counts the tokens of a text with the chunker encoding.
+
+        Args:
+            text (str): The text to measure.
+
+        Returns:
+            int: The number of tokens.
+        """
+        return len(self.encoding.encode(text, disallowed_special=()))
+# endregion
+# region Private Methods
+
+    def _split_sections(self, text: str) -> List[tuple]:
+        """
+        Splits the markdown into sections delimited by headings, keeping the heading hierarchy.
+
+        Args:
+            text (str): The markdown text to split.
+
+        Returns:
+            List[tuple]: Pairs of (heading path, section body lines).
+        """
+        sections = []
+        heading_stack = []
+        current_lines = []
+        in_fence = False
+        for line in text.splitlines():
+            if self.fence_regex.match(line):
+                in_fence = not in_fence
+            match = None if in_fence else self.heading_regex.match(line)
+            if match is None:
+                current_lines.append(line)
+                continue
+            sections.append(([h for _, h in heading_stack], current_lines))
+            current_lines = []
+            level = len(match.group(1))
+            while heading_stack and heading_stack[-1][0] >= level:
+                heading_stack.pop()
+            heading_stack.append((level, match.group(2)))
+        sections.append(([h for _, h in heading_stack], current_lines))
+        return sections
+
+    def _split_blocks(self, lines: List[str]) -> List[str]:
+        """
+        Groups section lines into blocks (paragraphs, lists, tables and fenced code).
+
+        Args:
+            lines (List[str]): The section body lines.
+
+        Returns:
+            List[str]: The non empty blocks in document order.
+        """
+        blocks = []
+        current = []
+        in_fence = False
+        in_table = False
+        for line in lines:
+            if self.fence_regex.match(line):
+                in_fence = not in_fence
+                current.append(line)
+                continue
+            if in_fence:
+                current.append(line)
+                continue
+            is_table_row = line.lstrip().startswith("|")
+            # Tables always start and end a block, so they are never glued to paragraphs
+            if is_table_row != in_table and current:
+                blocks.append("\n".join(current))
+                current = []
+            in_table = is_table_row
+            if not line.strip():
+                if current:
+                    blocks.append("\n".join(current))
+                    current = []
+                continue
+            current.append(line)
+        if current:
+            blocks.append("\n".join(current))
+        return [block.strip() for block in blocks if block.strip()]
+
+    def _pack_blocks(self, blocks: List[str]) -> List[str]:
+        """
+        Greedily packs consecutive blocks into passages close to the target size.
+
+        Args:
+            blocks (List[str]): The blocks of a section.
+
+        Returns:
+            List[str]: The passages of the section.
+        """
+        passages = []
+        current = []
+        current_tokens = 0
+        for block in blocks:
+            block_tokens = self.count_tokens(block)
+            if block_tokens > self.max_tokens:
+                if current:
+                    passages.append("\n\n".join(current))
+                    current, current_tokens = [], 0
+                passages.extend(self._split_large_block(block))
+                continue
+            if current and current_tokens + block_tokens > self.target_tokens:
+                passages.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(block)
+            current_tokens += block_tokens
+        if current:
+            passages.append("\n\n".join(current))
+        return passages
+
+    def _split_large_block(self, block: str) -> List[str]:
+        """
+        Splits a block bigger than the maximum size. Tables are split by rows repeating their header,
+        anything else falls back to token windows.
+
+        Args:
+            block (str): The block to split.
+
+        Returns:
+            List[str]: The resulting passages.
+        """
+        rows = block.splitlines()
+        if not rows[0].lstrip().startswith("|"):
+            return self.block_splitter.split_text(block)
+        # Keep the header and the separator row on every piece of the table
+        header = rows[:2] if len(rows) > 1 and set(rows[1].strip()) <= set("|-: ") else rows[:1]
+        header_tokens = self.count_tokens("\n".join(header))
+        passages = []
+        current = []
+        current_tokens = header_tokens
+        for row in rows[len(header):]:
+            row_tokens = self.count_tokens(row)
+            if current and current_tokens + row_tokens > self.target_tokens:
+                passages.append("\n".join(header + current))
+                current, current_tokens = [], header_tokens
+            current.append(row)
+            current_tokens += row_tokens
+        if current or not passages:
+            passages.append("\n".join(header + current))
+        return passages
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Truncates a text to a maximum number of tokens.
+
+        Args:
+            text (str): The text to truncate.
+            max_tokens (int): The maximum number of tokens to keep.
+
+        Returns:
+            str: The truncated text.
+        """
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return self.encoding.decode(tokens[:max_tokens])
+# endregion
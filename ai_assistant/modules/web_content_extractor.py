@@ -1,25 +1,44 @@
 import requests
-import trafilatura
 from typing import Optional, Dict, List
-import traceback
 import re
+import hashlib
 import chromadb
 from chromadb.utils import embedding_functions
 from chromadb.api.models import Collection
-from docling.document_converter import DocumentConverter, PdfFormatOption
-from docling.datamodel.base_models import InputFormat
-from docling.datamodel.pipeline_options import PdfPipelineOptions
-from langchain_text_splitters import TokenTextSplitter
+from modules.markdown_chunker import MarkdownChunker
+from modules.fetch_scheduler import FetchScheduler
+from modules.content_extractors import build_default_registry
+
+
+# Collection of the database server holding the pages referenced by the documents
+WEB_REFERENCES_COLLECTION = "web_references"
+
+
+class HostServerError(requests.HTTPError):
+    """Raised for 5xx responses, the only HTTP errors that count against the host."""
+
+
+# Failures of the host itself, a 4xx only concerns the requested page
+HOST_FAILURE_EXCEPTIONS = (requests.ConnectionError, requests.Timeout, HostServerError)
 
 
 class WebContentExtractor:
     # region Constructor
-    def __init__(self, device: str = "cpu") -> None:
+    def __init__(self, device: str = "cpu", chunk_target_tokens: int = 400, chunk_max_tokens: int = 800,
+                 n_sections: int = 3, max_concurrency: int = 8, max_per_host: int = 2,
+                 fetch_deadline_seconds: float = 20.0, max_content_bytes: int = 50 * 1024 * 1024) -> None:
         """
         The WebContentExtractor constructor
 
         Args:
             device (str): The device to use for embedding computation. Defaults to "cpu".
+            chunk_target_tokens (int): Target size of the passages returned as context. Defaults to 400.
+            chunk_max_tokens (int): Maximum size of a single structural block before it gets split. Defaults to 800.
+            n_sections (int): Number of sections kept by the coarse retrieval level. Defaults to 3.
+            max_concurrency (int): Maximum number of simultaneous fetches. Defaults to 8.
+            max_per_host (int): Maximum number of simultaneous fetches to the same host. Defaults to 2.
+            fetch_deadline_seconds (float): Time budget to fetch all the URLs of a query. Defaults to 20.0.
+            max_content_bytes (int): Maximum size of a downloaded resource. Defaults to 50 MB.
         """
         print("Initializing WebContentExtractor...")
         # The efemeral chromadb client can be used to cache embeddings
@@ -28,11 +47,22 @@ class WebContentExtractor:
             model_name="Qwen/Qwen3-Embedding-0.6B",
             device=device,
         )
-        # Text splitter to create chunks from the extracted text
-        self.splitter = TokenTextSplitter(
-            chunk_size=4000,
-            chunk_overlap=200
+        # Structure aware chunker to create sections and passages from the extracted markdown
+        self.chunker = MarkdownChunker(
+            target_tokens=chunk_target_tokens,
+            max_tokens=chunk_max_tokens
+        )
+        self.n_sections = n_sections
+        # Fetch scheduler to bound concurrency per host and skip hosts that keep failing
+        self.scheduler = FetchScheduler(
+            max_concurrency=max_concurrency,
+            max_per_host=max_per_host,
+            failure_exceptions=HOST_FAILURE_EXCEPTIONS
         )
+        self.fetch_deadline_seconds = fetch_deadline_seconds
+        # Extractors for each supported content kind, chosen by sniffing the downloaded bytes
+        self.extractors = build_default_registry()
+        self.max_content_bytes = max_content_bytes
         # URL identification regex variables
         self.url_regex = re.compile(
             r"""
@@ -49,7 +79,7 @@ class WebContentExtractor:
 # endregion
 # region Public Methods
 
-    def query_content_from_url(self, url: str, query: str, top_k: int = 5) -> str:
+    def query_content_from_url(self, url: str, query: str, top_k: int = 5, deadline: Optional[float] = None) -> str:
         """
         Extracts content from a URL, stores it in chromadb, and performs a similarity search with the given query.
 
@@ -57,45 +87,102 @@ class WebContentExtractor:
             url (str): The URL to extract content from.
             query (str): The query string to perform similarity search.
             top_k (int): The number of top similar results to retrieve.
+            deadline (Optional[float]): Monotonic deadline for fetching the URL. Defaults to None.
 
         Returns:
             str: The combined text of the most similar chunks.
         """
-        # Get the textual content from the URL
-        extracted = self.extract_content(url)
-        text = extracted["content"]
-        # Convert it into chunks and store in chromadb
-        collection_name = f"{url.replace('/', '_').replace(':', '_')}"
-        self._add_to_collection(collection_name, text, {"source": url})
-        # Then perform a similarity search with the query to get relevant chunks
-        return self._similarity_search(collection_name, query, top_k)
+        passages = self.search_content_from_url(
+            url=url, query=query, top_k=top_k, deadline=deadline)
+        # Combine the top_k results into a single string
+        return "\n\n".join(passage["content"] for passage in passages)
 
-    def extract_content(self, url: str) -> Dict:
+    def search_content_from_url(self, url: str, query: str, top_k: int = 5, deadline: Optional[float] = None,
+                                query_embeddings: Optional[List] = None) -> List[Dict]:
         """
-        Extracts content from a URL based on its content type.
+        Extracts content from a URL, stores it in chromadb, and returns the passages most similar to the query.
 
         Args:
             url (str): The URL to extract content from.
+            query (str): The query string to perform similarity search.
+            top_k (int): The number of top similar passages to retrieve.
+            deadline (Optional[float]): Monotonic deadline for fetching the URL. Defaults to None.
+            query_embeddings (Optional[List]): Precomputed query embedding, so several URLs can share it.
+                Defaults to None.
 
         Returns:
-            Dict: A dictionary containing the extracted content and metadata.
+            List[Dict]: The passages, with "content", "source", "heading" and "distance" keys, best first.
         """
-        content_type = self._get_content_type(url)
+        collection_name = self._get_collection_name(url)
+        # Only fetch the URL if its content is not cached yet
+        if not self._collection_exists(collection_name):
+            # Get the textual content from the URL
+            extracted = self.scheduler.run(
+                url, lambda: self.extract_content(url, deadline=deadline), deadline=deadline)
+            text = extracted["content"]
+            # Convert it into chunks and store in chromadb
+            self._add_to_collection(collection_name, text, {"source": url})
+        # Then perform a similarity search with the query to get relevant chunks
+        return self._similarity_search(collection_name, query, top_k, query_embeddings=query_embeddings)
 
-        if content_type is None:
-            raise RuntimeError("Could not determine content type")
+    def new_deadline(self) -> float:
+        """
+        Creates the deadline used to fetch all the URLs referenced in a single query.
 
-        if "text/html" in content_type:
-            return self._extract_html(url)
+        Returns:
+            float: The monotonic deadline.
+        """
+        return self.scheduler.deadline(self.fetch_deadline_seconds)
 
-        if "application/pdf" in content_type:
-            return self._extract_pdf(url)
+    def extract_content(self, url: str, deadline: Optional[float] = None) -> Dict:
+        """
+        Extracts content from a URL based on its content type. The type is detected from the first
+        bytes of the GET stream (falling back to the Content-Type header and the URL extension), and
+        unsupported payloads are dropped before their body is downloaded.
 
-        raise NotImplementedError(
-            f"Unsupported Content-Type: {content_type}"
-        )
+        Args:
+            url (str): The URL to extract content from.
+            deadline (Optional[float]): Monotonic deadline for the network calls. Defaults to None.
 
-    def extract_and_validate_urls(self, text: str, timeout: int = 5, allow_redirects: bool = True) -> List[str]:
+        Returns:
+            Dict: A dictionary containing the extracted content and metadata.
+        """
+        with requests.get(
+            url,
+            stream=True,
+            allow_redirects=True,
+            timeout=self.scheduler.timeout_for(deadline, 15),
+            headers={"User-Agent": "WebContentExtractor/1.0"},
+        ) as response:
+            if response.status_code >= 500:
+                raise HostServerError(
+                    f"{response.status_code} Server Error for url: {response.url}", response=response)
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "").lower()
+            body = response.iter_content(chunk_size=8192)
+            # Sniff the payload kind from the first bytes only
+            head = b""
+            for block in body:
+                head += block
+                if len(head) >= 2048:
+                    break
+            kind = self.extractors.detect(head, content_type, response.url)
+            if not self.extractors.is_supported(kind):
+                raise NotImplementedError(
+                    f"Unsupported content (detected: {kind}, Content-Type: {content_type or 'missing'})"
+                )
+            # Download the rest of the payload within the size and time budgets
+            data = bytearray(head)
+            for block in body:
+                data += block
+                if len(data) > self.max_content_bytes:
+                    raise RuntimeError(
+                        f"Content larger than {self.max_content_bytes} bytes")
+                self.scheduler.timeout_for(deadline, 15)
+        return {**self.extractors.extract(kind, bytes(data), url), "source": url}
+
+    def extract_and_validate_urls(self, text: str, timeout: int = 5, allow_redirects: bool = True,
+                                  deadline: Optional[float] = None) -> List[str]:
         """
         Extract URLs from text and validate them via HTTP HEAD request.
         Returns only reachable URLs.
@@ -104,179 +191,190 @@ class WebContentExtractor:
             text (str): The input text to extract URLs from.
             timeout (int): Timeout for the HEAD request in seconds.
             allow_redirects (bool): Whether to allow redirects in the HEAD request.
+            deadline (Optional[float]): Monotonic deadline for all the validations. Defaults to None.
 
         Returns:
             List[str]: A list of validated URLs.
         """
+        return self.validate_urls(self.find_urls(text), timeout=timeout, allow_redirects=allow_redirects,
+                                  deadline=deadline)
+
+    def find_urls(self, text: str) -> List[str]:
+        """
+        Extract and normalize the URLs of a text, without checking if they are reachable.
+
+        Args:
+            text (str): The input text to extract URLs from.
+
+        Returns:
+            List[str]: The URLs, deduplicated and in order of appearance.
+        """
         TRAILING_PUNCTUATION = {".", ",", ";", ":", ")", "]", "}", "?", "!"}
-        candidates = self.url_regex.findall(text)
         urls = []
-        for url in candidates:
+        for url in self.url_regex.findall(text):
             # strip trailing punctuation
             while url and url[-1] in TRAILING_PUNCTUATION:
                 url = url[:-1]
             # normalize
             if url.startswith("www."):
                 url = "https://" + url
-            # validate via HEAD
-            try:
-                response = requests.head(
-                    url,
-                    timeout=timeout,
-                    allow_redirects=allow_redirects,
-                    headers={"User-Agent": "URLValidator/1.0"}
-                )
-                if response.status_code < 400:
-                    urls.append(url)
-            except requests.RequestException:
-                continue
+            urls.append(url)
         # deduplicate, preserve order
         return list(dict.fromkeys(urls))
+
+    def validate_urls(self, urls: List[str], timeout: int = 5, allow_redirects: bool = True,
+                      deadline: Optional[float] = None) -> List[str]:
+        """
+        Validate URLs via HTTP HEAD request, all at once. Returns only reachable URLs.
+
+        Args:
+            urls (List[str]): The URLs to validate.
+            timeout (int): Timeout for the HEAD request in seconds.
+            allow_redirects (bool): Whether to allow redirects in the HEAD request.
+            deadline (Optional[float]): Monotonic deadline for all the validations. Defaults to None.
+
+        Returns:
+            List[str]: A list of validated URLs.
+        """
+        def validate(url: str) -> bool:
+            response = requests.head(
+                url,
+                timeout=self.scheduler.timeout_for(deadline, timeout),
+                allow_redirects=allow_redirects,
+                headers={"User-Agent": "URLValidator/1.0"}
+            )
+            return response.status_code < 400
+
+        results = self.scheduler.map(urls, validate, deadline=deadline)
+        return [url for url, valid in results.items() if valid is True]
 # endregion
 # region Private Methods
 
-    def _similarity_search(self, collection_name: str, query: str, top_k: int = 5) -> str:
+    def _similarity_search(self, collection_name: str, query: str, top_k: int = 5,
+                           query_embeddings: Optional[List] = None) -> List[Dict]:
         """
-        Performs a similarity search in the specified collection using the given query.
+        Performs a two-level similarity search in the specified collection using the given query.
+        The coarse level selects the most relevant sections, and the fine level picks the best
+        passages inside those sections only.
 
         Args:
             collection_name (str): The name of the collection to search in.
             query (str): The query string to search for.
-            top_k (int): The number of top similar results to retrieve.
+            top_k (int): The number of top similar passages to retrieve.
+            query_embeddings (Optional[List]): Precomputed query embedding. Defaults to None.
 
         Returns:
-            str: The combined text of the most similar chunks.
+            List[Dict]: The most similar passages, best first.
         """
         collection: Collection = self.client.get_collection(
             name=collection_name,
             embedding_function=self.ebf
         )
+        n_sections = (collection.metadata or {}).get("n_sections", 0)
+        if n_sections == 0:
+            return []
+        # Embed the query once and reuse it for both levels
+        if query_embeddings is None:
+            query_embeddings = self.ebf([query])
+        # Coarse level: sections
+        sections = collection.query(
+            query_embeddings=query_embeddings,
+            n_results=min(max(self.n_sections, 1), n_sections),
+            where={"level": "section"},
+            include=["metadatas"]
+        )
+        section_indexes = [md["section_index"]
+                           for md in sections["metadatas"][0]]
+        n_passages = sum(md["n_passages"] for md in sections["metadatas"][0])
+        # Fine level: passages restricted to the selected sections
         results = collection.query(
-            query_texts=[query],
-            n_results=top_k
+            query_embeddings=query_embeddings,
+            n_results=min(top_k, n_passages),
+            where={"$and": [
+                {"level": "passage"},
+                {"section_index": {"$in": section_indexes}},
+            ]}
         )
-        # Combine the top_k results into a single string
-        combined_text = "\n\n".join(results['documents'][0])
-        return combined_text
+        return [
+            {
+                "content": document,
+                "source": metadata.get("source", "unknown"),
+                "heading": metadata.get("heading", ""),
+                "distance": distance,
+            }
+            for document, metadata, distance in zip(
+                results["documents"][0], results["metadatas"][0], results["distances"][0])
+        ]
 
     def _add_to_collection(self, collection_name: str, text: str, metadata: Dict) -> None:
         """
-        Adds text chunks to a specified collection in chromadb.
+        Adds the sections and passages of a text to a specified collection in chromadb.
 
         Args:
             collection_name (str): The name of the collection to add to.
-            text (str): The text to be chunked and added.
+            text (str): The markdown text to be chunked and added.
             metadata (Dict): Metadata to associate with each chunk.
         """
         # Check if collection already exists
-        existing_collections = [
-            col.name for col in self.client.list_collections()
-        ]
-        if collection_name in existing_collections:
+        if self._collection_exists(collection_name):
             print(f"\n\n\nCollection {collection_name} already exists. Skipping addition.\n\n\n")
             return
-        # Create new collection with respect to the URL (collection name)
-        collection: Collection = self.client.create_collection(
+        # Create chunks to add to the collection, one coarse record per section
+        # and one fine record per passage
+        sections = self.chunker.chunk(text)
+        source = metadata.get('source', 'unknown')
+        documents, metadatas, ids = [], [], []
+        for section in sections:
+            documents.append(section["summary"])
+            metadatas.append({**metadata, "level": "section", "section_index": section["index"],
+                              "heading": section["heading"], "n_passages": len(section["passages"])})
+            ids.append(f"{source}_section_{section['index']}")
+            for i, passage in enumerate(section["passages"]):
+                documents.append(passage)
+                metadatas.append({**metadata, "level": "passage", "section_index": section["index"],
+                                  "heading": section["heading"], "chunk_index": i})
+                ids.append(f"{source}_section_{section['index']}_chunk_{i}")
+        # Create new collection with respect to the URL (collection name). Another query may be adding
+        # the same URL at the same time, the ids are the same so both writes end up identical
+        collection: Collection = self.client.get_or_create_collection(
             name=collection_name,
-            embedding_function=self.ebf
+            embedding_function=self.ebf,
+            metadata={"n_sections": len(sections)}
         )
-        # Create chunks to add to the collection
-        chunks = self.splitter.split_text(text)
-        for i, chunk in enumerate(chunks):
-            collection.add(
-                documents=[chunk],
-                metadatas=[{**metadata, "chunk_index": i}],
-                ids=[f"{metadata.get('source', 'unknown')}_chunk_{i}"]
+        if documents:
+            collection.upsert(
+                documents=documents,
+                metadatas=metadatas,
+                ids=ids
             )
 
-    def _get_content_type(self, url: str) -> Optional[str]:
+    def _get_collection_name(self, url: str) -> str:
         """
-        Gets the content type of the resource at the given URL.
+        Builds a valid chromadb collection name for an URL. Query strings and other characters
+        are not allowed in collection names, so the URL is hashed.
 
         Args:
-            url (str): The URL to check.
+            url (str): The URL.
 
         Returns:
-            Optional[str]: The content type if available, otherwise None.
+            str: The collection name.
         """
-        try:
-            r = requests.head(
-                url,
-                allow_redirects=True,
-                timeout=15,
-                headers={"User-Agent": "WebContentExtractor/1.0"},
-            )
-            return r.headers.get("Content-Type", "").lower()
-        except requests.RequestException:
-            return None
+        return f"url_{hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]}"
 
-    def _extract_html(self, url: str) -> Dict:
+    def _collection_exists(self, collection_name: str) -> bool:
         """
-        Extracts and cleans HTML content from the given URL.
+        Checks if the content of an URL is already cached in chromadb.
 
         Args:
-            url (str): The URL to extract HTML content from.
+            collection_name (str): The name of the collection to check.
 
         Returns:
-            Dict: A dictionary containing the extracted content and metadata.
-        """
-        downloaded = trafilatura.fetch_url(url)
-        if not downloaded:
-            raise RuntimeError("Failed to fetch HTML content")
-
-        text = trafilatura.extract(
-            downloaded,
-            include_comments=False,
-            include_tables=True,
-            include_links=False,
-            include_images=False,
-            output_format="markdown",
-        )
-        if not text:
-            raise RuntimeError("Trafilatura failed to extract content")
-
-        return {
-            "source": url,
-            "type": "html",
-            "content": text,
-        }
-
-    def _extract_pdf(self, url: str) -> Dict:
-        """
-        Extracts text content from a PDF at the given URL.
-
-        Args:
-            url (str): The URL to extract PDF content from.
-
-        Returns:
-            Dict: A dictionary containing the extracted content and metadata.
+            bool: True if the collection exists.
         """
-        # Configure Docling to convert PDF without extra processing
-        options = PdfPipelineOptions(
-            do_ocr=False,
-            do_table_structure=False,
-            generate_page_images=False,
-            generate_picture_images=False,
-            do_formula_enrichment=False,
-        )
-        pdf_format_options = PdfFormatOption(pipeline_options=options)
-        converter = DocumentConverter(
-            format_options={InputFormat.PDF: pdf_format_options}
-        )
-        # Perform the conversion
-        try:
-            result = converter.convert(source=url)
-        except Exception as e:
-            print("=== DOCLING PIPELINE FAILURE ===")
-            traceback.print_exc()
-            raise
-        text = result.document.export_to_markdown()
-
-        return {
-            "source": url,
-            "type": "pdf",
-            "content": text,
-        }
+        existing_collections = [
+            col.name for col in self.client.list_collections()
+        ]
+        return collection_name in existing_collections
 # endregion
 
 
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import List, Optional
 from pydantic import BaseModel
 
 
@@ -8,6 +9,7 @@ class AppConfig:
     inference_model_name: str
     host: str
     port: int
+    collections_cache_ttl: float = 30.0
 
 
 class AiAssistantInferenceRequest(BaseModel):
@@ -21,3 +23,7 @@ class AiAssistantInferenceRequest(BaseModel):
     n_chunks: int = 3
     collection_name: str = "documents"
     inference_model_name: str = "gemma4:latest"
+    # Optional scope of the search in the collection
+    document_names: Optional[List[str]] = None
+    first_page: Optional[int] = None
+    last_page: Optional[int] = None
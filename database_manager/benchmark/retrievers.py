@@ -0,0 +1,82 @@
+import chromadb
+from chromadb.config import Settings
+from typing import Dict
+from database_manager import DatabaseManager
+
+
+class LocalRetriever():
+    def __init__(self, db_manager: DatabaseManager, collection_name: str) -> None:
+        """
+        Local retriever class constructor. Queries a local database through the DatabaseManager.
+
+        Args:
+            db_manager (DatabaseManager): The database manager holding the database.
+            collection_name (str): The name of the collection to query.
+        """
+        self.name = "local"
+        self.db_manager = db_manager
+        self.collection_name = collection_name
+
+    def retrieve(self, query: str, n_results: int) -> Dict:
+        """
+        Retrieves the chunks closest to a query.
+
+        Args:
+            query (str): The question.
+            n_results (int): Number of chunks to retrieve.
+
+        Returns:
+            Dict: The retrieved "documents", "metadatas" and "distances", in rank order.
+        """
+        results = self.db_manager.query_collection(
+            collection_name=self.collection_name, query_text=query, n_results=n_results)
+        return {
+            "documents": results["documents"][0],
+            "metadatas": results["metadatas"][0],
+            "distances": results["distances"][0],
+        }
+
+
+class RemoteChromaRetriever():
+    def __init__(self, collection_name: str, ip: str = "localhost", port: int = 8000) -> None:
+        """
+        Remote ChromaDB retriever class constructor. Queries a collection of the ChromaDB server directly with
+        the raw question, so the measures include the network and the server. The query improvement and the
+        document and page filters of the AI assistant are not applied.
+
+        Args:
+            collection_name (str): The name of the collection to query.
+            ip (str, optional): ChromaDB server IP address. Defaults to "localhost".
+            port (int, optional): ChromaDB server port. Defaults to 8000.
+        """
+        self.name = "remote"
+        self.client = chromadb.HttpClient(
+            host=ip,
+            port=port,
+            settings=Settings(
+                chroma_server_ssl_verify=False
+            )
+        )
+        self.client.heartbeat()
+        self.collection = self.client.get_collection(name=collection_name)
+
+    def retrieve(self, query: str, n_results: int) -> Dict:
+        """
+        Retrieves the chunks closest to a query.
+
+        Args:
+            query (str): The question.
+            n_results (int): Number of chunks to retrieve.
+
+        Returns:
+            Dict: The retrieved "documents", "metadatas" and "distances", in rank order.
+        """
+        results = self.collection.query(
+            query_texts=[query],
+            n_results=n_results,
+        )
+        return {
+            "documents": results["documents"][0],
+            "metadatas": results["metadatas"][0],
+            "distances": results["distances"][0],
+        }
@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from rich.console import Console
+from rich.table import Table
+from database_manager import DatabaseManager
+from retrieval_metrics import load_question_set, match_answers, ndcg_at_k, percentile, recall_at_k, reciprocal_rank
+from benchmark.retrievers import LocalRetriever, RemoteChromaRetriever
+
+# Initialize Rich console for pretty printing
+console = Console()
+
+# Metrics where a lower value is better, used when comparing with a baseline
+LOWER_IS_BETTER = {"latency_p50_ms", "latency_p95_ms"}
+
+
+def evaluate(retriever, questions: List[Dict], k: int) -> Dict:
+    """
+    Runs every question once through a retriever, measuring the retrieval quality and the latency.
+
+    Args:
+        retriever (LocalRetriever | RemoteChromaRetriever): The retriever to evaluate.
+        questions (List[Dict]): The questions with their expected answers.
+        k (int): Number of chunks retrieved per question.
+
+    Returns:
+        Dict: The aggregated "metrics" and the "questions" details.
+    """
+    # Warm up the embedding model and the index so the first question is not penalized
+    retriever.retrieve(questions[0]["question"], k)
+    details = []
+    for question in questions:
+        start = time.perf_counter()
+        results = retriever.retrieve(question["question"], k)
+        latency_ms = (time.perf_counter() - start) * 1000
+        matches = match_answers(results["metadatas"], question["answers"])
+        n_answers = len(question["answers"])
+        details.append({
+            "question": question["question"],
+            "recall": recall_at_k(matches, n_answers, k),
+            "ndcg": ndcg_at_k(matches, n_answers, k),
+            "reciprocal_rank": reciprocal_rank(matches),
+            "latency_ms": latency_ms,
+            "retrieved": [
+                {
+                    "document_name": (metadata or {}).get("document_name"),
+                    "page_number": (metadata or {}).get("page_number"),
+                    "distance": distance,
+                    "relevant": match is not None,
+                }
+                for metadata, distance, match in zip(results["metadatas"], results["distances"], matches)
+            ],
+        })
+    latencies = [detail["latency_ms"] for detail in details]
+    return {
+        "metrics": {
+            "recall_at_k": sum(detail["recall"] for detail in details) / len(details),
+            "ndcg_at_k": sum(detail["ndcg"] for detail in details) / len(details),
+            "mrr": sum(detail["reciprocal_rank"] for detail in details) / len(details),
+            "latency_p50_ms": percentile(latencies, 50),
+            "latency_p95_ms": percentile(latencies, 95),
+        },
+        "questions": details,
+    }
+
+
+def measure_throughput(retriever, questions: List[Dict], k: int, concurrency: int, repeats: int) -> float:
+    """
+    Measures how many questions per second a retriever answers with concurrent clients.
+
+    Args:
+        retriever (LocalRetriever | RemoteChromaRetriever): The retriever to measure.
+        questions (List[Dict]): The questions to ask.
+        k (int): Number of chunks retrieved per question.
+        concurrency (int): Number of questions asked at the same time.
+        repeats (int): Number of times the whole question set is asked.
+
+    Returns:
+        float: The throughput in questions per second.
+    """
+    queries = [question["question"] for question in questions] * repeats
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda query: retriever.retrieve(query, k), queries))
+    return len(queries) / (time.perf_counter() - start)
+
+
+def print_report(report: Dict, baseline: Dict = None) -> None:
+    """
+    Prints the metrics of every retriever, with the change from the baseline when there is one.
+
+    Args:
+        report (Dict): The benchmark report.
+        baseline (Dict, optional): A previous benchmark report. Defaults to None.
+    """
+    table = Table(
+        title=f"Retrieval benchmark ({report['n_questions']} questions, k={report['k']})")
+    table.add_column("Metric", style="cyan", no_wrap=True)
+    for name in report["runs"]:
+        table.add_column(name, style="green")
+    metric_names = next(iter(report["runs"].values()))["metrics"].keys()
+    for metric in metric_names:
+        row = [metric]
+        for name, run in report["runs"].items():
+            value = run["metrics"][metric]
+            cell = f"{value:.3f}"
+            previous = (baseline or {}).get("runs", {}).get(
+                name, {}).get("metrics", {}).get(metric)
+            if previous is not None:
+                delta = value - previous
+                worse = delta > 0 if metric in LOWER_IS_BETTER else delta < 0
+                color = "red" if worse and abs(delta) > 1e-9 else "green"
+                cell += f" [{color}]({delta:+.3f})[/{color}]"
+            row.append(cell)
+        table.add_row(*row)
+    console.print(table)
+
+
+def main() -> None:
+    """Runs the retrieval benchmark on the golden question set and writes the JSON report."""
+    current_script_path = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(
+        description="Benchmark the retrieval quality and latency of the database")
+    parser.add_argument(
+        "--questions", "-q",
+        type=str,
+        default=os.path.join(current_script_path, "..", "question_set.yaml"),
+        help="YAML question set with the expected answers (default: ../question_set.yaml)"
+    )
+    parser.add_argument(
+        "--mode", "-m",
+        type=str,
+        choices=["local", "remote", "both"],
+        default="local",
+        help="Query the local database, the ChromaDB server directly (without the query improvement of the AI assistant), or both (default: local)"
+    )
+    parser.add_argument(
+        "--db_path", "-d",
+        type=str,
+        default="./chroma_db",
+        help="Path to the local ChromaDB database (default: ./chroma_db)"
+    )
+    parser.add_argument(
+        "--ip", "-i",
+        type=str,
+        default="localhost",
+        help="ChromaDB server IP address (default: localhost)"
+    )
+    parser.add_argument(
+        "--port", "-p",
+        type=int,
+        default=8000,
+        help="ChromaDB server port (default: 8000)"
+    )
+    parser.add_argument(
+        "--collection", "-c",
+        type=str,
+        default="documents",
+        help="Collection to query (default: documents)"
+    )
+    parser.add_argument(
+        "--k", "-k",
+        type=int,
+        default=5,
+        help="Number of chunks retrieved per question (default: 5)"
+    )
+    parser.add_argument(
+        "--device", "-dev",
+        type=str,
+        default="cpu",
+        help="Device to use for embedding (cpu or cuda) (default: cpu)"
+    )
+    parser.add_argument(
+        "--concurrency", "-n",
+        type=int,
+        default=4,
+        help="Number of concurrent questions when measuring the throughput (default: 4)"
+    )
+    parser.add_argument(
+        "--repeats", "-r",
+        type=int,
+        default=3,
+        help="Times the question set is asked when measuring the throughput (default: 3)"
+    )
+    parser.add_argument(
+        "--output", "-o",
+        type=str,
+        default="benchmark_results.json",
+        help="Path of the JSON report (default: benchmark_results.json)"
+    )
+    parser.add_argument(
+        "--baseline", "-b",
+        type=str,
+        default=None,
+        help="JSON report of a previous release to compare with"
+    )
+    args = parser.parse_args()
+
+    questions = load_question_set(args.questions)
+    if not questions:
+        raise ValueError(f"No questions found in {args.questions}")
+    retrievers = []
+    if args.mode in ("local", "both"):
+        db_manager = DatabaseManager(db_path=args.db_path, device=args.device)
+        retrievers.append(LocalRetriever(db_manager, args.collection))
+    if args.mode in ("remote", "both"):
+        retrievers.append(RemoteChromaRetriever(
+            args.collection, ip=args.ip, port=args.port))
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "questions_file": os.path.abspath(args.questions),
+        "collection": args.collection,
+        "k": args.k,
+        "n_questions": len(questions),
+        "runs": {},
+    }
+    for retriever in retrievers:
+        console.print(f"Running the benchmark on the {retriever.name} retriever...")
+        run = evaluate(retriever, questions, args.k)
+        run["metrics"]["throughput_qps"] = measure_throughput(
+            retriever, questions, args.k, args.concurrency, args.repeats)
+        report["runs"][retriever.name] = run
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+    print_report(report, baseline)
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    console.print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
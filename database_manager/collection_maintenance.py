@@ -0,0 +1,550 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+from collection_manifest import CollectionManifest
+from database_manager import DatabaseManager
+from retrieval_metrics import percentile
+
+# Initialize Rich console for pretty printing
+console = Console()
+
+
+class CollectionMaintenance():
+    def __init__(self, db_manager: DatabaseManager, collection_name: str, near_threshold: float = 0.98) -> None:
+        """
+        Collection maintenance class constructor. Reports the health of a collection (chunk lengths, duplicated
+        chunks, orphaned documents, size on disk and query latency) and cleans it up: removes duplicated and
+        orphaned chunks and compacts the collection by copying it to a fresh one.
+
+        Args:
+            db_manager (DatabaseManager): The database manager holding the collection.
+            collection_name (str): The name of the collection.
+            near_threshold (float, optional): Cosine similarity from which two chunks are near duplicates.
+                Defaults to 0.98.
+        """
+        self.db_manager = db_manager
+        self.collection_name = collection_name
+        self.near_threshold = near_threshold
+        self.manifest = CollectionManifest(db_manager.db_path, collection_name)
+        self.temporary_name = f"{collection_name}__compact"
+        self.recover_compaction()
+        self.collection = db_manager.client.get_collection(
+            name=collection_name, embedding_function=db_manager.ef)
+
+    def recover_compaction(self) -> None:
+        """
+        Finishes or cleans up a compaction that was interrupted. The temporary copy replaces the collection
+        when the collection is missing, empty or incomplete while the copy has every expected chunk. It is
+        only deleted when the collection itself holds every expected chunk.
+
+        Raises:
+            RuntimeError: If neither the collection nor the temporary copy holds the expected chunks.
+        """
+        client = self.db_manager.client
+        existing = {collection.name for collection in client.list_collections()}
+        if self.temporary_name not in existing:
+            return
+        temporary = client.get_collection(
+            name=self.temporary_name, embedding_function=self.db_manager.ef)
+        original = client.get_collection(
+            name=self.collection_name, embedding_function=self.db_manager.ef
+        ) if self.collection_name in existing else None
+        original_count = original.count() if original is not None else 0
+        # The manifest knows how many chunks the collection should hold, without it trust a non-empty original
+        expected_count = sum(len(entry["chunk_ids"]) for entry in self.manifest.documents.values()) \
+            if self.manifest.documents else original_count
+        if original_count > 0 and original_count == expected_count:
+            # Left over by a compaction interrupted before the original was replaced
+            client.delete_collection(name=self.temporary_name)
+            print(
+                f"Deleted the incomplete compaction copy of collection '{self.collection_name}'.")
+            return
+        if temporary.count() == 0:
+            # Nothing was copied yet
+            client.delete_collection(name=self.temporary_name)
+            return
+        if temporary.count() >= expected_count and temporary.count() > original_count:
+            # The copy was complete, the compaction stopped while replacing the original
+            if original is not None:
+                client.delete_collection(name=self.collection_name)
+            temporary.modify(name=self.collection_name)
+            print(
+                f"Restored collection '{self.collection_name}' from its compaction copy ({temporary.count()} chunks).")
+            return
+        raise RuntimeError(
+            f"Collection '{self.collection_name}' ({original_count} chunks) and its compaction copy "
+            f"'{self.temporary_name}' ({temporary.count()} chunks) both differ from the {expected_count} "
+            f"expected chunks, inspect them before deleting either one.")
+
+    def iter_batches(self, include: List[str]):
+        """
+        Reads the whole collection in batches.
+
+        Args:
+            include (List[str]): The fields to read, as in ChromaDB get.
+
+        Yields:
+            Dict: The ChromaDB get result of each batch.
+        """
+        offset = 0
+        while True:
+            batch = self.collection.get(
+                limit=self.db_manager.batch_size, offset=offset, include=include)
+            if not batch["ids"]:
+                return
+            offset += len(batch["ids"])
+            yield batch
+
+    def scan(self) -> Dict[str, Dict]:
+        """
+        Reads the length, content hash and document of every chunk, without keeping the texts in memory.
+
+        Returns:
+            Dict[str, Dict]: The "length", "text_hash" and "document_name" of each chunk id.
+        """
+        chunks = {}
+        for batch in self.iter_batches(["documents", "metadatas"]):
+            for chunk_id, text, metadata in zip(batch["ids"], batch["documents"], batch["metadatas"]):
+                text = text or ""
+                # Whitespace and case changes do not make a chunk different
+                normalized = re.sub(r"\s+", " ", text).strip().lower()
+                chunks[chunk_id] = {
+                    "length": len(text),
+                    "text_hash": hashlib.sha256(normalized.encode("utf-8")).hexdigest(),
+                    "document_name": (metadata or {}).get("document_name"),
+                }
+        return chunks
+
+    def length_stats(self, chunks: Dict[str, Dict], short_chunk: int = 50) -> Dict:
+        """
+        Computes the distribution of the chunk lengths, in characters.
+
+        Args:
+            chunks (Dict[str, Dict]): The chunks returned by scan.
+            short_chunk (int, optional): Chunks below this length are counted as too short. Defaults to 50.
+
+        Returns:
+            Dict: The count, mean, percentiles, number of short chunks and a histogram of the lengths.
+        """
+        lengths = [chunk["length"] for chunk in chunks.values()]
+        if not lengths:
+            return {"count": 0}
+        bins = [0, short_chunk, 250, 500, 1000, 2000, 4000]
+        histogram = {}
+        for lower, upper in zip(bins, bins[1:] + [None]):
+            label = f"{lower}-{upper}" if upper is not None else f"{lower}+"
+            histogram[label] = sum(1 for length in lengths
+                                   if length >= lower and (upper is None or length < upper))
+        return {
+            "count": len(lengths),
+            "mean": sum(lengths) / len(lengths),
+            "min": min(lengths),
+            "p50": percentile(lengths, 50),
+            "p90": percentile(lengths, 90),
+            "p99": percentile(lengths, 99),
+            "max": max(lengths),
+            "short_chunks": sum(1 for length in lengths if length < short_chunk),
+            "histogram": histogram,
+        }
+
+    def find_exact_duplicates(self, chunks: Dict[str, Dict]) -> List[List[str]]:
+        """
+        Groups the chunks holding the same text.
+
+        Args:
+            chunks (Dict[str, Dict]): The chunks returned by scan.
+
+        Returns:
+            List[List[str]]: The chunk ids of every group of duplicates, the chunk to keep first.
+        """
+        groups: Dict[str, List[str]] = {}
+        for chunk_id, chunk in chunks.items():
+            groups.setdefault(chunk["text_hash"], []).append(chunk_id)
+        return [self._keep_order(chunk_ids, chunks) for chunk_ids in groups.values() if len(chunk_ids) > 1]
+
+    def find_near_duplicates(self, chunks: Dict[str, Dict]) -> List[Tuple[str, str, float]]:
+        """
+        Finds the pairs of different chunks whose embeddings are almost the same, using the index itself
+        to look up the closest neighbours of every chunk.
+
+        Args:
+            chunks (Dict[str, Dict]): The chunks returned by scan.
+
+        Returns:
+            List[Tuple[str, str, float]]: The chunk to keep, the near duplicate and their cosine similarity.
+        """
+        pairs = {}
+        n_neighbours = min(3, len(chunks))
+        for batch in self.iter_batches(["embeddings"]):
+            results = self.collection.query(query_embeddings=batch["embeddings"], n_results=n_neighbours,
+                                            include=["embeddings"])
+            for chunk_id, embedding, neighbour_ids, neighbour_embeddings in zip(
+                    batch["ids"], batch["embeddings"], results["ids"], results["embeddings"]):
+                embedding = np.asarray(embedding, dtype=np.float32)
+                for neighbour_id, neighbour_embedding in zip(neighbour_ids, neighbour_embeddings):
+                    if neighbour_id == chunk_id or chunks[neighbour_id]["text_hash"] == chunks[chunk_id]["text_hash"]:
+                        continue
+                    neighbour_embedding = np.asarray(
+                        neighbour_embedding, dtype=np.float32)
+                    norm = np.linalg.norm(embedding) * \
+                        np.linalg.norm(neighbour_embedding)
+                    similarity = float(
+                        np.dot(embedding, neighbour_embedding) / norm) if norm > 0 else 0.0
+                    if similarity < self.near_threshold:
+                        continue
+                    keep_id, duplicate_id = self._keep_order(
+                        [chunk_id, neighbour_id], chunks)
+                    pairs[(keep_id, duplicate_id)] = similarity
+        return [(keep_id, duplicate_id, similarity) for (keep_id, duplicate_id), similarity in sorted(pairs.items())]
+
+    def find_orphans(self, chunks: Dict[str, Dict]) -> Dict[str, List[str]]:
+        """
+        Finds the documents and chunks that are out of sync with the collection manifest.
+
+        Args:
+            chunks (Dict[str, Dict]): The chunks returned by scan.
+
+        Returns:
+            Dict[str, List[str]]: The "unlisted_documents" (chunks in the collection, not in the manifest),
+                "missing_files" (in the manifest, file no longer on disk), "missing_chunks" (in the manifest,
+                chunks gone from the collection) and "stray_chunks" (chunk ids no manifest entry owns).
+        """
+        collection_documents = {chunk["document_name"]
+                                for chunk in chunks.values()}
+        owned_ids = {chunk_id for entry in self.manifest.documents.values()
+                     for chunk_id in entry["chunk_ids"]}
+        return {
+            "unlisted_documents": sorted(name for name in collection_documents
+                                         if name not in self.manifest.documents),
+            "missing_files": sorted(name for name, entry in self.manifest.documents.items()
+                                    if not os.path.exists(entry["path"])),
+            "missing_chunks": sorted(name for name, entry in self.manifest.documents.items()
+                                     if not any(chunk_id in chunks for chunk_id in entry["chunk_ids"])),
+            # Without a manifest every chunk would be stray, so only report them for managed collections
+            "stray_chunks": sorted(chunk_id for chunk_id in chunks
+                                   if chunk_id not in owned_ids) if self.manifest.documents else [],
+        }
+
+    def disk_usage(self) -> Dict[str, int]:
+        """
+        Measures the size of the database on disk. ChromaDB stores the records of every collection in a
+        single SQLite file and the vector index of each collection in its own folder.
+
+        Returns:
+            Dict[str, int]: The "sqlite_bytes", "index_bytes" and "total_bytes" of the database.
+        """
+        sqlite_bytes = 0
+        index_bytes = 0
+        for root, _, files in os.walk(self.db_manager.db_path):
+            relative = os.path.relpath(root, self.db_manager.db_path)
+            # Caches and manifests live next to the database but are not part of it
+            if relative.split(os.sep)[0] in ("conversion_cache", "manifests"):
+                continue
+            for name in files:
+                size = os.path.getsize(os.path.join(root, name))
+                if relative == "." and name.startswith("chroma.sqlite3"):
+                    sqlite_bytes += size
+                elif relative != ".":
+                    index_bytes += size
+        return {"sqlite_bytes": sqlite_bytes, "index_bytes": index_bytes, "total_bytes": sqlite_bytes + index_bytes}
+
+    def sample_latency(self, n_samples: int = 20, n_results: int = 5, seed: int = 0) -> Dict:
+        """
+        Measures the query latency with questions built from random chunks of the collection.
+
+        Args:
+            n_samples (int, optional): Number of queries. Defaults to 20.
+            n_results (int, optional): Number of results per query. Defaults to 5.
+            seed (int, optional): Seed of the chunk sampling. Defaults to 0.
+
+        Returns:
+            Dict: The number of samples and the p50, p95 and max latencies in milliseconds.
+        """
+        count = self.collection.count()
+        if count == 0 or n_samples <= 0:
+            return {"samples": 0}
+        rng = random.Random(seed)
+        queries = []
+        for offset in rng.sample(range(count), min(n_samples, count)):
+            text = self.collection.get(limit=1, offset=offset, include=["documents"])[
+                "documents"][0] or ""
+            queries.append(text[:200])
+        # Warm up the model and the index so the first query is not penalized
+        self.db_manager.query_collection(
+            self.collection_name, queries[0], n_results=n_results)
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            self.db_manager.query_collection(
+                self.collection_name, query, n_results=n_results)
+            latencies.append((time.perf_counter() - start) * 1000)
+        return {
+            "samples": len(latencies),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "max_ms": max(latencies),
+        }
+
+    def report(self, near_duplicates: bool = True, n_samples: int = 20) -> Dict:
+        """
+        Builds the health report of the collection.
+
+        Args:
+            near_duplicates (bool, optional): Look for near duplicates, which queries the whole index. Defaults to True.
+            n_samples (int, optional): Number of queries used to measure the latency. Defaults to 20.
+
+        Returns:
+            Dict: The report.
+        """
+        chunks = self.scan()
+        exact = self.find_exact_duplicates(chunks)
+        near = self.find_near_duplicates(
+            chunks) if near_duplicates and chunks else []
+        return {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "collection": self.collection_name,
+            "n_chunks": len(chunks),
+            "n_documents": len({chunk["document_name"] for chunk in chunks.values()}),
+            "lengths": self.length_stats(chunks),
+            "exact_duplicates": {
+                "groups": len(exact),
+                "redundant_chunks": sum(len(group) - 1 for group in exact),
+                "examples": exact[:10],
+            },
+            "near_duplicates": {
+                "threshold": self.near_threshold,
+                "pairs": len(near),
+                "examples": [list(pair) for pair in near[:10]],
+            } if near_duplicates else None,
+            "orphans": self.find_orphans(chunks),
+            "disk": self.disk_usage(),
+            "latency": self.sample_latency(n_samples),
+        }
+
+    def deduplicate(self, exact_duplicates: bool = True, near_duplicates: bool = False,
+                    prune_orphans: bool = False) -> int:
+        """
+        Deletes the redundant chunks of the collection, keeping one chunk of every group of duplicates,
+        and updates the manifest so the next sync does not bring them back.
+
+        Args:
+            exact_duplicates (bool, optional): Delete the exact duplicates. Defaults to True.
+            near_duplicates (bool, optional): Also delete the near duplicates. Defaults to False.
+            prune_orphans (bool, optional): Also delete the chunks of documents not in the manifest
+                and the chunks no manifest entry owns. Defaults to False.
+
+        Returns:
+            int: The number of deleted chunks.
+        """
+        chunks = self.scan()
+        to_delete = set()
+        if exact_duplicates:
+            to_delete.update(chunk_id for group in self.find_exact_duplicates(
+                chunks) for chunk_id in group[1:])
+        if near_duplicates:
+            for keep_id, duplicate_id, _ in self.find_near_duplicates(chunks):
+                # Never delete a chunk that was kept in place of another one
+                if keep_id not in to_delete:
+                    to_delete.add(duplicate_id)
+        if prune_orphans and self.manifest.documents:
+            orphans = self.find_orphans(chunks)
+            to_delete.update(orphans["stray_chunks"])
+            unlisted = set(orphans["unlisted_documents"])
+            to_delete.update(chunk_id for chunk_id, chunk in chunks.items()
+                             if chunk["document_name"] in unlisted)
+        self.db_manager._delete_chunks(self.collection, sorted(to_delete))
+        if to_delete and self.manifest.documents:
+            for entry in self.manifest.documents.values():
+                entry["chunk_ids"] = [chunk_id for chunk_id in entry["chunk_ids"]
+                                      if chunk_id not in to_delete]
+            self.manifest.save()
+        print(
+            f"Deleted {len(to_delete)} chunks from collection '{self.collection_name}'.")
+        return len(to_delete)
+
+    def compact(self) -> None:
+        """
+        Rebuilds the collection from its stored records and embeddings, without embedding anything again.
+        Deleted chunks stay in the vector index until it is rebuilt, so this frees their space and keeps
+        the searches fast after many updates. The records are copied to a temporary collection, which
+        replaces the original once complete. If the run is interrupted, recover_compaction (called when the
+        class is built again) keeps whichever of the two is complete.
+        """
+        self.recover_compaction()
+        self.collection = self.db_manager.client.get_collection(
+            name=self.collection_name, embedding_function=self.db_manager.ef)
+        destination = self.db_manager.client.create_collection(
+            name=self.temporary_name, metadata=self.collection.metadata, embedding_function=self.db_manager.ef)
+        for batch in self.iter_batches(["documents", "metadatas", "embeddings"]):
+            destination.add(ids=batch["ids"], documents=batch["documents"],
+                            metadatas=batch["metadatas"], embeddings=batch["embeddings"])
+        if destination.count() != self.collection.count():
+            raise RuntimeError(
+                f"Compaction of collection '{self.collection_name}' copied {destination.count()} of "
+                f"{self.collection.count()} chunks, the original collection was kept.")
+        self.db_manager.client.delete_collection(name=self.collection_name)
+        destination.modify(name=self.collection_name)
+        self.collection = destination
+        print(
+            f"Compacted collection '{self.collection_name}' ({destination.count()} chunks).")
+
+    def _keep_order(self, chunk_ids: List[str], chunks: Dict[str, Dict]) -> List[str]:
+        """
+        Sorts duplicated chunks so the one to keep comes first, deterministically.
+
+        Args:
+            chunk_ids (List[str]): The duplicated chunk ids.
+            chunks (Dict[str, Dict]): The chunks returned by scan.
+
+        Returns:
+            List[str]: The sorted chunk ids.
+        """
+        return sorted(chunk_ids, key=lambda chunk_id: (chunks[chunk_id]["document_name"] or "", chunk_id))
+
+
+def print_report(report: Dict) -> None:
+    """
+    Prints the health report of a collection.
+
+    Args:
+        report (Dict): The report built by CollectionMaintenance.report.
+    """
+    table = Table(
+        title=f"Collection '{report['collection']}' ({report['n_chunks']} chunks, {report['n_documents']} documents)")
+    table.add_column("Check", style="cyan", no_wrap=True)
+    table.add_column("Value", style="green")
+    lengths = report["lengths"]
+    if lengths["count"]:
+        table.add_row("Chunk length (chars)",
+                      f"mean {lengths['mean']:.0f}, p50 {lengths['p50']:.0f}, p90 {lengths['p90']:.0f}, "
+                      f"p99 {lengths['p99']:.0f}, min {lengths['min']}, max {lengths['max']}")
+        table.add_row("Length histogram", ", ".join(
+            f"{label}: {count}" for label, count in lengths["histogram"].items()))
+        table.add_row("Short chunks", str(lengths["short_chunks"]))
+    table.add_row("Exact duplicates",
+                  f"{report['exact_duplicates']['redundant_chunks']} redundant chunks in "
+                  f"{report['exact_duplicates']['groups']} groups")
+    if report["near_duplicates"] is not None:
+        table.add_row("Near duplicates",
+                      f"{report['near_duplicates']['pairs']} pairs (cosine >= {report['near_duplicates']['threshold']})")
+    for name, values in report["orphans"].items():
+        table.add_row(name.replace("_", " ").capitalize(), str(len(values)) + (
+            f" ({', '.join(values[:5])}{', ...' if len(values) > 5 else ''})" if values else ""))
+    disk = report["disk"]
+    table.add_row("Database size on disk",
+                  f"{disk['total_bytes'] / 2**20:.1f} MiB (records {disk['sqlite_bytes'] / 2**20:.1f} MiB, "
+                  f"vector indexes {disk['index_bytes'] / 2**20:.1f} MiB)")
+    latency = report["latency"]
+    if latency["samples"]:
+        table.add_row("Query latency",
+                      f"p50 {latency['p50_ms']:.1f} ms, p95 {latency['p95_ms']:.1f} ms, "
+                      f"max {latency['max_ms']:.1f} ms ({latency['samples']} samples)")
+    console.print(table)
+
+
+def main() -> None:
+    """Reports the health of a collection and optionally deduplicates and compacts it."""
+    parser = argparse.ArgumentParser(
+        description="Collection statistics, health report and maintenance")
+    parser.add_argument(
+        "--db_path", "-d",
+        type=str,
+        default="./chroma_db",
+        help="Path to the ChromaDB database (default: ./chroma_db)"
+    )
+    parser.add_argument(
+        "--collection", "-c",
+        type=str,
+        default="documents",
+        help="Collection to inspect (default: documents)"
+    )
+    parser.add_argument(
+        "--model", "-m",
+        type=str,
+        default="Qwen/Qwen3-Embedding-0.6B",
+        help="Embedding model of the collection, used for the latency samples (default: Qwen/Qwen3-Embedding-0.6B)"
+    )
+    parser.add_argument(
+        "--device", "-dev",
+        type=str,
+        default="cpu",
+        help="Device to use for embedding (cpu or cuda) (default: cpu)"
+    )
+    parser.add_argument(
+        "--near_threshold", "-t",
+        type=float,
+        default=0.98,
+        help="Cosine similarity from which two chunks are near duplicates (default: 0.98)"
+    )
+    parser.add_argument(
+        "--skip_near",
+        action="store_true",
+        help="Do not look for near duplicates, which queries the whole index"
+    )
+    parser.add_argument(
+        "--samples", "-n",
+        type=int,
+        default=20,
+        help="Number of queries used to measure the latency (default: 20)"
+    )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Delete the exact duplicated chunks, keeping one of each"
+    )
+    parser.add_argument(
+        "--dedupe_near",
+        action="store_true",
+        help="With --dedupe, also delete the near duplicated chunks"
+    )
+    parser.add_argument(
+        "--prune_orphans",
+        action="store_true",
+        help="Delete the chunks of documents missing from the collection manifest"
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Rebuild the collection from its stored embeddings to reclaim the space of deleted chunks"
+    )
+    parser.add_argument(
+        "--output", "-o",
+        type=str,
+        default=None,
+        help="Path of a JSON file to write the report to"
+    )
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(db_path=args.db_path, device=args.device,
+                                 embedding_model_name=args.model, ocr_mode="off")
+    maintenance = CollectionMaintenance(
+        db_manager, args.collection, near_threshold=args.near_threshold)
+    report = maintenance.report(
+        near_duplicates=not args.skip_near, n_samples=args.samples)
+    print_report(report)
+    if args.dedupe or args.prune_orphans:
+        maintenance.deduplicate(exact_duplicates=args.dedupe, near_duplicates=args.dedupe and args.dedupe_near,
+                                prune_orphans=args.prune_orphans)
+    if args.compact:
+        maintenance.compact()
+    if args.dedupe or args.prune_orphans or args.compact:
+        report["after"] = maintenance.report(
+            near_duplicates=not args.skip_near, n_samples=args.samples)
+        console.print("After maintenance:")
+        print_report(report["after"])
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+        console.print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
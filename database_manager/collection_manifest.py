@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+
+class CollectionManifest():
+    def __init__(self, db_path: str, collection_name: str) -> None:
+        """
+        Collection manifest class constructor. Keeps, for every document of a collection, the hash of the
+        file content and the ids of its chunks, alongside the chunker and embedding model used to build it.
+        The manifest is stored as a JSON file next to the database.
+
+        Args:
+            db_path (str): Database path.
+            collection_name (str): The name of the collection described by the manifest.
+        """
+        self.collection_name = collection_name
+        self.path = os.path.join(db_path, "manifests", f"{collection_name}.json")
+        self.config: Dict = {}
+        self.documents: Dict[str, Dict] = {}
+        self.load()
+
+    @staticmethod
+    def file_hash(document_path: str, block_size: int = 1 << 20) -> str:
+        """
+        Computes the SHA-256 of a file content.
+
+        Args:
+            document_path (str): The file path.
+            block_size (int, optional): Number of bytes read at a time. Defaults to 1 MiB.
+
+        Returns:
+            str: The hexadecimal digest.
+        """
+        digest = hashlib.sha256()
+        with open(document_path, "rb") as file:
+            for block in iter(lambda: file.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def load(self) -> None:
+        """Loads the manifest from disk, starting empty if it does not exist yet."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as file:
+            data = json.load(file)
+        self.config = data.get("config", {})
+        self.documents = data.get("documents", {})
+
+    def save(self) -> None:
+        """Writes the manifest to disk, replacing the previous file atomically."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w") as file:
+            json.dump({"config": self.config, "documents": self.documents},
+                      file, indent=2, sort_keys=True)
+        os.replace(temporary_path, self.path)
+
+    def matches_config(self, config: Dict) -> bool:
+        """
+        Checks if the collection was built with the given chunker and embedding model.
+        An empty manifest matches any configuration.
+
+        Args:
+            config (Dict): The current chunker and embedding configuration.
+
+        Returns:
+            bool: True if the stored chunks can be kept.
+        """
+        return not self.documents or self.config == config
+
+    def find_by_hash(self, document_hash: str) -> Optional[str]:
+        """
+        Finds the document holding a given content.
+
+        Args:
+            document_hash (str): The content hash.
+
+        Returns:
+            Optional[str]: The document name, or None if no document has this content.
+        """
+        for document_name, entry in self.documents.items():
+            if entry["sha256"] == document_hash:
+                return document_name
+        return None
+
+    def record(self, document_name: str, document_path: str, document_hash: str, chunk_ids: List[str]) -> None:
+        """
+        Records the chunks written for a document.
+
+        Args:
+            document_name (str): The name of the document.
+            document_path (str): The file path of the document.
+            document_hash (str): The content hash.
+            chunk_ids (List[str]): The ids of the document chunks.
+        """
+        self.documents[document_name] = {
+            "path": document_path,
+            "sha256": document_hash,
+            "chunk_ids": chunk_ids,
+            "ingested_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+    def remove(self, document_name: str) -> List[str]:
+        """
+        Removes a document from the manifest.
+
+        Args:
+            document_name (str): The name of the document.
+
+        Returns:
+            List[str]: The ids of the chunks the document had.
+        """
+        entry = self.documents.pop(document_name, None)
+        return entry["chunk_ids"] if entry else []
@@ -0,0 +1,91 @@
+import gzip
+import hashlib
+import json
+import os
+from importlib.metadata import PackageNotFoundError, version
+from typing import Dict, Optional
+from docling_core.types.doc import DoclingDocument
+
+
+class ConversionCache():
+    def __init__(self, cache_dir: str) -> None:
+        """
+        Conversion cache class constructor. Stores the documents converted by docling as compressed JSON,
+        keyed by the file content hash and the conversion options, so chunking or embedding experiments
+        do not need to convert the documents again.
+
+        Args:
+            cache_dir (str): Folder holding the cached documents.
+        """
+        self.cache_dir = cache_dir
+        # A new docling release may convert the same file differently
+        try:
+            self.docling_version = version("docling")
+        except PackageNotFoundError:
+            self.docling_version = "unknown"
+
+    def load(self, document_hash: str, options: Dict) -> Optional[DoclingDocument]:
+        """
+        Loads a converted document from the cache.
+
+        Args:
+            document_hash (str): The hash of the document content.
+            options (Dict): The conversion options.
+
+        Returns:
+            Optional[DoclingDocument]: The converted document, or None if it is not cached or unreadable.
+        """
+        path = self._get_path(document_hash, options)
+        if not os.path.exists(path):
+            return None
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                return DoclingDocument.model_validate_json(file.read())
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable cached conversion '{path}': {e}")
+            return None
+
+    def contains(self, document_hash: str, options: Dict) -> bool:
+        """
+        Checks if a converted document is in the cache.
+
+        Args:
+            document_hash (str): The hash of the document content.
+            options (Dict): The conversion options.
+
+        Returns:
+            bool: True if the document is cached.
+        """
+        return os.path.exists(self._get_path(document_hash, options))
+
+    def store(self, document_hash: str, options: Dict, dl_doc: DoclingDocument) -> None:
+        """
+        Stores a converted document in the cache.
+
+        Args:
+            document_hash (str): The hash of the document content.
+            options (Dict): The conversion options.
+            dl_doc (DoclingDocument): The converted document.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._get_path(document_hash, options)
+        # Write to a temporary file first so an interrupted run never leaves a truncated entry
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(temporary_path, "wt", encoding="utf-8", compresslevel=5) as file:
+            file.write(dl_doc.model_dump_json())
+        os.replace(temporary_path, path)
+
+    def _get_path(self, document_hash: str, options: Dict) -> str:
+        """
+        Builds the cache file path of a document.
+
+        Args:
+            document_hash (str): The hash of the document content.
+            options (Dict): The conversion options.
+
+        Returns:
+            str: The cache file path.
+        """
+        key = json.dumps({"sha256": document_hash, "options": options,
+                         "docling": self.docling_version}, sort_keys=True)
+        return os.path.join(self.cache_dir, f"{hashlib.sha256(key.encode()).hexdigest()}.json.gz")
@@ -1,12 +1,26 @@
-import chromadb
+import argparse
+import time
 from rich.console import Console
 from rich.table import Table
+from database_manager import DatabaseManager
+from retrieval_metrics import load_question_set, match_answers, percentile, recall_at_k, reciprocal_rank
 
 # Initialize Rich console for pretty printing
 console = Console()
 
+# Questions used when no question set is given, they have no expected answers so only latency is measured
+DEFAULT_QUESTIONS = [
+    "Quais são os compromissos da Santo Antônio Energia em relação à saúde, segurança e meio ambiente?",
+    "Como a Santo Antônio Energia promove a participação das partes interessadas no Sistema de Gestão Integrada?",
+    "Quais são os principais critérios para que a Área de TI da Santo Antônio Energia defina o nível de apoio aos sistemas?",
+    "O que acontece quando um fornecedor obtém um IDF inferior a 70?",
+    "Quais são os limites de reembolso para refeições durante viagens corporativas?"
+]
 
-def get_db_results(db_path: str, collection_name: str, queries: list[str], n_results: int = 2) -> list[dict]:
+
+def get_db_results(db_path: str, collection_name: str, queries: list[str], n_results: int = 2,
+                   model_name: str = "Qwen/Qwen3-Embedding-0.6B", device: str = "cpu",
+                   batch_size: int = 1) -> list[dict]:
     """
     Gets the results for the specific database from the given queries
 
@@ -15,68 +29,190 @@ def get_db_results(db_path: str, collection_name: str, queries: list[str], n_res
         collection_name (str): _name of the collection
         queries (list[str]): _list of queries to run
         n_results (int, optional): _number of results to return. Defaults to 2.
+        model_name (str, optional): _embedding model of the collection. Defaults to "Qwen/Qwen3-Embedding-0.6B".
+        device (str, optional): _device to use for embedding (cpu or cuda). Defaults to "cpu".
+        batch_size (int, optional): _number of queries embedded and searched together, larger batches
+            raise the throughput but every query then waits for its whole batch. Defaults to 1.
 
     Returns:
-        list[dict]: _list of results for each query
+        list[dict]: _list of results for each query, with its latency in seconds (the time of its whole batch)
+            and the size of that batch
     """
-    # Initialize Client
-    client = chromadb.PersistentClient(path=db_path)
-    collection = client.get_collection(name=collection_name)
+    db_manager = DatabaseManager(
+        db_path=db_path, device=device, embedding_model_name=model_name)
+    # Warm up the model and the index so the first batch is not penalized
+    db_manager.query_collection(collection_name, queries[0], n_results=n_results)
 
     all_results = []
-    for q in queries:
-        res = collection.query(query_texts=[q], n_results=n_results)
+    for start in range(0, len(queries), batch_size):
+        batch = queries[start:start + batch_size]
+        begin = time.perf_counter()
+        res = db_manager.query_collection_batch(
+            collection_name, batch, n_results=n_results)
+        # A query is only answered when its whole batch is, dividing would hide that wait
+        latency = time.perf_counter() - begin
         # Store query results associated with the question
-        all_results.append({
-            "question": q,
-            "docs": res['documents'][0],
-            "distances": res['distances'][0]
-        })
+        for i, q in enumerate(batch):
+            all_results.append({
+                "question": q,
+                "docs": res['documents'][i],
+                "metadatas": res['metadatas'][i],
+                "distances": res['distances'][i],
+                "latency": latency,
+                "batch_size": len(batch)
+            })
     return all_results
 
 
-def run_benchmark() -> None:
-    """Runs the benchmark comparison between two database setups."""
-    questions = [
-        "Quais são os compromissos da Santo Antônio Energia em relação à saúde, segurança e meio ambiente?",
-        "Como a Santo Antônio Energia promove a participação das partes interessadas no Sistema de Gestão Integrada?",
-        "Quais são os principais critérios para que a Área de TI da Santo Antônio Energia defina o nível de apoio aos sistemas?",
-        "O que acontece quando um fornecedor obtém um IDF inferior a 70?",
-        "Quais são os limites de reembolso para refeições durante viagens corporativas?"
-    ]
+def evaluate_results(results: list[dict], questions: list[dict], k: int) -> dict:
+    """
+    Computes the retrieval quality and latency of the results of one database
 
-    # Define your two setups
-    configs = [
-        {"name": "BGE-M3 DB", "path": "./chroma_db"},
-        {"name": "Qwen-8B DB", "path": "./chroma_qwen8"}
-    ]
+    Args:
+        results (list[dict]): _results returned by get_db_results
+        questions (list[dict]): _questions with their expected answers
+        k (int): _cutoff rank for the recall
 
-    # Fetch results for both
-    results_a = get_db_results(configs[0]['path'], "my_collection", questions)
-    results_b = get_db_results(configs[1]['path'], "my_collection", questions)
+    Returns:
+        dict: _mean recall at k, mean reciprocal rank, latency percentiles in milliseconds and throughput
+            in queries per second
+    """
+    recalls = []
+    reciprocal_ranks = []
+    for result, question in zip(results, questions):
+        if not question["answers"]:
+            continue
+        matches = match_answers(result["metadatas"], question["answers"])
+        recalls.append(recall_at_k(matches, len(question["answers"]), k))
+        reciprocal_ranks.append(reciprocal_rank(matches))
+    latencies = [result["latency"] * 1000 for result in results]
+    # Each batch is counted once, through the share of its time spent on each of its queries
+    total_seconds = sum(result["latency"] / result["batch_size"] for result in results)
+    return {
+        "recall": sum(recalls) / len(recalls) if recalls else None,
+        "mrr": sum(reciprocal_ranks) / len(reciprocal_ranks) if reciprocal_ranks else None,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "qps": len(results) / total_seconds if total_seconds > 0 else None,
+    }
+
+
+def print_results(configs: list[dict], results: list[list[dict]], questions: list[dict]) -> None:
+    """
+    Prints the top result of every database for each question
 
-    # 3. Print the Comparison Table
-    for i in range(len(questions)):
-        table = Table(title=f"Question {i+1}: {questions[i]}", show_lines=True)
+    Args:
+        configs (list[dict]): _database setups
+        results (list[list[dict]]): _results of each database
+        questions (list[dict]): _questions that were asked
+    """
+    for i, question in enumerate(questions):
+        table = Table(
+            title=f"Question {i+1}: {question['question']}", show_lines=True)
         table.add_column("Source DB", style="cyan", no_wrap=True)
         table.add_column("Distance (Lower is Better)", style="magenta")
         table.add_column("Text Preview", style="green")
+        for config, db_results in zip(configs, results):
+            if not db_results[i]['docs']:
+                continue
+            table.add_row(
+                config['name'],
+                f"{db_results[i]['distances'][0]:.4f}",
+                db_results[i]['docs'][0][:150] + "..."
+            )
+        console.print(table)
+        console.print("\n")
 
-        # Top result from DB A
-        table.add_row(
-            configs[0]['name'],
-            f"{results_a[i]['distances'][0]:.4f}",
-            results_a[i]['docs'][0][:150] + "..."
-        )
-        # Top result from DB B
+
+def run_benchmark() -> None:
+    """Runs the benchmark comparison between database setups."""
+    parser = argparse.ArgumentParser(
+        description="Compare the retrieval quality and latency of databases built with different embedding models")
+    parser.add_argument(
+        "--index", "-i",
+        nargs=3,
+        action="append",
+        metavar=("NAME", "DB_PATH", "MODEL"),
+        help="Database to compare, may be repeated (default: BGE-M3 in ./chroma_db and Qwen-8B in ./chroma_qwen8)"
+    )
+    parser.add_argument(
+        "--collection", "-c",
+        type=str,
+        default="my_collection",
+        help="Collection to query in every database (default: my_collection)"
+    )
+    parser.add_argument(
+        "--questions", "-q",
+        type=str,
+        default=None,
+        help="YAML question set with the expected answers (default: built in questions, latency only)"
+    )
+    parser.add_argument(
+        "--k", "-k",
+        type=int,
+        default=5,
+        help="Number of results retrieved per question (default: 5)"
+    )
+    parser.add_argument(
+        "--device", "-dev",
+        type=str,
+        default="cpu",
+        help="Device to use for embedding (cpu or cuda) (default: cpu)"
+    )
+    parser.add_argument(
+        "--batch_size", "-b",
+        type=int,
+        default=1,
+        help="Number of questions searched together, larger batches raise the throughput and the latency (default: 1)"
+    )
+    parser.add_argument(
+        "--show_results", "-s",
+        action="store_true",
+        help="Print the top result of every database for each question"
+    )
+    args = parser.parse_args()
+
+    # Define the setups to compare
+    configs = [
+        {"name": name, "path": path, "model": model} for name, path, model in args.index
+    ] if args.index else [
+        {"name": "BGE-M3 DB", "path": "./chroma_db", "model": "BAAI/bge-m3"},
+        {"name": "Qwen-8B DB", "path": "./chroma_qwen8",
+            "model": "Qwen/Qwen3-Embedding-8B"}
+    ]
+    if args.questions:
+        questions = load_question_set(args.questions)
+    else:
+        questions = [{"question": q, "answers": []} for q in DEFAULT_QUESTIONS]
+
+    # Fetch results for every setup
+    queries = [question["question"] for question in questions]
+    results = [get_db_results(config['path'], args.collection, queries, n_results=args.k,
+                              model_name=config['model'], device=args.device, batch_size=args.batch_size)
+               for config in configs]
+
+    if args.show_results:
+        print_results(configs, results, questions)
+
+    # Print the metrics table
+    table = Table(title=f"Retrieval comparison ({len(questions)} questions)")
+    table.add_column("Source DB", style="cyan", no_wrap=True)
+    table.add_column(f"Recall@{args.k}", style="green")
+    table.add_column("MRR", style="green")
+    table.add_column("p50 latency (ms)", style="magenta")
+    table.add_column("p95 latency (ms)", style="magenta")
+    table.add_column("Throughput (q/s)", style="magenta")
+    for config, db_results in zip(configs, results):
+        metrics = evaluate_results(db_results, questions, args.k)
         table.add_row(
-            configs[1]['name'],
-            f"{results_b[i]['distances'][0]:.4f}",
-            results_b[i]['docs'][0][:150] + "..."
+            config['name'],
+            "-" if metrics['recall'] is None else f"{metrics['recall']:.3f}",
+            "-" if metrics['mrr'] is None else f"{metrics['mrr']:.3f}",
+            f"{metrics['p50_ms']:.1f}",
+            f"{metrics['p95_ms']:.1f}",
+            "-" if metrics['qps'] is None else f"{metrics['qps']:.1f}"
         )
-
-        console.print(table)
-        console.print("\n")
+    console.print(table)
 
 
 if __name__ == "__main__":
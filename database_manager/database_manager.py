@@ -5,80 +5,376 @@ from docling.document_converter import DocumentConverter, PdfFormatOption
 from docling.datamodel.base_models import InputFormat
 from docling.datamodel.pipeline_options import PdfPipelineOptions
 from docling.chunking import HybridChunker
+from typing import Dict, Generator, List, Optional, Tuple
+from rich.progress import Progress
+from collection_manifest import CollectionManifest
+from conversion_cache import ConversionCache
+from page_ocr import PageOcr
+from ingestion_pipeline import IngestionPipeline
 import yaml
 import os
+import time
 import argparse
+import requests
+
+
+def build_converter(do_table_structure: bool = True, do_ocr: bool = False,
+                    force_full_page_ocr: bool = False) -> DocumentConverter:
+    """
+    Builds the docling converter used to ingest PDF documents.
+
+    Args:
+        do_table_structure (bool, optional): Recover the structure of the tables. Defaults to True.
+        do_ocr (bool, optional): Run OCR on the pages. Defaults to False.
+        force_full_page_ocr (bool, optional): OCR the whole page instead of the bitmap areas only. Defaults to False.
+
+    Returns:
+        DocumentConverter: The docling converter.
+    """
+    pipeline_options = PdfPipelineOptions()
+    pipeline_options.do_table_structure = do_table_structure
+    pipeline_options.do_ocr = do_ocr
+    if do_ocr:
+        pipeline_options.ocr_options.force_full_page_ocr = force_full_page_ocr
+    return DocumentConverter(
+        format_options={
+            InputFormat.PDF: PdfFormatOption(
+                pipeline_options=pipeline_options,
+            )
+        }
+    )
+
+
+def build_where_filter(document_names: Optional[List[str]] = None, page_range: Optional[Tuple[int, int]] = None,
+                       where: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Builds a ChromaDB metadata filter restricting a search to some documents and pages.
+
+    Args:
+        document_names (Optional[List[str]], optional): Names of the documents to search. Defaults to None.
+        page_range (Optional[Tuple[int, int]], optional): First and last page to search, inclusive. Defaults to None.
+        where (Optional[Dict], optional): Extra filter combined with the others. Defaults to None.
+
+    Returns:
+        Optional[Dict]: The filter, or None when nothing is restricted.
+    """
+    conditions = []
+    if document_names:
+        conditions.append({"document_name": {"$in": list(document_names)}})
+    if page_range is not None:
+        # A chunk overlaps the range if it starts before the range ends and ends after the range starts
+        first_page, last_page = page_range
+        conditions.append({"first_page": {"$lte": last_page}})
+        conditions.append({"last_page": {"$gte": first_page}})
+    if where:
+        conditions.append(where)
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
 
 
 class DatabaseManager():
-    def __init__(self, db_path: str = "./chroma_db", device: str = "cpu") -> None:
+    def __init__(self, db_path: str = "./chroma_db", device: str = "cpu", batch_size: int = 256,
+                 cache_dir: Optional[str] = None, embedding_model_name: str = "Qwen/Qwen3-Embedding-0.6B",
+                 ocr_mode: str = "adaptive", ocr_workers: Optional[int] = None,
+                 notify_urls: Optional[List[str]] = None) -> None:
         """
         Database manager class constructor
 
         Args:
             db_path (str, optional): Database path. Defaults to "./chroma_db".
             device (str, optional): Device to use for embedding (cpu or cuda). Defaults to "cpu".
+            batch_size (int, optional): Maximum number of chunks per database call. Defaults to 256.
+            cache_dir (Optional[str], optional): Folder of the docling conversion cache, which can be shared
+                between databases. Defaults to a "conversion_cache" folder inside the database path.
+            embedding_model_name (str, optional): The sentence transformers embedding model.
+                Defaults to "Qwen/Qwen3-Embedding-0.6B".
+            ocr_mode (str, optional): "adaptive" to OCR the PDF pages that have no text, or "off". Defaults to "adaptive".
+            ocr_workers (Optional[int], optional): Number of OCR processes. Defaults to half the number of CPUs.
+            notify_urls (Optional[List[str]], optional): URLs called with a POST when collections are added or
+                removed, so the services caching the collection list refresh it. Defaults to None.
         """
+        if ocr_mode not in ("adaptive", "off"):
+            raise ValueError(f"Unknown OCR mode: {ocr_mode}")
+        self.db_path = db_path
         self.client = chromadb.PersistentClient(path=db_path)
+        # Never go over what the database accepts in a single call
+        self.batch_size = max(1, min(batch_size, self.client.get_max_batch_size()))
+        self.embedding_model_name = embedding_model_name
         self.ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="Qwen/Qwen3-Embedding-0.6B",
+            model_name=self.embedding_model_name,
             device=device
         )
-        pipeline_options = PdfPipelineOptions()
-        pipeline_options.do_table_structure = True
-        pipeline_options.do_ocr = False
-        self.converter = DocumentConverter(
-            format_options={
-                InputFormat.PDF: PdfFormatOption(
-                    pipeline_options=pipeline_options,
-                )
-            }
-        )
+        # Conversion options are kept so worker processes can build the same converter
+        self.converter_options = {"do_table_structure": True, "do_ocr": False}
+        self.converter = build_converter(**self.converter_options)
+        self.conversion_cache = ConversionCache(
+            cache_dir or os.path.join(db_path, "conversion_cache"))
+        self.ocr_mode = ocr_mode
+        self.page_ocr = PageOcr(converter_factory=build_converter, cache=self.conversion_cache,
+                                n_workers=ocr_workers) if ocr_mode == "adaptive" else None
         self.chunker = HybridChunker()
+        self.notify_urls = notify_urls or []
 
     def add_document(self, collection_name: str, document_path: str) -> None:
         """
-        Adds a document to the specified collection in the database.
+        Adds a document to the specified collection in the database. The document is skipped if the
+        collection already holds the same content, and replaced if its content changed.
 
         Args:
             collection_name (str): The name of the collection to add the document to.
             document_path (str): The file path of the document to be added.
         """
-        # Get the collection we are interested in
-        collection = self.client.get_or_create_collection(
+        self.sync_collections(
+            {collection_name: [document_path]}, remove_missing=False)
+
+    def add_documents(self, collection_name: str, document_paths: list, n_workers: int = None) -> None:
+        """
+        Adds several documents to the specified collection with the parallel ingestion pipeline.
+
+        Args:
+            collection_name (str): The name of the collection to add the documents to.
+            document_paths (list): The file paths of the documents to be added.
+            n_workers (int, optional): Number of conversion processes. Defaults to the number of CPUs.
+        """
+        pipeline = IngestionPipeline(
+            db_manager=self, converter_factory=build_converter, n_workers=n_workers)
+        self.sync_collections(
+            {collection_name: document_paths}, pipeline=pipeline, remove_missing=False)
+
+    def sync_collections(self, collections: Dict[str, List[str]], pipeline: Optional[IngestionPipeline] = None,
+                         remove_missing: bool = True) -> None:
+        """
+        Brings the collections in line with the given documents using the content hashes recorded in the
+        collection manifests: unchanged documents are skipped, renamed ones keep their chunks, changed ones
+        are replaced and, if asked, documents no longer listed are removed. Everything is embedded again when
+        the chunker or the embedding model changed since the collection was built.
+
+        Args:
+            collections (Dict[str, List[str]]): The document paths that each collection should hold.
+            pipeline (Optional[IngestionPipeline], optional): Pipeline used to ingest the new and changed
+                documents. Defaults to None, ingesting them one by one.
+            remove_missing (bool, optional): Remove the documents not listed for their collection. Defaults to True.
+        """
+        collections_before = self.list_collection_names()
+        manifests = {}
+        jobs = []
+        for collection_name, document_paths in collections.items():
+            manifests[collection_name], collection_jobs = self._plan_sync(
+                collection_name, document_paths, remove_missing)
+            jobs.extend(collection_jobs)
+        try:
+            if pipeline is not None:
+                results = pipeline.run(jobs)
+            else:
+                results = {}
+                for collection_name, document_path, document_hash in jobs:
+                    results[(collection_name, document_path)] = self._ingest_document(
+                        collection_name, document_path, document_hash)
+        finally:
+            self.close()
+        # Only drop the previous version of a document once the new one is stored
+        for collection_name, document_path, document_hash in jobs:
+            if (collection_name, document_path) not in results:
+                continue
+            chunk_ids = results[(collection_name, document_path)]
+            manifest = manifests[collection_name]
+            document_name = self.get_document_name(document_path)
+            stale_ids = set(manifest.remove(document_name)) - set(chunk_ids)
+            if stale_ids:
+                collection = self.client.get_collection(
+                    name=collection_name, embedding_function=self.ef)
+                self._delete_chunks(collection, list(stale_ids))
+            manifest.record(document_name, document_path,
+                            document_hash, chunk_ids)
+        for manifest in manifests.values():
+            manifest.save()
+        if self.list_collection_names() != collections_before:
+            self.notify_collections_changed()
+
+    def close(self) -> None:
+        """Stops the OCR worker processes, they are started again by the next document to OCR."""
+        if self.page_ocr is not None:
+            self.page_ocr.close()
+
+    def migrate_collection(self, collection_name: str, target: "DatabaseManager",
+                           target_collection_name: Optional[str] = None) -> int:
+        """
+        Embeds the chunks of a collection again with the embedding model of another database manager,
+        reusing the stored texts and metadata (no document conversion). Chunks already present in the
+        target collection are skipped, so an interrupted migration resumes where it stopped.
+
+        Args:
+            collection_name (str): The name of the collection to migrate.
+            target (DatabaseManager): The database manager holding the new embedding model and database.
+            target_collection_name (Optional[str], optional): The name of the new collection.
+                Defaults to the source collection name.
+
+        Returns:
+            int: The number of chunks embedded in this run.
+        """
+        target_collection_name = target_collection_name or collection_name
+        if target.db_path == self.db_path and target_collection_name == collection_name:
+            raise ValueError(
+                "The target collection must differ from the source collection")
+        source = self.client.get_collection(
             name=collection_name, embedding_function=self.ef)
-        # Check if document already exists in collection
-        if self._check_if_document_exists(collection, document_path):
-            print(
-                f"Document '{self._get_document_name(document_path)}' already exists in collection '{collection_name}'. Skipping.")
-            return
-        # Convert PDF to Docling's internal structured format
-        result = self.converter.convert(document_path)
-        chunks_iterator = self.chunker.chunk(dl_doc=result.document)
-        # Prepare data for insertion
-        final_texts = []
-        metadatas = []
-        ids = []
-        document_name = self._get_document_name(document_path)
-        for i, chunk in enumerate(chunks_iterator):
-            final_texts.append(chunk.text)
+        created = target_collection_name not in target.list_collection_names()
+        destination = target.client.get_or_create_collection(
+            name=target_collection_name, embedding_function=target.ef)
+        batch_size = min(self.batch_size, target.batch_size)
+        migrated = 0
+        offset = 0
+        with Progress() as progress:
+            task = progress.add_task(
+                f"Migrating '{collection_name}'", total=source.count())
+            while True:
+                batch = source.get(limit=batch_size, offset=offset, include=[
+                                   "documents", "metadatas"])
+                if not batch["ids"]:
+                    break
+                offset += len(batch["ids"])
+                existing = set(destination.get(
+                    ids=batch["ids"], include=[])["ids"])
+                todo = [i for i, chunk_id in enumerate(
+                    batch["ids"]) if chunk_id not in existing]
+                if todo:
+                    documents = [batch["documents"][i] for i in todo]
+                    destination.add(
+                        ids=[batch["ids"][i] for i in todo],
+                        documents=documents,
+                        metadatas=[batch["metadatas"][i] for i in todo],
+                        embeddings=target.ef(documents)
+                    )
+                    migrated += len(todo)
+                progress.advance(task, len(batch["ids"]))
+        # The chunks did not change, only the embedding model, so incremental syncs keep working on the target
+        source_manifest = CollectionManifest(self.db_path, collection_name)
+        if source_manifest.documents:
+            target_manifest = CollectionManifest(
+                target.db_path, target_collection_name)
+            target_manifest.config = dict(
+                source_manifest.config, embedding_model=target.embedding_model_name)
+            target_manifest.documents = source_manifest.documents
+            target_manifest.save()
+        print(
+            f"Migrated {migrated} chunks from '{collection_name}' to '{target_collection_name}' with {target.embedding_model_name}.")
+        if created:
+            target.notify_collections_changed()
+        return migrated
+
+    def list_collection_names(self) -> List[str]:
+        """
+        Lists the collections of the database.
+
+        Returns:
+            List[str]: The sorted collection names.
+        """
+        return sorted(collection.name for collection in self.client.list_collections())
+
+    def notify_collections_changed(self) -> None:
+        """
+        Tells the services caching the collection list (the IHM server and the AI assistant agents) that
+        collections were added or removed. Failures are only reported, the database is already updated.
+        """
+        for url in self.notify_urls:
+            try:
+                response = requests.post(url, timeout=5)
+                response.raise_for_status()
+                print(f"Notified collection change to {url}.")
+            except requests.RequestException as e:
+                print(f"Could not notify collection change to {url}: {e}")
+
+    def convert_document(self, document_path: str, document_hash: str):
+        """
+        Converts a document to Docling's internal structured format, reusing a previous conversion
+        of the same content with the same options when there is one.
+
+        Args:
+            document_path (str): The file path of the document.
+            document_hash (str): The hash of the document content.
+
+        Returns:
+            DoclingDocument: The converted document.
+        """
+        dl_doc = self.conversion_cache.load(
+            document_hash, self.converter_options)
+        if dl_doc is not None:
+            return dl_doc
+        dl_doc = self.converter.convert(document_path).document
+        self.conversion_cache.store(
+            document_hash, self.converter_options, dl_doc)
+        return dl_doc
+
+    def add_ocr_pages(self, document_path: str, dl_doc) -> List:
+        """
+        Completes a converted document with the OCR of its pages that have no text, when the OCR is enabled.
+
+        Args:
+            document_path (str): The file path of the document.
+            dl_doc (DoclingDocument): The document converted without OCR.
+
+        Returns:
+            List[DoclingDocument]: The converted document followed by one document per OCRed page.
+        """
+        if self.page_ocr is None:
+            return [dl_doc]
+        return [dl_doc] + self.page_ocr.ocr_document(document_path, dl_doc)
+
+    def get_ingestion_config(self) -> Dict:
+        """
+        Describes how the chunks are produced, so collections built differently can be detected.
+
+        Returns:
+            Dict: The embedding model, chunker and converter settings.
+        """
+        return {
+            "embedding_model": self.embedding_model_name,
+            "chunker": type(self.chunker).__name__,
+            "max_tokens": getattr(self.chunker, "max_tokens", None),
+            "merge_peers": getattr(self.chunker, "merge_peers", None),
+            "converter": self.converter_options,
+            "ocr": self.ocr_mode,
+            # Bumped whenever the chunk metadata changes, so older collections are rebuilt with the new fields
+            "metadata_version": 2,
+        }
+
+    def iter_chunk_records(self, document_name: str, document_hash: str,
+                           dl_docs: List) -> Generator[Tuple[str, str, Dict], None, None]:
+        """
+        Chunks a converted document, lazily yielding the records to store in the database.
+        Chunk ids derive from the document content, so they survive renames and change with the content.
+        Besides the chunk pages, the metadata holds document level fields (content hash, ingestion time)
+        and the section headings of the chunk, all filterable in queries.
+
+        Args:
+            document_name (str): The name of the document.
+            document_hash (str): The hash of the document content.
+            dl_docs (List[DoclingDocument]): The converted document and its OCRed pages, as returned by add_ocr_pages.
+
+        Yields:
+            Tuple[str, str, Dict]: The chunk id, text and metadata.
+        """
+        ingested_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        chunks = (chunk for dl_doc in dl_docs for chunk in self.chunker.chunk(dl_doc=dl_doc))
+        for i, chunk in enumerate(chunks):
             page_numbers = sorted(list(set(
                 prov.page_no for item in chunk.meta.doc_items for prov in item.prov if hasattr(prov, "page_no")
             )))
-            # Create metadata and id for this specific chunk
-            metadatas.append({
+            # Create metadata and id for this specific chunk, pages are also stored as integers so they can be filtered
+            metadata = {
                 "document_name": document_name,
-                "page_number": str(page_numbers)
-            })
-            ids.append(f"{document_name}_chunk_{i}")
-        # Add to collection
-        collection.add(
-            documents=final_texts,
-            metadatas=metadatas,
-            ids=ids
-        )
-        print(
-            f"Added {len(final_texts)} chunks to collection '{collection_name}'.")
+                "document_hash": document_hash,
+                "ingested_at": ingested_at,
+                "page_number": str(page_numbers),
+                "headings": " > ".join(getattr(chunk.meta, "headings", None) or [])
+            }
+            if page_numbers:
+                metadata["first_page"] = page_numbers[0]
+                metadata["last_page"] = page_numbers[-1]
+            yield f"{document_hash[:16]}_chunk_{i}", chunk.text, metadata
 
     def inspect_collection(self, collection_name: str) -> None:
         """
@@ -104,14 +400,45 @@ class DatabaseManager():
         Returns:
             dict: The query results.
         """
-        collection = self.client.get_or_create_collection(name=collection_name)
-        results = collection.query(
-            query_texts=[query_text],
-            n_results=n_results
-        )
+        return self.query_collection_batch(collection_name, [query_text], n_results=n_results)
+
+    def query_collection_batch(self, collection_name: str, query_texts: List[str], n_results: int = 5,
+                               document_names: Optional[List[str]] = None,
+                               page_range: Optional[Tuple[int, int]] = None,
+                               where: Optional[Dict] = None) -> dict:
+        """
+        Queries the specified collection with many questions at once. All the questions are embedded in a
+        single pass of the model and sent to the database in as few calls as possible.
+
+        Args:
+            collection_name (str): The name of the collection to query.
+            query_texts (List[str]): The texts to query against the collection.
+            n_results (int, optional): Number of results to return per query. Defaults to 5.
+            document_names (Optional[List[str]], optional): Only search the chunks of these documents. Defaults to None.
+            page_range (Optional[Tuple[int, int]], optional): Only search the chunks overlapping these pages
+                (first and last page, inclusive). Defaults to None.
+            where (Optional[Dict], optional): Extra ChromaDB metadata filter. Defaults to None.
+
+        Returns:
+            dict: The query results, with one entry per query in "ids", "documents", "metadatas" and "distances".
+        """
+        collection = self.client.get_collection(
+            name=collection_name, embedding_function=self.ef)
+        query_embeddings = self.ef(query_texts)
+        where = build_where_filter(document_names, page_range, where)
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for start in range(0, len(query_texts), self.batch_size):
+            batch = collection.query(
+                query_embeddings=query_embeddings[start:start + self.batch_size],
+                n_results=n_results,
+                where=where,
+                include=["documents", "metadatas", "distances"]
+            )
+            for key in results:
+                results[key].extend(batch[key])
         return results
 
-    def _check_if_document_exists(self, collection: Collection, document: str) -> bool:
+    def check_if_document_exists(self, collection: Collection, document: str) -> bool:
         """
         Checks if a document already exists in the specified collection.
 
@@ -124,13 +451,13 @@ class DatabaseManager():
         """
         # We only need to find 1 record to know the doc exists
         results = collection.get(
-            where={"document_name": self._get_document_name(document)},
+            where={"document_name": self.get_document_name(document)},
             limit=1,
             include=[]
         )
         return len(results['ids']) > 0
 
-    def _get_document_name(self, document_path: str) -> str:
+    def get_document_name(self, document_path: str) -> str:
         """
         Extracts the document name from the full file path.
 
@@ -144,6 +471,157 @@ class DatabaseManager():
             return document_path
         return document_path.split("/")[-1]
 
+    def _plan_sync(self, collection_name: str, document_paths: List[str],
+                   remove_missing: bool) -> Tuple[CollectionManifest, List[Tuple[str, str, str]]]:
+        """
+        Compares the documents of a collection with its manifest, applying the renames and removals
+        and listing the documents that must be ingested.
+
+        Args:
+            collection_name (str): The name of the collection.
+            document_paths (List[str]): The document paths the collection should hold.
+            remove_missing (bool): Remove the documents that are not in the list.
+
+        Returns:
+            Tuple[CollectionManifest, List[Tuple[str, str, str]]]: The collection manifest and the
+                (collection name, document path, content hash) of the documents to ingest.
+        """
+        manifest = CollectionManifest(self.db_path, collection_name)
+        config = self.get_ingestion_config()
+        if not manifest.matches_config(config):
+            print(
+                f"Chunker or embedding model changed for collection '{collection_name}'. Embedding all documents again.")
+            if collection_name in [collection.name for collection in self.client.list_collections()]:
+                self.client.delete_collection(name=collection_name)
+            manifest.documents = {}
+        manifest.config = config
+        collection = self.client.get_or_create_collection(
+            name=collection_name, embedding_function=self.ef)
+        current = {}
+        for document_path in document_paths:
+            current[self.get_document_name(document_path)] = (
+                document_path, CollectionManifest.file_hash(document_path))
+        jobs = []
+        planned = {}
+        for document_name, (document_path, document_hash) in current.items():
+            entry = manifest.documents.get(document_name)
+            if entry is not None and entry["sha256"] == document_hash:
+                print(
+                    f"Document '{document_name}' is unchanged in collection '{collection_name}'. Skipping.")
+                continue
+            same_content = manifest.find_by_hash(document_hash) or planned.get(document_hash)
+            if entry is None and same_content is not None and same_content not in current:
+                self._rename_document(
+                    collection, manifest, same_content, document_name, document_path)
+                continue
+            if same_content is not None:
+                if entry is not None:
+                    # The previous content of the document is outdated, only its duplicate is kept
+                    self._delete_chunks(collection, manifest.remove(document_name))
+                print(
+                    f"Document '{document_name}' has the same content as '{same_content}' in collection '{collection_name}'. Skipping.")
+                continue
+            if entry is None and self.check_if_document_exists(collection, document_path):
+                # Chunks written before the manifest existed or by an interrupted run
+                collection.delete(where={"document_name": document_name})
+            planned[document_hash] = document_name
+            jobs.append((collection_name, document_path, document_hash))
+        if remove_missing:
+            for document_name in [name for name in manifest.documents if name not in current]:
+                self._delete_chunks(collection, manifest.remove(document_name))
+                print(
+                    f"Removed document '{document_name}' from collection '{collection_name}'.")
+        manifest.save()
+        return manifest, jobs
+
+    def _rename_document(self, collection: Collection, manifest: CollectionManifest, old_name: str,
+                         new_name: str, document_path: str) -> None:
+        """
+        Renames a document in place, keeping its chunks and embeddings.
+
+        Args:
+            collection (Collection): The ChromaDB collection holding the document.
+            manifest (CollectionManifest): The collection manifest.
+            old_name (str): The previous document name.
+            new_name (str): The new document name.
+            document_path (str): The new file path of the document.
+        """
+        entry = manifest.documents.pop(old_name)
+        chunk_ids = entry["chunk_ids"]
+        for start in range(0, len(chunk_ids), self.batch_size):
+            results = collection.get(
+                ids=chunk_ids[start:start + self.batch_size], include=["metadatas"])
+            metadatas = [dict(metadata, document_name=new_name)
+                         for metadata in results["metadatas"]]
+            collection.update(ids=results["ids"], metadatas=metadatas)
+        entry["path"] = document_path
+        manifest.documents[new_name] = entry
+        print(
+            f"Renamed document '{old_name}' to '{new_name}' in collection '{collection.name}'.")
+
+    def _ingest_document(self, collection_name: str, document_path: str, document_hash: str) -> List[str]:
+        """
+        Converts, chunks and stores a single document. Chunks are consumed lazily and written in
+        fixed size batches, so memory use does not grow with the size of the document.
+
+        Args:
+            collection_name (str): The name of the collection to add the document to.
+            document_path (str): The file path of the document.
+            document_hash (str): The hash of the document content.
+
+        Returns:
+            List[str]: The ids of the chunks added.
+        """
+        collection = self.client.get_or_create_collection(
+            name=collection_name, embedding_function=self.ef)
+        dl_docs = self.add_ocr_pages(
+            document_path, self.convert_document(document_path, document_hash))
+        document_name = self.get_document_name(document_path)
+        ids = []
+        batch = []
+        try:
+            for record in self.iter_chunk_records(document_name, document_hash, dl_docs):
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    self._write_batch(collection, batch)
+                    ids.extend(chunk_id for chunk_id, _, _ in batch)
+                    batch = []
+            if batch:
+                self._write_batch(collection, batch)
+                ids.extend(chunk_id for chunk_id, _, _ in batch)
+        except BaseException:
+            # Do not leave half a document behind
+            self._delete_chunks(collection, ids)
+            raise
+        print(
+            f"Added {len(ids)} chunks to collection '{collection_name}'.")
+        return ids
+
+    def _write_batch(self, collection: Collection, batch: List[Tuple[str, str, Dict]]) -> None:
+        """
+        Adds a batch of chunk records to a collection.
+
+        Args:
+            collection (Collection): The ChromaDB collection.
+            batch (List[Tuple[str, str, Dict]]): The chunk id, text and metadata of each record.
+        """
+        collection.add(
+            ids=[chunk_id for chunk_id, _, _ in batch],
+            documents=[text for _, text, _ in batch],
+            metadatas=[metadata for _, _, metadata in batch]
+        )
+
+    def _delete_chunks(self, collection: Collection, chunk_ids: List[str]) -> None:
+        """
+        Deletes chunks from a collection in batches.
+
+        Args:
+            collection (Collection): The ChromaDB collection.
+            chunk_ids (List[str]): The ids of the chunks to delete.
+        """
+        for start in range(0, len(chunk_ids), self.batch_size):
+            collection.delete(ids=chunk_ids[start:start + self.batch_size])
+
 
 def create_database() -> None:
     """Creates and populates the database with given data from the description in the proper output folder."""
@@ -170,21 +648,85 @@ def create_database() -> None:
         default="cpu",
         help="Device to use for embedding (cpu or cuda) (default: cpu)"
     )
+    parser.add_argument(
+        "--workers", "-w",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of processes converting documents in parallel (default: number of CPUs)"
+    )
+    parser.add_argument(
+        "--embed_batch_size", "-eb",
+        type=int,
+        default=64,
+        help="Number of chunks embedded in a single forward pass (default: 64)"
+    )
+    parser.add_argument(
+        "--write_batch_size", "-wb",
+        type=int,
+        default=512,
+        help="Number of chunks written to the database at once (default: 512)"
+    )
+    parser.add_argument(
+        "--keep_missing", "-k",
+        action="store_true",
+        help="Keep the documents that are no longer listed in the YAML file"
+    )
+    parser.add_argument(
+        "--ocr",
+        type=str,
+        choices=["adaptive", "off"],
+        default="adaptive",
+        help="OCR the PDF pages that have no text (scanned pages) or disable OCR (default: adaptive)"
+    )
+    parser.add_argument(
+        "--ocr_workers",
+        type=int,
+        default=None,
+        help="Number of processes running OCR in parallel (default: half the number of CPUs)"
+    )
+    parser.add_argument(
+        "--cache_dir", "-c",
+        type=str,
+        default=None,
+        help="Folder of the docling conversion cache, shared between databases (default: <db_path>/conversion_cache)"
+    )
+    parser.add_argument(
+        "--notify_url", "-n",
+        type=str,
+        action="append",
+        default=None,
+        help="URL called with a POST when collections are added or removed, e.g. the IHM "
+             "/ai_assistant/collections/invalidate endpoint. Can be repeated (default: none)"
+    )
     args = parser.parse_args()
 
     # Initialize DatabaseManager
     db_manager = DatabaseManager(
         db_path=args.db_path,
-        device=args.device
+        device=args.device,
+        batch_size=args.write_batch_size,
+        cache_dir=args.cache_dir,
+        ocr_mode=args.ocr,
+        ocr_workers=args.ocr_workers,
+        notify_urls=args.notify_url
     )
     # Load database description from YAML file
     with open(args.yaml_path, "r") as file:
         database_description = yaml.safe_load(file)
-    # Add documents to collections as per the description
-    for collection_name, collection_data in database_description.get("collections", {}).items():
-        for document_path in collection_data.get("documents", []):
-            db_manager.add_document(
-                collection_name=collection_name, document_path=document_path)
+    # Sync the collections with the description, ingesting the new and changed documents through a single pipeline
+    collections = {
+        collection_name: collection_data.get("documents", [])
+        for collection_name, collection_data in database_description.get("collections", {}).items()
+    }
+    pipeline = IngestionPipeline(
+        db_manager=db_manager,
+        converter_factory=build_converter,
+        n_workers=args.workers,
+        embed_batch_size=args.embed_batch_size,
+        write_batch_size=args.write_batch_size
+    )
+    db_manager.sync_collections(
+        collections, pipeline=pipeline, remove_missing=not args.keep_missing)
     # Inspect one of the collections
     db_manager.inspect_collection(collection_name="documents")
 
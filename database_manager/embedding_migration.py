@@ -0,0 +1,68 @@
+import argparse
+from database_manager import DatabaseManager
+
+
+def main() -> None:
+    """Embeds a collection again with a new embedding model, from the chunks already stored in the database."""
+    parser = argparse.ArgumentParser(
+        description="Migrate a collection to a new embedding model")
+    parser.add_argument(
+        "--source_db_path", "-s",
+        type=str,
+        default="./chroma_db",
+        help="Path to the ChromaDB database holding the collection (default: ./chroma_db)"
+    )
+    parser.add_argument(
+        "--source_model", "-sm",
+        type=str,
+        default="Qwen/Qwen3-Embedding-0.6B",
+        help="Embedding model of the source collection (default: Qwen/Qwen3-Embedding-0.6B)"
+    )
+    parser.add_argument(
+        "--target_db_path", "-t",
+        type=str,
+        required=True,
+        help="Path to the ChromaDB database receiving the new collection, may be the source one"
+    )
+    parser.add_argument(
+        "--target_model", "-tm",
+        type=str,
+        required=True,
+        help="Embedding model of the new collection"
+    )
+    parser.add_argument(
+        "--collection", "-c",
+        type=str,
+        default="documents",
+        help="Collection to migrate (default: documents)"
+    )
+    parser.add_argument(
+        "--target_collection", "-tc",
+        type=str,
+        default=None,
+        help="Name of the new collection (default: same as the source collection)"
+    )
+    parser.add_argument(
+        "--device", "-dev",
+        type=str,
+        default="cpu",
+        help="Device to use for embedding (cpu or cuda) (default: cpu)"
+    )
+    parser.add_argument(
+        "--batch_size", "-b",
+        type=int,
+        default=256,
+        help="Number of chunks embedded and written at once (default: 256)"
+    )
+    args = parser.parse_args()
+
+    source = DatabaseManager(db_path=args.source_db_path, device=args.device,
+                             batch_size=args.batch_size, embedding_model_name=args.source_model)
+    target = DatabaseManager(db_path=args.target_db_path, device=args.device,
+                             batch_size=args.batch_size, embedding_model_name=args.target_model)
+    source.migrate_collection(collection_name=args.collection, target=target,
+                              target_collection_name=args.target_collection)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from rich.progress import BarColumn, MofNCompleteColumn, Progress, TextColumn, TimeElapsedColumn
+
+# Converter owned by each conversion process, built once by the pool initializer
+_worker_converter = None
+# Marks the end of the stream in the pipeline queues
+_END_OF_STREAM = None
+
+
+def _init_worker(converter_factory: Callable[..., Any], converter_options: Dict) -> None:
+    """
+    Builds the document converter of a conversion process.
+
+    Args:
+        converter_factory (Callable[..., Any]): Function that builds the docling converter.
+        converter_options (Dict): Keyword arguments for the factory.
+    """
+    global _worker_converter
+    _worker_converter = converter_factory(**converter_options)
+
+
+def _convert_worker(document_path: str) -> Any:
+    """
+    Converts a document in a conversion process.
+
+    Args:
+        document_path (str): The file path of the document.
+
+    Returns:
+        DoclingDocument: The converted document.
+    """
+    return _worker_converter.convert(document_path).document
+
+
+class IngestionPipeline():
+    def __init__(self, db_manager, converter_factory: Callable[..., Any], n_workers: Optional[int] = None,
+                 queue_size: int = 2048, embed_batch_size: int = 64, write_batch_size: int = 512) -> None:
+        """
+        Ingestion pipeline class constructor. Documents are converted in a process pool, chunked as each
+        conversion finishes into a bounded queue, embedded in large batches by a dedicated thread and written
+        to the database in batches by another thread, so every stage works at the same time.
+
+        Args:
+            db_manager (DatabaseManager): The database manager holding the client, embedding function and chunker.
+            converter_factory (Callable[..., Any]): Function building the docling converter in each process.
+            n_workers (Optional[int], optional): Number of conversion processes. Defaults to the number of CPUs.
+            queue_size (int, optional): Maximum number of chunks waiting to be embedded. Defaults to 2048.
+            embed_batch_size (int, optional): Number of chunks embedded per call to the model. Defaults to 64.
+            write_batch_size (int, optional): Number of chunks per database write, capped by the maximum batch
+                size of the database. Defaults to 512.
+        """
+        self.db_manager = db_manager
+        self.converter_factory = converter_factory
+        self.n_workers = max(1, n_workers or os.cpu_count() or 1)
+        self.queue_size = queue_size
+        self.embed_batch_size = embed_batch_size
+        self.write_batch_size = max(
+            1, min(write_batch_size, db_manager.client.get_max_batch_size()))
+        self.errors: List[BaseException] = []
+
+    def run(self, jobs: List[Tuple[str, str, str]]) -> Dict[Tuple[str, str], List[str]]:
+        """
+        Ingests the documents. Deciding which documents need to be ingested is up to the caller.
+
+        Args:
+            jobs (List[Tuple[str, str, str]]): Tuples of (collection name, document path, document content hash).
+
+        Returns:
+            Dict[Tuple[str, str], List[str]]: The ids of the chunks added for each (collection name, document path).
+                Documents that failed to convert or OCR are left out.
+        """
+        self.errors = []
+        pending = list(jobs)
+        if not pending:
+            return {}
+
+        chunk_queue = queue.Queue(maxsize=self.queue_size)
+        # Embedded batches are large, only a few of them need to wait for the writer
+        write_queue = queue.Queue(maxsize=4)
+        added: Dict[Tuple[str, str], List[str]] = {}
+        n_chunks_total = 0
+        with Progress(
+            TextColumn("[bold]{task.description}"),
+            BarColumn(),
+            MofNCompleteColumn(),
+            TimeElapsedColumn(),
+        ) as progress:
+            convert_task = progress.add_task("Converting", total=len(pending))
+            embed_task = progress.add_task("Embedding", total=0)
+            write_task = progress.add_task("Writing", total=0)
+            embedder = threading.Thread(
+                target=self._embed_worker, args=(chunk_queue, write_queue, progress, embed_task), daemon=True)
+            writer = threading.Thread(
+                target=self._write_worker, args=(write_queue, progress, write_task), daemon=True)
+            embedder.start()
+            writer.start()
+            cache = self.db_manager.conversion_cache
+            options = self.db_manager.converter_options
+            cached = [job for job in pending if cache.contains(job[2], options)]
+            to_convert = [job for job in pending if job not in cached]
+
+            def enqueue(collection_name: str, document_path: str, document_hash: str, dl_doc: Any) -> bool:
+                nonlocal n_chunks_total
+                document_name = self.db_manager.get_document_name(
+                    document_path)
+                chunk_ids = []
+                # Scanned pages are OCRed here, in the OCR worker pool
+                try:
+                    dl_docs = self.db_manager.add_ocr_pages(document_path, dl_doc)
+                except RuntimeError as e:
+                    # Left out of the results, so the next run tries the document again
+                    print(f"Failed to OCR '{document_path}': {e}")
+                    return True
+                for record in self.db_manager.iter_chunk_records(document_name, document_hash, dl_docs):
+                    if not self._put(chunk_queue, (collection_name, *record)):
+                        return False
+                    chunk_ids.append(record[0])
+                added[(collection_name, document_path)] = chunk_ids
+                n_chunks_total += len(chunk_ids)
+                progress.update(embed_task, total=n_chunks_total)
+                progress.update(write_task, total=n_chunks_total)
+                return True
+
+            try:
+                # The embedding thread is already running, forking it is not safe
+                with ProcessPoolExecutor(
+                    max_workers=max(1, min(self.n_workers, len(to_convert))),
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.converter_factory, options)
+                ) as pool:
+                    futures = {pool.submit(_convert_worker, document_path): (collection_name, document_path, document_hash)
+                               for collection_name, document_path, document_hash in to_convert}
+                    # Cached documents are chunked while the pool converts the other ones
+                    for collection_name, document_path, document_hash in cached:
+                        progress.advance(convert_task)
+                        dl_doc = cache.load(document_hash, options)
+                        if dl_doc is None:
+                            dl_doc = self.db_manager.convert_document(
+                                document_path, document_hash)
+                        if not enqueue(collection_name, document_path, document_hash, dl_doc):
+                            break
+                    for future in as_completed(futures):
+                        if self.errors:
+                            break
+                        collection_name, document_path, document_hash = futures[future]
+                        progress.advance(convert_task)
+                        try:
+                            dl_doc = future.result()
+                        except Exception as e:
+                            print(f"Failed to convert '{document_path}': {e}")
+                            continue
+                        cache.store(document_hash, options, dl_doc)
+                        # Chunking runs here while the pool keeps converting the other documents
+                        if not enqueue(collection_name, document_path, document_hash, dl_doc):
+                            break
+                    if self.errors:
+                        # Do not wait for the conversions still queued
+                        for future in futures:
+                            future.cancel()
+            finally:
+                self._put(chunk_queue, _END_OF_STREAM, force=True)
+                embedder.join()
+                writer.join()
+        if self.errors:
+            raise self.errors[0]
+        for (collection_name, document_path), chunk_ids in added.items():
+            print(
+                f"Added {len(chunk_ids)} chunks from '{document_path}' to collection '{collection_name}'.")
+        return added
+
+    def _put(self, target: queue.Queue, item: Any, force: bool = False) -> bool:
+        """
+        Puts an item in a pipeline queue, giving up if a downstream stage has failed.
+
+        Args:
+            target (queue.Queue): The queue to put the item in.
+            item (Any): The item.
+            force (bool, optional): Keep trying even after a failure, used for the end of stream marker.
+                Defaults to False.
+
+        Returns:
+            bool: True if the item was queued, False if the pipeline stopped after a failure.
+        """
+        while True:
+            if self.errors and not force:
+                return False
+            try:
+                target.put(item, timeout=1.0)
+                return True
+            except queue.Full:
+                # A dead consumer will never drain the queue, drop the oldest item to get the marker through
+                if force and self.errors:
+                    try:
+                        target.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def _embed_worker(self, chunk_queue: queue.Queue, write_queue: queue.Queue,
+                      progress: Progress, task_id: int) -> None:
+        """
+        Embeds the chunks in batches and forwards them to the writer.
+
+        Args:
+            chunk_queue (queue.Queue): Queue of (collection name, id, text, metadata) records.
+            write_queue (queue.Queue): Queue of embedded batches.
+            progress (Progress): The progress display.
+            task_id (int): The progress task of this stage.
+        """
+        batch = []
+        try:
+            while True:
+                record = chunk_queue.get()
+                if record is _END_OF_STREAM:
+                    break
+                batch.append(record)
+                if len(batch) >= self.embed_batch_size:
+                    if not self._put(write_queue, self._embed_batch(batch)):
+                        break
+                    progress.advance(task_id, len(batch))
+                    batch = []
+            if batch and not self.errors:
+                self._put(write_queue, self._embed_batch(batch))
+                progress.advance(task_id, len(batch))
+        except BaseException as e:
+            self.errors.append(e)
+        finally:
+            self._put(write_queue, _END_OF_STREAM, force=True)
+
+    def _embed_batch(self, batch: List[Tuple[str, str, str, Dict]]) -> List[Tuple[str, str, str, Dict, Any]]:
+        """
+        Embeds the texts of a batch of records with a single model call.
+
+        Args:
+            batch (List[Tuple[str, str, str, Dict]]): The (collection name, id, text, metadata) records.
+
+        Returns:
+            List[Tuple[str, str, str, Dict, Any]]: The records with their embedding appended.
+        """
+        embeddings = self.db_manager.ef([record[2] for record in batch])
+        return [(*record, embedding) for record, embedding in zip(batch, embeddings)]
+
+    def _write_worker(self, write_queue: queue.Queue, progress: Progress, task_id: int) -> None:
+        """
+        Writes the embedded records to their collections in batches.
+
+        Args:
+            write_queue (queue.Queue): Queue of embedded batches.
+            progress (Progress): The progress display.
+            task_id (int): The progress task of this stage.
+        """
+        buffers: Dict[str, List[Tuple]] = {}
+        try:
+            while True:
+                batch = write_queue.get()
+                if batch is _END_OF_STREAM:
+                    break
+                if self.errors:
+                    continue
+                for record in batch:
+                    buffer = buffers.setdefault(record[0], [])
+                    buffer.append(record)
+                    if len(buffer) >= self.write_batch_size:
+                        self._write_records(record[0], buffer)
+                        progress.advance(task_id, len(buffer))
+                        buffers[record[0]] = []
+            if not self.errors:
+                for collection_name, buffer in buffers.items():
+                    if buffer:
+                        self._write_records(collection_name, buffer)
+                        progress.advance(task_id, len(buffer))
+        except BaseException as e:
+            self.errors.append(e)
+
+    def _write_records(self, collection_name: str, records: List[Tuple]) -> None:
+        """
+        Adds embedded records to a collection in a single call.
+
+        Args:
+            collection_name (str): The name of the collection.
+            records (List[Tuple]): The (collection name, id, text, metadata, embedding) records.
+        """
+        collection = self.db_manager.client.get_or_create_collection(
+            name=collection_name, embedding_function=self.db_manager.ef)
+        collection.add(
+            ids=[record[1] for record in records],
+            documents=[record[2] for record in records],
+            metadatas=[record[3] for record in records],
+            embeddings=[record[4] for record in records]
+        )
@@ -0,0 +1,199 @@
+import hashlib
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+import pypdfium2 as pdfium
+from docling.datamodel.base_models import DocumentStream
+from conversion_cache import ConversionCache
+
+# OCR converter owned by each worker process, built once by the pool initializer
+_worker_converter = None
+
+
+def _init_worker(converter_factory: Callable[..., Any], converter_options: Dict) -> None:
+    """
+    Builds the OCR converter of a worker process.
+
+    Args:
+        converter_factory (Callable[..., Any]): Function that builds the docling converter.
+        converter_options (Dict): Keyword arguments for the factory.
+    """
+    global _worker_converter
+    _worker_converter = converter_factory(**converter_options)
+
+
+def _ocr_worker(name: str, data: bytes) -> Any:
+    """
+    Converts a single page PDF with OCR in a worker process.
+
+    Args:
+        name (str): Name given to the page document.
+        data (bytes): The single page PDF.
+
+    Returns:
+        DoclingDocument: The converted page.
+    """
+    return _worker_converter.convert(DocumentStream(name=name, stream=io.BytesIO(data))).document
+
+
+class PageOcr():
+    def __init__(self, converter_factory: Callable[..., Any], cache: ConversionCache, n_workers: Optional[int] = None,
+                 min_text_chars: int = 20, render_scale: float = 0.5) -> None:
+        """
+        Page OCR class constructor. Finds the pages of a converted PDF that came out without text (scanned pages)
+        and runs OCR only on them, in a pool of worker processes. The OCR output is cached per page, keyed by a
+        hash of the rendered page, so a page is never OCRed twice even if it shows up in another document.
+
+        Args:
+            converter_factory (Callable[..., Any]): Function that builds the docling converter.
+            cache (ConversionCache): Cache storing the OCRed pages.
+            n_workers (Optional[int], optional): Number of OCR processes. Defaults to half the number of CPUs.
+            min_text_chars (int, optional): Pages with fewer text characters are OCRed. Defaults to 20.
+            render_scale (float, optional): Scale of the rendering used to hash the pages. Defaults to 0.5.
+        """
+        self.converter_factory = converter_factory
+        self.converter_options = {"do_table_structure": True,
+                                  "do_ocr": True, "force_full_page_ocr": True}
+        self.cache = cache
+        self.n_workers = max(1, n_workers or (os.cpu_count() or 2) // 2)
+        self.min_text_chars = min_text_chars
+        self.render_scale = render_scale
+        # The pool is only started for the first scanned page, OCR models are heavy to load
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def find_textless_pages(self, dl_doc) -> List[int]:
+        """
+        Finds the pages of a converted document that hold (almost) no text.
+
+        Args:
+            dl_doc (DoclingDocument): The converted document.
+
+        Returns:
+            List[int]: The numbers of the pages to OCR.
+        """
+        text_chars = {page_no: 0 for page_no in dl_doc.pages}
+        for item, _ in dl_doc.iterate_items():
+            text = getattr(item, "text", "") or ""
+            for prov in getattr(item, "prov", []):
+                if prov.page_no in text_chars:
+                    text_chars[prov.page_no] += len(text.strip())
+        return sorted(page_no for page_no, n_chars in text_chars.items() if n_chars < self.min_text_chars)
+
+    def ocr_document(self, document_path: str, dl_doc) -> List:
+        """
+        Runs OCR on the text-less pages of a PDF.
+
+        Args:
+            document_path (str): The file path of the PDF.
+            dl_doc (DoclingDocument): The document converted without OCR.
+
+        Returns:
+            List[DoclingDocument]: One document per OCRed page, with the page numbers of the original PDF.
+
+        Raises:
+            RuntimeError: If the OCR of a page failed, so the document is not stored without it. The pages
+                that succeeded are cached.
+        """
+        if not document_path.lower().endswith(".pdf"):
+            return []
+        page_numbers = self.find_textless_pages(dl_doc)
+        if not page_numbers:
+            return []
+        print(
+            f"OCR on {len(page_numbers)} page(s) without text of '{os.path.basename(document_path)}'...")
+        page_docs: Dict[int, Any] = {}
+        futures = {}
+        pdf = pdfium.PdfDocument(document_path)
+        try:
+            for page_no in page_numbers:
+                page_hash = self._hash_page(pdf, page_no)
+                cached = self.cache.load(page_hash, self.converter_options)
+                if cached is not None:
+                    page_docs[page_no] = cached
+                    continue
+                if self.executor is None:
+                    # Spawn the workers, the ingestion threads may be using the embedding model
+                    self.executor = ProcessPoolExecutor(
+                        max_workers=self.n_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                        initargs=(self.converter_factory, self.converter_options)
+                    )
+                futures[page_no] = (page_hash, self.executor.submit(
+                    _ocr_worker, f"page_{page_no}.pdf", self._extract_page(pdf, page_no)))
+        finally:
+            pdf.close()
+        failed_pages = []
+        for page_no, (page_hash, future) in futures.items():
+            try:
+                page_docs[page_no] = future.result()
+            except Exception as e:
+                print(f"OCR failed for page {page_no} of '{document_path}': {e}")
+                failed_pages.append(page_no)
+                continue
+            self.cache.store(page_hash, self.converter_options,
+                             page_docs[page_no])
+        if failed_pages:
+            raise RuntimeError(
+                f"OCR failed for page(s) {failed_pages} of '{document_path}'")
+        for page_no, page_doc in page_docs.items():
+            self._renumber_pages(page_doc, page_no)
+        return [page_docs[page_no] for page_no in sorted(page_docs)]
+
+    def close(self) -> None:
+        """Stops the OCR worker processes."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def _hash_page(self, pdf: pdfium.PdfDocument, page_no: int) -> str:
+        """
+        Hashes the rendering of a page, so identical pages get the same hash in any document.
+
+        Args:
+            pdf (pdfium.PdfDocument): The open PDF.
+            page_no (int): The page number, starting at 1.
+
+        Returns:
+            str: The hexadecimal digest.
+        """
+        page = pdf[page_no - 1]
+        try:
+            bitmap = page.render(scale=self.render_scale, grayscale=True)
+            return hashlib.sha256(bytes(bitmap.buffer)).hexdigest()
+        finally:
+            page.close()
+
+    def _extract_page(self, pdf: pdfium.PdfDocument, page_no: int) -> bytes:
+        """
+        Copies a page to a new single page PDF.
+
+        Args:
+            pdf (pdfium.PdfDocument): The open PDF.
+            page_no (int): The page number, starting at 1.
+
+        Returns:
+            bytes: The single page PDF.
+        """
+        page_pdf = pdfium.PdfDocument.new()
+        try:
+            page_pdf.import_pages(pdf, [page_no - 1])
+            buffer = io.BytesIO()
+            page_pdf.save(buffer)
+            return buffer.getvalue()
+        finally:
+            page_pdf.close()
+
+    def _renumber_pages(self, page_doc, page_no: int) -> None:
+        """
+        Moves the content of a single page document to its page in the original PDF.
+
+        Args:
+            page_doc (DoclingDocument): The OCRed page.
+            page_no (int): The page number in the original PDF.
+        """
+        for item, _ in page_doc.iterate_items():
+            for prov in getattr(item, "prov", []):
+                prov.page_no = page_no
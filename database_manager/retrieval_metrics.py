@@ -0,0 +1,153 @@
+import math
+import re
+from typing import Dict, List, Optional, Set
+import yaml
+
+
+def load_question_set(yaml_path: str) -> List[Dict]:
+    """
+    Loads a question set with the expected answers of every question.
+    The YAML file has a "questions" list, each entry with a "question" text and an "answers" list of
+    {"document": <document name>, "pages": [<page numbers>]} entries. Pages are optional, an answer
+    without pages matches any chunk of the document.
+
+    Args:
+        yaml_path (str): Path to the YAML file.
+
+    Returns:
+        List[Dict]: The questions, each one with the keys "question" and "answers".
+    """
+    with open(yaml_path, "r") as file:
+        data = yaml.safe_load(file)
+    questions = []
+    for entry in data.get("questions", []):
+        answers = entry.get("answers", [])
+        if "document" in entry:
+            # Shorthand for questions with a single expected answer
+            answers = answers + \
+                [{"document": entry["document"], "pages": entry.get("pages", [])}]
+        questions.append({
+            "question": entry["question"],
+            "answers": [{"document": answer["document"], "pages": list(answer.get("pages") or [])}
+                        for answer in answers],
+        })
+    return questions
+
+
+def get_pages(metadata: Dict) -> Set[int]:
+    """
+    Gets the pages covered by a chunk from its metadata.
+
+    Args:
+        metadata (Dict): The chunk metadata.
+
+    Returns:
+        Set[int]: The page numbers, empty if unknown.
+    """
+    if isinstance(metadata.get("first_page"), int) and isinstance(metadata.get("last_page"), int):
+        return set(range(metadata["first_page"], metadata["last_page"] + 1))
+    return {int(page) for page in re.findall(r"\d+", str(metadata.get("page_number", "")))}
+
+
+def match_answers(metadatas: List[Dict], answers: List[Dict]) -> List[Optional[int]]:
+    """
+    Finds which expected answer each retrieved chunk matches.
+
+    Args:
+        metadatas (List[Dict]): The metadata of the retrieved chunks, in rank order.
+        answers (List[Dict]): The expected answers of the question.
+
+    Returns:
+        List[Optional[int]]: For each retrieved chunk, the index of the answer it matches or None.
+    """
+    matches = []
+    for metadata in metadatas:
+        metadata = metadata or {}
+        pages = get_pages(metadata)
+        match = None
+        for i, answer in enumerate(answers):
+            if metadata.get("document_name") != answer["document"]:
+                continue
+            if not answer["pages"] or pages & set(answer["pages"]):
+                match = i
+                break
+        matches.append(match)
+    return matches
+
+
+def recall_at_k(matches: List[Optional[int]], n_answers: int, k: int) -> float:
+    """
+    Computes the fraction of the expected answers found in the first k results.
+
+    Args:
+        matches (List[Optional[int]]): The answer matched by each result, as returned by match_answers.
+        n_answers (int): The number of expected answers.
+        k (int): The cutoff rank.
+
+    Returns:
+        float: The recall at k.
+    """
+    if n_answers == 0:
+        return 0.0
+    return len({match for match in matches[:k] if match is not None}) / n_answers
+
+
+def reciprocal_rank(matches: List[Optional[int]]) -> float:
+    """
+    Computes the reciprocal of the rank of the first relevant result.
+
+    Args:
+        matches (List[Optional[int]]): The answer matched by each result, as returned by match_answers.
+
+    Returns:
+        float: The reciprocal rank, 0 if no result is relevant.
+    """
+    for rank, match in enumerate(matches, start=1):
+        if match is not None:
+            return 1.0 / rank
+    return 0.0
+
+
+def ndcg_at_k(matches: List[Optional[int]], n_answers: int, k: int) -> float:
+    """
+    Computes the normalized discounted cumulative gain of the first k results, with binary gains.
+    A result only gains if it is the first one matching its answer, so repeated chunks of the same
+    answer are not rewarded.
+
+    Args:
+        matches (List[Optional[int]]): The answer matched by each result, as returned by match_answers.
+        n_answers (int): The number of expected answers.
+        k (int): The cutoff rank.
+
+    Returns:
+        float: The nDCG at k, between 0 and 1.
+    """
+    found = set()
+    dcg = 0.0
+    for rank, match in enumerate(matches[:k], start=1):
+        if match is not None and match not in found:
+            found.add(match)
+            dcg += 1.0 / math.log2(rank + 1)
+    ideal = sum(1.0 / math.log2(rank + 1)
+                for rank in range(1, min(n_answers, k) + 1))
+    return dcg / ideal if ideal > 0 else 0.0
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Computes a percentile with linear interpolation between the closest ranks.
+
+    Args:
+        values (List[float]): The measured values.
+        q (float): The percentile, between 0 and 100.
+
+    Returns:
+        float: The percentile value, NaN for an empty list.
+    """
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
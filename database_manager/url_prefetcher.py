@@ -0,0 +1,181 @@
+import argparse
+import os
+import sys
+from typing import Dict, List, Set
+from chromadb.api.models import Collection
+from database_manager import DatabaseManager
+
+# The web content extractor lives with the AI assistant, reuse it instead of duplicating the fetch logic
+sys.path.append(os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "..", "ai_assistant"))
+from modules.web_content_extractor import WebContentExtractor, WEB_REFERENCES_COLLECTION  # noqa: E402
+
+
+class UrlPrefetcher():
+    def __init__(self, db_manager: DatabaseManager, device: str = "cpu", batch_size: int = 256) -> None:
+        """
+        URL prefetcher class constructor. Finds the URLs cited in the documents of a collection,
+        fetches them and indexes their content in the web references collection, so the AI assistant
+        can answer questions about them without going to the network.
+
+        Args:
+            db_manager (DatabaseManager): The database manager holding the collections.
+            device (str, optional): Device to use for the web extractor (cpu or cuda). Defaults to "cpu".
+            batch_size (int, optional): Number of records read or written per database call. Defaults to 256.
+        """
+        self.db_manager = db_manager
+        self.extractor = WebContentExtractor(device=device)
+        self.batch_size = batch_size
+
+    def collect_urls(self, collection_name: str) -> Dict[str, Set[str]]:
+        """
+        Finds the URLs cited in the documents of a collection.
+
+        Args:
+            collection_name (str): The name of the collection to scan.
+
+        Returns:
+            Dict[str, Set[str]]: The names of the documents citing each URL.
+        """
+        collection = self.db_manager.client.get_collection(
+            name=collection_name)
+        urls: Dict[str, Set[str]] = {}
+        offset = 0
+        while True:
+            batch = collection.get(
+                limit=self.batch_size,
+                offset=offset,
+                include=["documents", "metadatas"]
+            )
+            if not batch["ids"]:
+                break
+            for document, metadata in zip(batch["documents"], batch["metadatas"]):
+                for url in self.extractor.find_urls(document or ""):
+                    urls.setdefault(url, set()).add(
+                        (metadata or {}).get("document_name", "unknown"))
+            offset += len(batch["ids"])
+        return urls
+
+    def prefetch(self, collection_names: List[str], refresh: bool = False) -> None:
+        """
+        Fetches and indexes the URLs cited in the given collections.
+
+        Args:
+            collection_names (List[str]): The collections whose documents are scanned for URLs.
+            refresh (bool, optional): Fetch again URLs that are already indexed. Defaults to False.
+        """
+        references = self.db_manager.client.get_or_create_collection(
+            name=WEB_REFERENCES_COLLECTION, embedding_function=self.db_manager.ef)
+        urls: Dict[str, Set[str]] = {}
+        for collection_name in collection_names:
+            for url, document_names in self.collect_urls(collection_name).items():
+                urls.setdefault(url, set()).update(document_names)
+        print(f"Found {len(urls)} URLs in collections {collection_names}.")
+        pending = []
+        for url in urls:
+            if self._is_indexed(references, url) and not refresh:
+                continue
+            pending.append(url)
+        print(f"Fetching {len(pending)} URLs not indexed yet...")
+        # Fetch everything concurrently, respecting the per host limits of the extractor
+        results = self.extractor.scheduler.map(
+            pending, self.extractor.extract_content)
+        for url, extracted in results.items():
+            if isinstance(extracted, Exception):
+                print(f"Failed to fetch {url}: {extracted}")
+                continue
+            # Only replace the indexed chunks once the new content is in hand, a failed refresh keeps them
+            references.delete(where={"source": url})
+            n_chunks = self._index_url(
+                references, url, extracted["content"], sorted(urls[url]))
+            print(f"Indexed {n_chunks} chunks from {url}.")
+        print(
+            f"Collection '{WEB_REFERENCES_COLLECTION}' has {references.count()} chunks.")
+
+    def _index_url(self, references: Collection, url: str, text: str, document_names: List[str]) -> int:
+        """
+        Chunks the content of an URL and adds it to the web references collection.
+
+        Args:
+            references (Collection): The web references collection.
+            url (str): The URL the content was fetched from.
+            text (str): The markdown content of the URL.
+            document_names (List[str]): The documents citing the URL.
+
+        Returns:
+            int: The number of chunks added.
+        """
+        documents, metadatas, ids = [], [], []
+        for section in self.extractor.chunker.chunk(text):
+            for i, passage in enumerate(section["passages"]):
+                documents.append(passage)
+                metadatas.append({
+                    "source": url,
+                    "document_name": url,
+                    "page_number": "N/A",
+                    "heading": section["heading"],
+                    "referenced_by": "; ".join(document_names),
+                })
+                ids.append(f"{url}_section_{section['index']}_chunk_{i}")
+        for start in range(0, len(documents), self.batch_size):
+            end = start + self.batch_size
+            references.add(
+                documents=documents[start:end],
+                metadatas=metadatas[start:end],
+                ids=ids[start:end]
+            )
+        return len(documents)
+
+    def _is_indexed(self, references: Collection, url: str) -> bool:
+        """
+        Checks if an URL already has chunks in the web references collection.
+
+        Args:
+            references (Collection): The web references collection.
+            url (str): The URL to check.
+
+        Returns:
+            bool: True if the URL is indexed.
+        """
+        results = references.get(where={"source": url}, limit=1, include=[])
+        return len(results["ids"]) > 0
+
+
+def main() -> None:
+    """Prefetches the URLs cited in the documents of the given collections."""
+    parser = argparse.ArgumentParser(
+        description="Prefetch and index the URLs cited in the database documents")
+    parser.add_argument(
+        "--db_path", "-d",
+        type=str,
+        default="./chroma_db",
+        help="Path to the ChromaDB database (default: ./chroma_db)"
+    )
+    parser.add_argument(
+        "--collections", "-c",
+        type=str,
+        nargs="+",
+        default=["documents"],
+        help="Collections whose documents are scanned for URLs (default: documents)"
+    )
+    parser.add_argument(
+        "--device", "-dev",
+        type=str,
+        default="cpu",
+        help="Device to use for embedding (cpu or cuda) (default: cpu)"
+    )
+    parser.add_argument(
+        "--refresh", "-r",
+        action="store_true",
+        help="Fetch again the URLs that are already indexed"
+    )
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(db_path=args.db_path, device=args.device)
+    prefetcher = UrlPrefetcher(db_manager=db_manager, device=args.device)
+    prefetcher.prefetch(collection_names=args.collections,
+                        refresh=args.refresh)
+
+
+if __name__ == "__main__":
+    main()
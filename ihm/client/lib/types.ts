@@ -36,6 +36,7 @@ export type CustomUIDataTypes = {
   sheetDelta: string;
   codeDelta: string;
   statusMessage: string;
+  queueStatus: { position: number; etaSeconds: number | null };
   conversationSummary: string;
   suggestion: Suggestion;
   appendMessage: string;
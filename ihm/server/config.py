@@ -1,6 +1,8 @@
 """Configuration utilities for the FastAPI server."""
 import logging
 import os
+import tempfile
+from datetime import datetime
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -36,10 +38,87 @@ AI_ASSISTANT_POLL_INTERVAL_SECONDS = float(
     os.getenv("AI_ASSISTANT_POLL_INTERVAL_SECONDS", "2.0")
 )
 AI_ASSISTANT_INTERNAL_PORT = int(os.getenv("AI_ASSISTANT_INTERNAL_PORT", "8001"))
+# Agent pool: up to AI_ASSISTANT_POOL_MAX_SIZE containers, the extra ones published on the ports that follow
+# the AI_ASSISTANT_API_URL one and named AI_ASSISTANT_CONTAINER_NAME_<n>. Extra agents are started while
+# inferences wait for a slot and stopped after AI_ASSISTANT_POOL_IDLE_SECONDS without requests
+AI_ASSISTANT_POOL_MAX_SIZE = int(os.getenv("AI_ASSISTANT_POOL_MAX_SIZE", "1"))
+AI_ASSISTANT_POOL_IDLE_SECONDS = float(os.getenv("AI_ASSISTANT_POOL_IDLE_SECONDS", "300"))
+# How the agent status reaches the browser:
+#   in_band - trust the status carried by every streamed agent message (no extra request)
+#   push    - like in_band, plus a background listener on the agent status stream that keeps
+#             the latest status cached for the status endpoint and the pre-inference message
+#   poll    - ask the agent for its status on every streamed status message (legacy behaviour)
+AI_ASSISTANT_STATUS_MODE = os.getenv("AI_ASSISTANT_STATUS_MODE", "in_band").strip().lower()
+if AI_ASSISTANT_STATUS_MODE not in {"in_band", "push", "poll"}:
+    raise ValueError(
+        f"AI_ASSISTANT_STATUS_MODE must be in_band, push or poll, got '{AI_ASSISTANT_STATUS_MODE}'"
+    )
+# When the primary agent runs without sessions:
+#   lazy           - never, it starts with the first session and stops with the last one
+#   always         - always, it starts with the server
+#   business_hours - on AI_ASSISTANT_WARM_WEEKDAYS (0 is Monday) within AI_ASSISTANT_WARM_HOURS (local time),
+#                    lazy outside them
+AI_ASSISTANT_WARM_MODE = os.getenv("AI_ASSISTANT_WARM_MODE", "lazy").strip().lower()
+if AI_ASSISTANT_WARM_MODE not in {"lazy", "always", "business_hours"}:
+    raise ValueError(
+        f"AI_ASSISTANT_WARM_MODE must be lazy, always or business_hours, got '{AI_ASSISTANT_WARM_MODE}'"
+    )
+AI_ASSISTANT_WARM_HOURS = os.getenv("AI_ASSISTANT_WARM_HOURS", "08:00-18:00")
+_warm_start, _, _warm_end = AI_ASSISTANT_WARM_HOURS.partition("-")
+AI_ASSISTANT_WARM_START = datetime.strptime(_warm_start.strip(), "%H:%M").time()
+AI_ASSISTANT_WARM_END = datetime.strptime(_warm_end.strip(), "%H:%M").time()
+AI_ASSISTANT_WARM_WEEKDAYS = {
+    int(day) for day in os.getenv("AI_ASSISTANT_WARM_WEEKDAYS", "0,1,2,3,4").split(",") if day.strip()
+}
 SESSION_IDLE_TTL_SECONDS = int(os.getenv("SESSION_IDLE_TTL_SECONDS", "600"))
 SESSION_SWEEP_INTERVAL_SECONDS = float(
     os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "60")
 )
+# Where sessions, running containers and the lifecycle lock live:
+#   memory - in the worker (single uvicorn worker)
+#   sqlite - in STATE_SQLITE_PATH with a file lock, shared by the workers of one machine
+#   redis  - in the Redis server at STATE_REDIS_URL, shared by workers on any machine
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory").strip().lower()
+if STATE_BACKEND not in {"memory", "sqlite", "redis"}:
+    raise ValueError(f"STATE_BACKEND must be memory, sqlite or redis, got '{STATE_BACKEND}'")
+STATE_SQLITE_PATH = os.getenv(
+    "STATE_SQLITE_PATH",
+    os.path.join(tempfile.gettempdir(), "ihm_state.sqlite3"),
+)
+STATE_REDIS_URL = os.getenv("STATE_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379"))
+# Redis lock expiry, longer than the slowest container start
+STATE_LOCK_TIMEOUT_SECONDS = float(os.getenv("STATE_LOCK_TIMEOUT_SECONDS", "300"))
+# Readiness cache: a healthy agent is trusted for SERVICES_READY_TTL_SECONDS without new health checks,
+# and a background probe refreshes it every SERVICES_READY_PROBE_INTERVAL_SECONDS
+SERVICES_READY_TTL_SECONDS = float(os.getenv("SERVICES_READY_TTL_SECONDS", "15"))
+SERVICES_READY_PROBE_INTERVAL_SECONDS = float(
+    os.getenv("SERVICES_READY_PROBE_INTERVAL_SECONDS", "5")
+)
+# Seconds the collection list is served from memory; POST /ai_assistant/collections/invalidate drops it earlier
+COLLECTIONS_CACHE_TTL_SECONDS = float(os.getenv("COLLECTIONS_CACHE_TTL_SECONDS", "30"))
+# Inference scheduling: how many inferences run on each agent at once, how many a user may have waiting
+# (0 for no limit), how often queued requests get a position update, and the duration assumed for the
+# wait estimate until real inferences have been measured
+INFERENCE_MAX_CONCURRENCY = int(os.getenv("INFERENCE_MAX_CONCURRENCY", "1"))
+INFERENCE_MAX_QUEUED_PER_USER = int(os.getenv("INFERENCE_MAX_QUEUED_PER_USER", "5"))
+INFERENCE_QUEUE_UPDATE_SECONDS = float(os.getenv("INFERENCE_QUEUE_UPDATE_SECONDS", "2.0"))
+INFERENCE_DEFAULT_DURATION_SECONDS = float(
+    os.getenv("INFERENCE_DEFAULT_DURATION_SECONDS", "30")
+)
+# Pooled HTTP client shared by all calls to the AI Assistant agent and manager
+HTTP_CLIENT_MAX_CONNECTIONS = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", "100"))
+HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.getenv("HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS", "20")
+)
+HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS = float(
+    os.getenv("HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS", "30")
+)
+HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS = float(
+    os.getenv("HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS", "5")
+)
+HTTP_CLIENT_POOL_TIMEOUT_SECONDS = float(
+    os.getenv("HTTP_CLIENT_POOL_TIMEOUT_SECONDS", "10")
+)
 
 print(f"[config] USE_AI_ASSISTANT env value: '{os.getenv('USE_AI_ASSISTANT', 'NOT_SET')}'")
 print(f"[config] USE_AI_ASSISTANT parsed to: {USE_AI_ASSISTANT}")
@@ -56,9 +135,33 @@ print(f"[config] AI_ASSISTANT_API_URL: {AI_ASSISTANT_API_URL}")
 print(f"[config] AI_ASSISTANT_START_API_URL: {AI_ASSISTANT_START_API_URL}")
 print(f"[config] AI_ASSISTANT_KILL_API_URL: {AI_ASSISTANT_KILL_API_URL}")
 print(f"[config] AI_ASSISTANT_CONTAINER_NAME: {AI_ASSISTANT_CONTAINER_NAME}")
+print(
+    f"[config] AI_ASSISTANT_POOL: max_size={AI_ASSISTANT_POOL_MAX_SIZE} "
+    f"idle_seconds={AI_ASSISTANT_POOL_IDLE_SECONDS}"
+)
 print(f"[config] INFERENCE_MODEL: {INFERENCE_MODEL_NAME}")
+print(f"[config] AI_ASSISTANT_STATUS_MODE: {AI_ASSISTANT_STATUS_MODE}")
+print(
+    f"[config] AI_ASSISTANT_WARM_MODE: {AI_ASSISTANT_WARM_MODE} "
+    f"(hours={AI_ASSISTANT_WARM_HOURS} weekdays={sorted(AI_ASSISTANT_WARM_WEEKDAYS)})"
+)
+print(
+    f"[config] INFERENCE scheduling: max_concurrency={INFERENCE_MAX_CONCURRENCY} "
+    f"max_queued_per_user={INFERENCE_MAX_QUEUED_PER_USER}"
+)
+print(f"[config] STATE_BACKEND: {STATE_BACKEND}")
 print(f"[config] SESSION_IDLE_TTL_SECONDS: {SESSION_IDLE_TTL_SECONDS}")
 print(f"[config] SESSION_SWEEP_INTERVAL_SECONDS: {SESSION_SWEEP_INTERVAL_SECONDS}")
+print(
+    f"[config] SERVICES_READY_TTL_SECONDS: {SERVICES_READY_TTL_SECONDS} "
+    f"(probe every {SERVICES_READY_PROBE_INTERVAL_SECONDS}s)"
+)
+print(f"[config] COLLECTIONS_CACHE_TTL_SECONDS: {COLLECTIONS_CACHE_TTL_SECONDS}")
+print(
+    f"[config] HTTP_CLIENT limits: max_connections={HTTP_CLIENT_MAX_CONNECTIONS} "
+    f"max_keepalive_connections={HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS} "
+    f"keepalive_expiry={HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS}s"
+)
 print("=" * 80)
 
 logging.basicConfig(
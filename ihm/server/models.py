@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 """Pydantic models used across the FastAPI server."""
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel
 
@@ -18,6 +18,10 @@ class InferenceRequest(BaseModel):
     n_chunks: int = 3
     inference_model_name: str = INFERENCE_MODEL_NAME
     collection_name: str = "none"  # "documents" or "none"
+    # Optional scope of the search in the collection
+    document_names: Optional[List[str]] = None
+    first_page: Optional[int] = None
+    last_page: Optional[int] = None
 
 
 class InferenceResponse(BaseModel):
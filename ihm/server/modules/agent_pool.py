@@ -0,0 +1,182 @@
+"""Pool of AI Assistant agent containers served behind the IHM."""
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AgentInstance:
+    """One AI Assistant container of the pool."""
+
+    index: int
+    container_name: str
+    host_port: int
+    base_url: str
+    running: bool = False
+    starting: bool = False
+    # Monotonic deadline until which the agent is trusted to be healthy without a new check
+    ready_until: float = 0.0
+    outstanding: int = 0
+    last_used_at: float = 0.0
+
+    def mark_ready(self, ttl_seconds: float) -> None:
+        """Trust the agent to be healthy for the next ttl_seconds."""
+        self.ready_until = time.monotonic() + ttl_seconds
+
+    def mark_unready(self) -> None:
+        """Drop the cached readiness so the next request checks the agent again."""
+        self.ready_until = 0.0
+
+    def is_ready(self) -> bool:
+        """Return whether the agent is running and was recently seen healthy."""
+        return self.running and time.monotonic() < self.ready_until
+
+
+def _url_with_port(url: str, port: int) -> str:
+    """Return url pointing to another port of the same host."""
+    parts = urlsplit(url)
+    return urlunsplit(parts._replace(netloc=f"{parts.hostname}:{port}"))
+
+
+class AgentPool:
+    """AI Assistant containers on consecutive host ports, routed by least outstanding requests.
+
+    The first agent keeps the configured container name and URL. It is started for the first
+    session and stopped with the last one, like the single shared container it replaces. The other
+    agents are started when inferences queue up and stopped once they stay idle.
+
+    A session keeps going to the agent that served it while that agent is ready and has a free
+    inference slot. Otherwise, and for new sessions, the inference goes to the ready agent with the
+    fewest requests in flight. The summary travels with every request, so moving a session to
+    another agent loses nothing.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        container_name: str,
+        max_size: int = 1,
+        max_concurrency: int = 1,
+    ) -> None:
+        first_port = urlsplit(base_url).port or 80
+        self.agents: List[AgentInstance] = [
+            AgentInstance(
+                index=index,
+                container_name=container_name if index == 0 else f"{container_name}_{index}",
+                host_port=first_port + index,
+                base_url=base_url if index == 0 else _url_with_port(base_url, first_port + index),
+            )
+            for index in range(max(1, max_size))
+        ]
+        self._affinity: Dict[str, int] = {}
+        # Inferences an agent runs at once, a pinned session only waits for its agent below it
+        self.max_concurrency = max(1, max_concurrency)
+
+    @property
+    def primary(self) -> AgentInstance:
+        """The agent that lives as long as there are active sessions."""
+        return self.agents[0]
+
+    @property
+    def running_count(self) -> int:
+        """Number of agents currently running."""
+        return sum(1 for agent in self.agents if agent.running)
+
+    @property
+    def scaling(self) -> bool:
+        """Whether an agent is being started to grow the pool."""
+        return any(agent.starting for agent in self.agents)
+
+    def next_stopped(self) -> Optional[AgentInstance]:
+        """Return the next agent the pool can grow with, None when the pool is full."""
+        for agent in self.agents[1:]:
+            if not agent.running and not agent.starting:
+                return agent
+        return None
+
+    def acquire(self, session_id: str) -> AgentInstance:
+        """Pick the agent for an inference of a session and count it as outstanding there."""
+        candidates = [agent for agent in self.agents if agent.is_ready()] or [self.primary]
+        pinned_index = self._affinity.get(session_id)
+        agent = next(
+            (
+                candidate
+                for candidate in candidates
+                if candidate.index == pinned_index and candidate.outstanding < self.max_concurrency
+            ),
+            None,
+        )
+        if agent is None:
+            agent = min(candidates, key=lambda candidate: (candidate.outstanding, candidate.index))
+            self._affinity[session_id] = agent.index
+
+        agent.outstanding += 1
+        agent.last_used_at = time.monotonic()
+        return agent
+
+    def release(self, agent: AgentInstance) -> None:
+        """Count a finished inference out of its agent."""
+        agent.outstanding = max(0, agent.outstanding - 1)
+        agent.last_used_at = time.monotonic()
+
+    def forget_sessions(self, session_ids: Iterable[str]) -> None:
+        """Drop the agent affinity of sessions that ended."""
+        for session_id in session_ids:
+            self._affinity.pop(session_id, None)
+
+    def idle_agents(self, idle_seconds: float) -> List[AgentInstance]:
+        """Return the extra agents with nothing in flight for at least idle_seconds."""
+        now = time.monotonic()
+        return [
+            agent
+            for agent in self.agents[1:]
+            if agent.running
+            and agent.outstanding == 0
+            and now - agent.last_used_at >= idle_seconds
+        ]
+
+    def mark_started(self, agent: AgentInstance, ready_ttl_seconds: float) -> None:
+        """Record that an agent is running and healthy."""
+        agent.running = True
+        agent.mark_ready(ready_ttl_seconds)
+        agent.last_used_at = time.monotonic()
+
+    def sync_running(self, running_containers: Dict[str, float]) -> bool:
+        """Align the running flags with the containers recorded in the shared state backend.
+
+        running_containers maps container names to the wall-clock time of their last use. Agents
+        another worker started stay unready until a health check passes. Return whether a running
+        flag changed.
+        """
+        changed = False
+        monotonic_offset = time.monotonic() - time.time()
+        for agent in self.agents:
+            last_used_at = running_containers.get(agent.container_name)
+            if last_used_at is None:
+                if agent.running:
+                    self.mark_stopped(agent)
+                    changed = True
+                continue
+            if not agent.running:
+                agent.running = True
+                agent.mark_unready()
+                changed = True
+            # Requests served by the other workers keep the agent busy as well
+            agent.last_used_at = max(agent.last_used_at, last_used_at + monotonic_offset)
+        return changed
+
+    def mark_stopped(self, agent: AgentInstance) -> None:
+        """Record that an agent is stopped and send its sessions elsewhere."""
+        agent.running = False
+        agent.mark_unready()
+        self._affinity = {
+            session_id: index
+            for session_id, index in self._affinity.items()
+            if index != agent.index
+        }
@@ -10,7 +10,12 @@ from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
 from fastapi.responses import StreamingResponse
 
 from ihm.server import state
-from ihm.server.config import USE_AI_ASSISTANT
+from ihm.server.config import (
+    AI_ASSISTANT_STATUS_MODE,
+    COLLECTIONS_CACHE_TTL_SECONDS,
+    INFERENCE_QUEUE_UPDATE_SECONDS,
+    USE_AI_ASSISTANT,
+)
 from ihm.server.models import (
     AvailableModelsResponse,
     CollectionsResponse,
@@ -19,18 +24,22 @@ from ihm.server.models import (
     ServiceRequest,
     ServiceResponse,
 )
+from ihm.server.modules.agent_pool import AgentInstance
 from ihm.server.modules.rest_api_client import (
     get_ai_assistant_available_models,
     get_ai_assistant_collections,
     get_ai_assistant_conversation_summary,
     get_ai_assistant_health,
     get_ai_assistant_status,
+    invalidate_ai_assistant_collections,
     stream_ai_assistant_inference,
 )
+from ihm.server.modules.scheduler import InferenceTicket, QueueFullError
 from ihm.server.modules.services import (
     build_mock_stream,
     ensure_services_ready,
     format_sse_event,
+    request_scale_up,
     shutdown_services_if_idle,
     start_services_if_needed,
 )
@@ -59,18 +68,19 @@ def _request_metadata(request: Request) -> Dict[str, str]:
 
 async def _register_or_touch_session(session_id: str, user_id: str, source: str) -> tuple[int, int]:
     """Track a session entirely on the server side."""
-    async with state.service_lock:
-        state.register_session(session_id=session_id, user_id=user_id, source=source)
+    async with state.service_lock():
+        await state.register_session(session_id=session_id, user_id=user_id, source=source)
         return (
-            state.count_active_sessions(),
-            state.count_active_sessions(user_id=user_id),
+            await state.count_active_sessions(),
+            await state.count_active_sessions(user_id=user_id),
         )
 
 
 async def _remove_session(session_id: str, user_id_hint: str) -> tuple[str, int, int]:
     """Remove a session from runtime state and return updated counters."""
-    async with state.service_lock:
-        session_data = state.remove_session(session_id)
+    async with state.service_lock():
+        session_data = await state.remove_session(session_id)
+        state.agent_pool.forget_sessions([session_id])
         user_id = (
             session_data["user_id"]
             if session_data
@@ -78,8 +88,8 @@ async def _remove_session(session_id: str, user_id_hint: str) -> tuple[str, int,
         )
         return (
             user_id,
-            state.count_active_sessions(),
-            state.count_active_sessions(user_id=user_id),
+            await state.count_active_sessions(),
+            await state.count_active_sessions(user_id=user_id),
         )
 
 
@@ -88,16 +98,38 @@ def _runtime_request_context() -> tuple[str, str]:
     return (state.last_user_id or "1", "runtime-options")
 
 
-async def _latest_ai_assistant_status(fallback: str = "") -> str:
+async def _latest_ai_assistant_status(fallback: str, agent: AgentInstance) -> str:
     """Read the authoritative status from the AI Assistant agent when available."""
     try:
-        status = await get_ai_assistant_status()
+        status = await get_ai_assistant_status(base_url=agent.base_url)
         return status or fallback
     except HTTPException as exc:
         logger.warning("AI Assistant status fetch failed; using fallback: %s", exc.detail)
         return fallback
 
 
+async def _current_ai_assistant_status(fallback: str, agent: AgentInstance) -> str:
+    """Resolve the agent status outside of a streamed message, following AI_ASSISTANT_STATUS_MODE."""
+    if AI_ASSISTANT_STATUS_MODE == "poll":
+        return await _latest_ai_assistant_status(fallback, agent)
+    # The status listener only follows the primary agent
+    if (
+        AI_ASSISTANT_STATUS_MODE == "push"
+        and state.ai_assistant_status_connected
+        and agent is state.agent_pool.primary
+    ):
+        return state.ai_assistant_status or fallback
+    return fallback
+
+
+async def _message_ai_assistant_status(message_status: str, agent: AgentInstance) -> str:
+    """Resolve the status to show for a streamed agent message, following AI_ASSISTANT_STATUS_MODE."""
+    if AI_ASSISTANT_STATUS_MODE == "poll":
+        return await _latest_ai_assistant_status(message_status, agent)
+    # The agent reads its status right before sending every message, asking again only adds a round-trip
+    return message_status
+
+
 @router.get("/", response_model=HealthResponse)
 async def root() -> HealthResponse:
     """Return a simple response to confirm the server is alive."""
@@ -110,9 +142,9 @@ async def health_check() -> HealthResponse:
     if not USE_AI_ASSISTANT:
         return HealthResponse(status="healthy", message="Server working in mock mode")
 
-    active_sessions = state.count_active_sessions()
+    active_sessions = await state.count_active_sessions()
 
-    if not state.docker_container_running:
+    if not state.agent_pool.primary.running:
         return HealthResponse(
             status="healthy",
             message=f"AI Assistant enabled with no running container ({active_sessions} active session(s))",
@@ -130,8 +162,8 @@ async def health_check() -> HealthResponse:
     return HealthResponse(
         status="healthy",
         message=(
-            f"AI Assistant container running ({active_sessions} active session(s)); "
-            f"agent health: {ai_status}"
+            f"{state.agent_pool.running_count} AI Assistant container(s) running "
+            f"({active_sessions} active session(s)); agent health: {ai_status}"
         ),
     )
 
@@ -159,10 +191,12 @@ async def available_models() -> AvailableModelsResponse:
 
 @router.get("/ai_assistant/status")
 async def ai_assistant_status() -> Dict[str, str]:
-    """Proxy the current AI Assistant activity status from the agent on port 8001."""
+    """Proxy the current activity status of the primary AI Assistant agent."""
     if not USE_AI_ASSISTANT:
         return {"status": "Modo mock ativo"}
 
+    if AI_ASSISTANT_STATUS_MODE == "push" and state.ai_assistant_status_connected:
+        return {"status": state.ai_assistant_status}
     return {"status": await get_ai_assistant_status()}
 
 
@@ -175,6 +209,11 @@ async def collections() -> CollectionsResponse:
     if not USE_AI_ASSISTANT:
         return CollectionsResponse(collection_names=[], ready=True)
 
+    # Page loads reuse the list instead of waking the agent and the database
+    cached = state.cached_collections()
+    if cached is not None:
+        return CollectionsResponse(**cached)
+
     user_id, session_id = _runtime_request_context()
     await ensure_services_ready(user_id=user_id, session_id=session_id)
     data = await get_ai_assistant_collections()
@@ -184,10 +223,42 @@ async def collections() -> CollectionsResponse:
         for collection_name in data.get("collection_names", [])
         if isinstance(collection_name, str) and collection_name.strip()
     ]
-    return CollectionsResponse(
-        collection_names=collection_names,
-        ready=bool(data.get("ready", True)),
-    )
+    ready = bool(data.get("ready", True))
+    if ready:
+        state.cache_collections(
+            {"collection_names": collection_names, "ready": ready},
+            COLLECTIONS_CACHE_TTL_SECONDS,
+        )
+    return CollectionsResponse(collection_names=collection_names, ready=ready)
+
+
+@router.post("/ai_assistant/collections/invalidate")
+async def invalidate_collections() -> Dict[str, str]:
+    """Drop the cached collection list here and on every running agent."""
+    state.invalidate_collections_cache()
+    if not USE_AI_ASSISTANT:
+        return {"status": "ok", "message": "Collections cache invalidated"}
+
+    invalidated_containers = []
+    for agent in state.agent_pool.agents:
+        if not agent.running:
+            continue
+        try:
+            await invalidate_ai_assistant_collections(base_url=agent.base_url)
+        except HTTPException as exc:
+            logger.warning(
+                "COLLECTIONS INVALIDATION FAILED - container=%s detail=%s",
+                agent.container_name,
+                exc.detail,
+            )
+            continue
+        invalidated_containers.append(agent.container_name)
+
+    logger.info("COLLECTIONS CACHE INVALIDATED - containers=%s", invalidated_containers)
+    return {
+        "status": "ok",
+        "message": f"Collections cache invalidated on {len(invalidated_containers)} agent(s)",
+    }
 
 
 @router.post("/turn_on_services", response_model=ServiceResponse)
@@ -306,137 +377,214 @@ async def _build_ai_assistant_stream(
     message_id = f"ai-{inference_request.session_id}-{id(inference_request)}"
     message_started = False
 
-    if state.inference_lock.locked():
-        yield format_sse_event(
-            {
-                "type": "data-statusMessage",
-                "data": "Aguardando outra inferencia em andamento...",
-                "transient": True,
-            }
-        )
+    ticket: InferenceTicket | None = None
+    agent: AgentInstance | None = None
+    scheduler = state.inference_scheduler
 
     try:
-        async with state.inference_lock:
-            startup_status = "Iniciando o AI Assistant e verificando serviços."
-            logger.info(
-                "INFERENCE STATUS OUT - session_id=%s user_id=%s status=%s",
-                inference_request.session_id,
-                inference_request.user_id,
-                startup_status,
+        try:
+            ticket = scheduler.enqueue(
+                user_id=inference_request.user_id,
+                session_id=inference_request.session_id,
+            )
+        except QueueFullError as exc:
+            raise HTTPException(status_code=429, detail=str(exc)) from exc
+
+        # Position updates double as keep-alives while the request waits for a slot
+        last_position = None
+        while not ticket.granted.is_set():
+            position = scheduler.position(ticket)
+            eta_seconds = scheduler.estimated_wait_seconds(ticket)
+            if position != last_position:
+                logger.info(
+                    "INFERENCE QUEUED - session_id=%s user_id=%s position=%s eta_seconds=%s in_flight=%s waiting=%s",
+                    inference_request.session_id,
+                    inference_request.user_id,
+                    position,
+                    eta_seconds,
+                    scheduler.in_flight,
+                    scheduler.waiting,
+                )
+                last_position = position
+            # Demand exceeds the running agents, grow the pool when it can
+            request_scale_up(
+                user_id=inference_request.user_id,
+                session_id=inference_request.session_id,
             )
             yield format_sse_event(
                 {
                     "type": "data-statusMessage",
-                    "data": startup_status,
+                    "data": (
+                        f"Aguardando na fila: posição {position}, "
+                        f"tempo estimado de {round(eta_seconds or 0)} s."
+                    ),
                     "transient": True,
                 }
             )
-
-            await ensure_services_ready(
-                user_id=inference_request.user_id,
-                session_id=inference_request.session_id,
-            )
-
-            inference_payload = {
-                "query": inference_request.query,
-                "conversation_summary": inference_request.conversation_summary,
-                "n_chunks": inference_request.n_chunks,
-                "collection_name": inference_request.collection_name,
-                "inference_model_name": inference_request.inference_model_name,
-                "session_id": inference_request.session_id,
-            }
-
-            ready_status = await _latest_ai_assistant_status(
-                "Serviços prontos. Enviando consulta ao AI Assistant."
-            )
-            logger.info(
-                "INFERENCE STATUS OUT - session_id=%s user_id=%s status=%s",
-                inference_request.session_id,
-                inference_request.user_id,
-                ready_status,
-            )
             yield format_sse_event(
                 {
-                    "type": "data-statusMessage",
-                    "data": ready_status,
+                    "type": "data-queueStatus",
+                    "data": {"position": position, "etaSeconds": eta_seconds},
                     "transient": True,
                 }
             )
+            await scheduler.wait(ticket, timeout=INFERENCE_QUEUE_UPDATE_SECONDS)
 
-            yield format_sse_event({"type": "start-step"})
-            yield format_sse_event({"type": "text-start", "id": message_id})
-            message_started = True
+        startup_status = "Iniciando o AI Assistant e verificando serviços."
+        logger.info(
+            "INFERENCE STATUS OUT - session_id=%s user_id=%s status=%s",
+            inference_request.session_id,
+            inference_request.user_id,
+            startup_status,
+        )
+        yield format_sse_event(
+            {
+                "type": "data-statusMessage",
+                "data": startup_status,
+                "transient": True,
+            }
+        )
+
+        await ensure_services_ready(
+            user_id=inference_request.user_id,
+            session_id=inference_request.session_id,
+        )
+
+        inference_payload = {
+            "query": inference_request.query,
+            "conversation_summary": inference_request.conversation_summary,
+            "n_chunks": inference_request.n_chunks,
+            "collection_name": inference_request.collection_name,
+            "document_names": inference_request.document_names,
+            "first_page": inference_request.first_page,
+            "last_page": inference_request.last_page,
+            "inference_model_name": inference_request.inference_model_name,
+            "session_id": inference_request.session_id,
+        }
+
+        agent = state.agent_pool.acquire(inference_request.session_id)
+        # Keeps the agent off the idle scale-down of the other workers
+        await state.backend.touch_container(agent.container_name)
+        logger.info(
+            "INFERENCE ROUTED - session_id=%s user_id=%s container=%s outstanding=%s running_agents=%s",
+            inference_request.session_id,
+            inference_request.user_id,
+            agent.container_name,
+            agent.outstanding,
+            state.agent_pool.running_count,
+        )
 
-            async for msg in stream_ai_assistant_inference(inference_payload):
-                msg_type = msg.get("type")
-
-                if msg_type == "chunk":
-                    chunk_text = str(msg.get("data", ""))
-                    if chunk_text:
-                        yield format_sse_event(
-                            {"type": "text-delta", "id": message_id, "delta": chunk_text}
-                        )
-                        # Yield control back to the event loop so Uvicorn can
-                        # flush this chunk to the client before the next one.
-                        await asyncio.sleep(0)
-
-                elif msg_type == "status":
-                    status_text = await _latest_ai_assistant_status(
-                        str(msg.get("status") or msg.get("data", "")).strip()
+        ready_status = await _current_ai_assistant_status(
+            "Serviços prontos. Enviando consulta ao AI Assistant.",
+            agent,
+        )
+        logger.info(
+            "INFERENCE STATUS OUT - session_id=%s user_id=%s status=%s",
+            inference_request.session_id,
+            inference_request.user_id,
+            ready_status,
+        )
+        yield format_sse_event(
+            {
+                "type": "data-statusMessage",
+                "data": ready_status,
+                "transient": True,
+            }
+        )
+
+        yield format_sse_event({"type": "start-step"})
+        yield format_sse_event({"type": "text-start", "id": message_id})
+        message_started = True
+
+        async for msg in stream_ai_assistant_inference(inference_payload, base_url=agent.base_url):
+            msg_type = msg.get("type")
+
+            if msg_type == "chunk":
+                chunk_text = str(msg.get("data", ""))
+                if chunk_text:
+                    yield format_sse_event(
+                        {"type": "text-delta", "id": message_id, "delta": chunk_text}
                     )
-                    if status_text:
-                        logger.info(
-                            "INFERENCE STATUS OUT - session_id=%s user_id=%s status=%s",
-                            inference_request.session_id,
-                            inference_request.user_id,
-                            status_text,
-                        )
-                        yield format_sse_event(
-                            {
-                                "type": "data-statusMessage",
-                                "data": status_text,
-                                "transient": True,
-                            }
-                        )
-
-                elif msg_type == "complete":
-                    status_text = await _latest_ai_assistant_status(
-                        str(msg.get("status", "")).strip()
+                    # Yield control back to the event loop so Uvicorn can
+                    # flush this chunk to the client before the next one.
+                    await asyncio.sleep(0)
+
+            elif msg_type == "status":
+                status_text = await _message_ai_assistant_status(
+                    str(msg.get("status") or msg.get("data", "")).strip(),
+                    agent,
+                )
+                if status_text:
+                    logger.info(
+                        "INFERENCE STATUS OUT - session_id=%s user_id=%s status=%s",
+                        inference_request.session_id,
+                        inference_request.user_id,
+                        status_text,
                     )
-                    if status_text:
-                        logger.info(
-                            "INFERENCE STATUS OUT - session_id=%s user_id=%s status=%s",
-                            inference_request.session_id,
-                            inference_request.user_id,
-                            status_text,
-                        )
-                        yield format_sse_event(
-                            {
-                                "type": "data-statusMessage",
-                                "data": status_text,
-                                "transient": True,
-                            }
-                        )
-                    latest_summary = await get_ai_assistant_conversation_summary()
                     yield format_sse_event(
-                        {"type": "data-conversationSummary", "data": latest_summary}
+                        {
+                            "type": "data-statusMessage",
+                            "data": status_text,
+                            "transient": True,
+                        }
                     )
 
-                elif msg_type == "error":
-                    error_text = str(msg.get("error", "Erro desconhecido na inferencia"))
+            elif msg_type == "complete":
+                status_text = await _message_ai_assistant_status(
+                    str(msg.get("status", "")).strip(),
+                    agent,
+                )
+                if status_text:
+                    logger.info(
+                        "INFERENCE STATUS OUT - session_id=%s user_id=%s status=%s",
+                        inference_request.session_id,
+                        inference_request.user_id,
+                        status_text,
+                    )
                     yield format_sse_event(
                         {
                             "type": "data-statusMessage",
-                            "data": f"Erro: {error_text}",
+                            "data": status_text,
                             "transient": True,
                         }
                     )
-                    yield format_sse_event(
-                        {"type": "text-delta", "id": message_id, "delta": error_text}
+                if "conversation_summary" in msg:
+                    latest_summary = str(msg.get("conversation_summary") or "")
+                else:
+                    # Agents built before the summary was sent in-band
+                    latest_summary = await get_ai_assistant_conversation_summary(
+                        base_url=agent.base_url
                     )
+                logger.info(
+                    "INFERENCE SUMMARY OUT - session_id=%s user_id=%s summary_version=%s summary_chars=%s in_band=%s",
+                    inference_request.session_id,
+                    inference_request.user_id,
+                    msg.get("summary_version"),
+                    len(latest_summary),
+                    "conversation_summary" in msg,
+                )
+                yield format_sse_event(
+                    {"type": "data-conversationSummary", "data": latest_summary}
+                )
+
+            elif msg_type == "error":
+                error_text = str(msg.get("error", "Erro desconhecido na inferencia"))
+                yield format_sse_event(
+                    {
+                        "type": "data-statusMessage",
+                        "data": f"Erro: {error_text}",
+                        "transient": True,
+                    }
+                )
+                yield format_sse_event(
+                    {"type": "text-delta", "id": message_id, "delta": error_text}
+                )
 
     except HTTPException as exc:
         error_text = str(exc.detail)
+        if exc.status_code in (502, 503):
+            # The agent failed mid-request, check it again instead of trusting the cached readiness
+            (agent or state.agent_pool.primary).mark_unready()
         logger.error(
             "INFERENCE STREAM FAILED - session_id=%s user_id=%s detail=%s",
             inference_request.session_id,
@@ -480,6 +628,11 @@ async def _build_ai_assistant_stream(
         yield format_sse_event({"type": "text-delta", "id": message_id, "delta": error_text})
 
     finally:
+        # Free the slot (or leave the queue) first, the client may already be gone
+        if agent is not None:
+            state.agent_pool.release(agent)
+        if ticket is not None:
+            scheduler.release(ticket)
         if message_started:
             yield format_sse_event({"type": "text-end", "id": message_id})
         yield format_sse_event({"type": "finish-step"})
@@ -501,12 +654,15 @@ async def run_inference(
     )
 
     logger.info(
-        "INFERENCE REQUEST - user_id=%s session_id=%s active_sessions=%s user_sessions=%s collection_name=%s inference_model_name=%s n_chunks=%s query_chars=%s query_preview=%s conversation_summary_chars=%s conversation_summary_preview=%s origin=%s referer=%s user_agent=%s",
+        "INFERENCE REQUEST - user_id=%s session_id=%s active_sessions=%s user_sessions=%s collection_name=%s document_names=%s pages=%s-%s inference_model_name=%s n_chunks=%s query_chars=%s query_preview=%s conversation_summary_chars=%s conversation_summary_preview=%s origin=%s referer=%s user_agent=%s",
         inference_request.user_id,
         inference_request.session_id,
         active_count,
         user_session_count,
         inference_request.collection_name,
+        inference_request.document_names,
+        inference_request.first_page,
+        inference_request.last_page,
         inference_request.inference_model_name,
         inference_request.n_chunks,
         len(inference_request.query),
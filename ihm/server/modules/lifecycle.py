@@ -4,11 +4,30 @@ import logging
 from contextlib import asynccontextmanager
 from typing import Optional
 
-from fastapi import FastAPI
+import httpx
+from fastapi import FastAPI, HTTPException
 
 from ihm.server import state
-from ihm.server.config import SESSION_SWEEP_INTERVAL_SECONDS, USE_AI_ASSISTANT
-from ihm.server.modules.services import shutdown_services_if_idle, sweep_idle_sessions
+from ihm.server.config import (
+    AI_ASSISTANT_POLL_INTERVAL_SECONDS,
+    AI_ASSISTANT_STATUS_MODE,
+    AI_ASSISTANT_WARM_MODE,
+    SERVICES_READY_PROBE_INTERVAL_SECONDS,
+    SESSION_SWEEP_INTERVAL_SECONDS,
+    USE_AI_ASSISTANT,
+)
+from ihm.server.modules.rest_api_client import (
+    close_http_client,
+    open_http_client,
+    stream_ai_assistant_status,
+)
+from ihm.server.modules.services import (
+    cancel_scale_up,
+    keep_agent_warm,
+    probe_services_ready,
+    shutdown_services_if_idle,
+    sweep_idle_sessions,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -23,10 +42,56 @@ async def _idle_session_sweeper() -> None:
             logger.exception("Idle session sweep failed: %s", exc)
 
 
+async def _warm_keeper() -> None:
+    """Start the primary agent whenever the warm window is open and it is not running."""
+    while True:
+        try:
+            await keep_agent_warm()
+        except Exception as exc:  # pragma: no cover - defensive logging
+            logger.exception("Agent warm-up failed: %s", exc)
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL_SECONDS)
+
+
+async def _readiness_probe() -> None:
+    """Periodically refresh the cached readiness of the agent containers."""
+    while True:
+        await asyncio.sleep(SERVICES_READY_PROBE_INTERVAL_SECONDS)
+        try:
+            await probe_services_ready()
+        except Exception as exc:  # pragma: no cover - defensive logging
+            logger.exception("Readiness probe failed: %s", exc)
+
+
+async def _ai_assistant_status_listener() -> None:
+    """Keep the latest primary agent status cached from its status stream while the container runs."""
+    while True:
+        if not state.agent_pool.primary.running:
+            await asyncio.sleep(AI_ASSISTANT_POLL_INTERVAL_SECONDS)
+            continue
+        try:
+            async for status in stream_ai_assistant_status(base_url=state.agent_pool.primary.base_url):
+                if not state.ai_assistant_status_connected:
+                    state.ai_assistant_status_connected = True
+                    logger.info("AI ASSISTANT STATUS STREAM CONNECTED")
+                state.set_ai_assistant_status(status)
+        except (httpx.HTTPError, HTTPException) as exc:
+            detail = exc.detail if isinstance(exc, HTTPException) else str(exc)
+            if state.ai_assistant_status_connected:
+                logger.warning("AI ASSISTANT STATUS STREAM LOST - error=%s", detail)
+        except Exception as exc:  # pragma: no cover - defensive logging
+            logger.exception("AI Assistant status listener failed: %s", exc)
+        state.ai_assistant_status_connected = False
+        await asyncio.sleep(AI_ASSISTANT_POLL_INTERVAL_SECONDS)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Clean up services when the FastAPI server stops."""
+    """Open the shared HTTP client on startup and clean up services when the FastAPI server stops."""
     sweeper_task: Optional[asyncio.Task[None]] = None
+    readiness_task: Optional[asyncio.Task[None]] = None
+    warm_keeper_task: Optional[asyncio.Task[None]] = None
+    status_listener_task: Optional[asyncio.Task[None]] = None
+    await open_http_client()
     try:
         if USE_AI_ASSISTANT:
             try:
@@ -34,8 +99,22 @@ async def lifespan(app: FastAPI):
             except Exception as exc:  # pragma: no cover - defensive startup
                 logger.warning("Startup AI Assistant reconciliation failed: %s", exc)
             sweeper_task = asyncio.create_task(_idle_session_sweeper())
+            readiness_task = asyncio.create_task(_readiness_probe())
+            if AI_ASSISTANT_WARM_MODE != "lazy":
+                warm_keeper_task = asyncio.create_task(_warm_keeper())
+            if AI_ASSISTANT_STATUS_MODE == "push":
+                status_listener_task = asyncio.create_task(_ai_assistant_status_listener())
         yield
     finally:
+        for task in (warm_keeper_task, status_listener_task, readiness_task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
         if sweeper_task is not None:
             sweeper_task.cancel()
             try:
@@ -43,10 +122,14 @@ async def lifespan(app: FastAPI):
             except asyncio.CancelledError:
                 pass
 
+        await cancel_scale_up()
+
         user_id = state.last_user_id or "1"
-        state.active_sessions.clear()
+        # A shared backend keeps the sessions of the other workers, the containers stop with the last one
+        if not state.backend.shared:
+            await state.clear_sessions()
 
-        # Stop shared Docker container when server shuts down.
+        # Stop the shared Docker containers when server shuts down.
         if USE_AI_ASSISTANT:
             try:
                 await shutdown_services_if_idle(
@@ -57,4 +140,9 @@ async def lifespan(app: FastAPI):
             except Exception as exc:  # pragma: no cover - defensive cleanup
                 logger.warning("Error while stopping AI Assistant on shutdown: %s", exc)
             finally:
-                state.docker_container_running = False
+                for agent in state.agent_pool.agents:
+                    state.agent_pool.mark_stopped(agent)
+
+        # Closed last, the container shutdown above still goes through it.
+        await close_http_client()
+        await state.backend.close()
@@ -19,11 +19,65 @@ from ihm.server.config import (
     AI_ASSISTANT_KILL_API_URL,
     AI_ASSISTANT_POLL_INTERVAL_SECONDS,
     AI_ASSISTANT_START_API_URL,
+    HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS,
+    HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP_CLIENT_MAX_CONNECTIONS,
+    HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_CLIENT_POOL_TIMEOUT_SECONDS,
     INFERENCE_MODEL_NAME,
 )
 
 logger = logging.getLogger(__name__)
 
+# App-scoped client shared by every helper, so connections to the agent and the manager are reused.
+_http_client: httpx.AsyncClient | None = None
+
+
+def _timeout(read_seconds: float | None) -> httpx.Timeout:
+    """Build a request timeout, keeping the pool-wide connect and pool limits."""
+    return httpx.Timeout(
+        read_seconds,
+        connect=HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS,
+        pool=HTTP_CLIENT_POOL_TIMEOUT_SECONDS,
+    )
+
+
+async def open_http_client() -> httpx.AsyncClient:
+    """Create the pooled HTTP client used by all REST helpers."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=_timeout(10),
+            limits=httpx.Limits(
+                max_connections=HTTP_CLIENT_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+        logger.info(
+            "HTTP CLIENT OPENED - max_connections=%s max_keepalive_connections=%s keepalive_expiry=%s",
+            HTTP_CLIENT_MAX_CONNECTIONS,
+            HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+            HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS,
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the pooled HTTP client and its open connections."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        logger.info("HTTP CLIENT CLOSED")
+
+
+async def _get_http_client() -> httpx.AsyncClient:
+    """Return the pooled HTTP client, creating it when used outside the app lifespan."""
+    if _http_client is None or _http_client.is_closed:
+        return await open_http_client()
+    return _http_client
+
 
 def _coerce_user_id(user_id: str) -> int:
     """Convert a user id string into a stable integer for logging purposes."""
@@ -61,14 +115,24 @@ def _classify_manager_kill_failure(raw_response: str) -> str:
     return "manager_rejected_kill"
 
 
-async def start_ai_assistant_agent(user_id: str, session_id: str) -> None:
-    """Request the REST API to start the shared AI Assistant container."""
+async def start_ai_assistant_agent(
+    user_id: str,
+    session_id: str,
+    *,
+    container_name: str = AI_ASSISTANT_CONTAINER_NAME,
+    host_port: int | None = None,
+) -> bool:
+    """Request the REST API to start an AI Assistant container, published on host_port.
+
+    Return False when the container or its port already existed, i.e. this call did not create it.
+    """
     coerced_user_id = _coerce_user_id(user_id)
     payload: Dict[str, Any] = {
         "port": AI_ASSISTANT_INTERNAL_PORT,
+        "host_port": host_port or AI_ASSISTANT_INTERNAL_PORT,
         "db_ip_address": AI_ASSISTANT_DB_IP_ADDRESS,
         "inference_model_name": INFERENCE_MODEL_NAME,
-        "container_name": AI_ASSISTANT_CONTAINER_NAME,
+        "container_name": container_name,
     }
 
     logger.info(
@@ -77,14 +141,14 @@ async def start_ai_assistant_agent(user_id: str, session_id: str) -> None:
         session_id,
         user_id,
         coerced_user_id,
-        AI_ASSISTANT_CONTAINER_NAME,
+        container_name,
         payload,
     )
     started_at = time.perf_counter()
 
     try:
-        async with httpx.AsyncClient(timeout=20) as client:
-            response = await client.post(AI_ASSISTANT_START_API_URL, json=payload)
+        client = await _get_http_client()
+        response = await client.post(AI_ASSISTANT_START_API_URL, json=payload, timeout=_timeout(20))
     except httpx.HTTPError as exc:
         duration_ms = round((time.perf_counter() - started_at) * 1000, 1)
         logger.error(
@@ -92,7 +156,7 @@ async def start_ai_assistant_agent(user_id: str, session_id: str) -> None:
             session_id,
             user_id,
             coerced_user_id,
-            AI_ASSISTANT_CONTAINER_NAME,
+            container_name,
             duration_ms,
             AI_ASSISTANT_START_API_URL,
         )
@@ -123,7 +187,7 @@ async def start_ai_assistant_agent(user_id: str, session_id: str) -> None:
             session_id,
             user_id,
             coerced_user_id,
-            AI_ASSISTANT_CONTAINER_NAME,
+            container_name,
             response.status_code,
             duration_ms,
         )
@@ -137,7 +201,7 @@ async def start_ai_assistant_agent(user_id: str, session_id: str) -> None:
                 "AI Assistant manager start continuing after recoverable error | session_id=%s next_step=wait_for_health",
                 session_id,
             )
-            return
+            return False
         raise HTTPException(
             status_code=503,
             detail=(
@@ -150,15 +214,21 @@ async def start_ai_assistant_agent(user_id: str, session_id: str) -> None:
         "REST API START SUCCESS - session_id=%s user_id=%s container=%s duration_ms=%s",
         session_id,
         user_id,
-        AI_ASSISTANT_CONTAINER_NAME,
+        container_name,
         duration_ms,
     )
+    return True
 
 
-async def kill_ai_assistant_agent(user_id: str, session_id: str) -> None:
-    """Request the REST API to stop the shared AI Assistant container."""
+async def kill_ai_assistant_agent(
+    user_id: str,
+    session_id: str,
+    *,
+    container_name: str = AI_ASSISTANT_CONTAINER_NAME,
+) -> None:
+    """Request the REST API to stop an AI Assistant container."""
     coerced_user_id = _coerce_user_id(user_id)
-    payload = {"container_name": AI_ASSISTANT_CONTAINER_NAME}
+    payload = {"container_name": container_name}
 
     logger.info(
         "CALLING REST API - KILL DOCKER | url=%s session_id=%s user_id=%s coerced_user_id=%s container=%s payload=%s",
@@ -166,14 +236,14 @@ async def kill_ai_assistant_agent(user_id: str, session_id: str) -> None:
         session_id,
         user_id,
         coerced_user_id,
-        AI_ASSISTANT_CONTAINER_NAME,
+        container_name,
         payload,
     )
     started_at = time.perf_counter()
 
     try:
-        async with httpx.AsyncClient(timeout=20) as client:
-            response = await client.post(AI_ASSISTANT_KILL_API_URL, json=payload)
+        client = await _get_http_client()
+        response = await client.post(AI_ASSISTANT_KILL_API_URL, json=payload, timeout=_timeout(20))
     except httpx.HTTPError as exc:
         duration_ms = round((time.perf_counter() - started_at) * 1000, 1)
         logger.error(
@@ -181,7 +251,7 @@ async def kill_ai_assistant_agent(user_id: str, session_id: str) -> None:
             session_id,
             user_id,
             coerced_user_id,
-            AI_ASSISTANT_CONTAINER_NAME,
+            container_name,
             duration_ms,
             AI_ASSISTANT_KILL_API_URL,
         )
@@ -209,7 +279,7 @@ async def kill_ai_assistant_agent(user_id: str, session_id: str) -> None:
             session_id,
             user_id,
             coerced_user_id,
-            AI_ASSISTANT_CONTAINER_NAME,
+            container_name,
             response.status_code,
             duration_ms,
         )
@@ -236,45 +306,52 @@ async def kill_ai_assistant_agent(user_id: str, session_id: str) -> None:
         "REST API KILL SUCCESS - session_id=%s user_id=%s container=%s duration_ms=%s",
         session_id,
         user_id,
-        AI_ASSISTANT_CONTAINER_NAME,
+        container_name,
         duration_ms,
     )
 
 
-async def wait_for_ai_assistant_health(
+async def wait_for_ai_assistant_ready(
     timeout_seconds: int | None = None,
     poll_interval_seconds: float | None = None,
     *,
     log_timeout: bool = True,
     context: str = "default",
-) -> None:
-    """Wait until the AI Assistant health endpoint responds with HTTP 200."""
+    base_url: str = AI_ASSISTANT_API_URL,
+) -> Dict[str, Any]:
+    """Wait until the AI Assistant can run inferences (LLM loaded) and return its readiness payload."""
     timeout = timeout_seconds or AI_ASSISTANT_HEALTH_TIMEOUT_SECONDS
     interval = poll_interval_seconds or AI_ASSISTANT_POLL_INTERVAL_SECONDS
     loop = asyncio.get_running_loop()
     started_at = time.perf_counter()
     deadline = loop.time() + timeout
-    health_url = f"{AI_ASSISTANT_API_URL}/health"
+    readiness_url = f"{base_url}/ai_assistant/readiness"
     last_error: str | None = None
 
     while loop.time() < deadline:
         try:
-            async with httpx.AsyncClient(timeout=5) as client:
-                response = await client.get(health_url)
-            if response.status_code == 200:
-                return
-            last_error = f"unexpected status code {response.status_code}"
-        except httpx.HTTPError as exc:
-            last_error = str(exc)
+            readiness = await get_ai_assistant_readiness(base_url=base_url)
+        except HTTPException as exc:
+            last_error = str(exc.detail)
+        else:
+            if readiness.get("ready"):
+                return readiness
+            subsystems = readiness.get("subsystems", {})
+            if subsystems.get("llm") == "failed":
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"AI Assistant could not load its inference model (reason=llm_failed, subsystems={subsystems})",
+                )
+            last_error = f"subsystems loading {subsystems}"
 
         await asyncio.sleep(interval)
 
     duration_ms = round((time.perf_counter() - started_at) * 1000, 1)
     if log_timeout:
         logger.error(
-            "AI Assistant health check failed | reason=container_health_timeout context=%s health_url=%s timeout_seconds=%s duration_ms=%s last_error=%s",
+            "AI Assistant readiness check failed | reason=container_ready_timeout context=%s readiness_url=%s timeout_seconds=%s duration_ms=%s last_error=%s",
             context,
-            health_url,
+            readiness_url,
             timeout,
             duration_ms,
             _truncate_for_log(last_error or "unknown error"),
@@ -282,18 +359,41 @@ async def wait_for_ai_assistant_health(
     raise HTTPException(
         status_code=503,
         detail=(
-            "AI Assistant container did not become healthy within the expected time "
-            f"(reason=container_health_timeout, timeout={timeout}s, last_error={last_error or 'unknown error'})"
+            "AI Assistant container did not become ready within the expected time "
+            f"(reason=container_ready_timeout, timeout={timeout}s, last_error={last_error or 'unknown error'})"
         ),
     )
 
 
-async def get_ai_assistant_health() -> Dict[str, Any]:
+async def get_ai_assistant_readiness(base_url: str = AI_ASSISTANT_API_URL) -> Dict[str, Any]:
+    """Return which AI Assistant subsystems are loaded, "ready" meaning inferences can run."""
+    readiness_url = f"{base_url}/ai_assistant/readiness"
+    try:
+        client = await _get_http_client()
+        response = await client.get(readiness_url, timeout=_timeout(5))
+    except httpx.HTTPError as exc:
+        raise HTTPException(
+            status_code=503,
+            detail=f"AI Assistant readiness endpoint unavailable: {exc}",
+        ) from exc
+
+    if response.status_code == 404:
+        # Agents without staged loading only answer once everything is loaded
+        return {"ready": True, "subsystems": {}}
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=503,
+            detail=f"AI Assistant readiness endpoint unavailable (status={response.status_code})",
+        )
+    return response.json()
+
+
+async def get_ai_assistant_health(base_url: str = AI_ASSISTANT_API_URL) -> Dict[str, Any]:
     """Return current health payload from AI Assistant."""
-    health_url = f"{AI_ASSISTANT_API_URL}/health"
+    health_url = f"{base_url}/health"
     try:
-        async with httpx.AsyncClient(timeout=5) as client:
-            response = await client.get(health_url)
+        client = await _get_http_client()
+        response = await client.get(health_url, timeout=_timeout(5))
     except httpx.HTTPError as exc:
         raise HTTPException(
             status_code=503,
@@ -308,12 +408,12 @@ async def get_ai_assistant_health() -> Dict[str, Any]:
     return response.json()
 
 
-async def get_ai_assistant_status() -> str:
+async def get_ai_assistant_status(base_url: str = AI_ASSISTANT_API_URL) -> str:
     """Fetch the current activity status from the AI Assistant agent."""
-    status_url = f"{AI_ASSISTANT_API_URL}/ai_assistant/status"
+    status_url = f"{base_url}/ai_assistant/status"
     try:
-        async with httpx.AsyncClient(timeout=5) as client:
-            response = await client.get(status_url)
+        client = await _get_http_client()
+        response = await client.get(status_url, timeout=_timeout(5))
     except httpx.HTTPError as exc:
         raise HTTPException(
             status_code=503,
@@ -330,11 +430,37 @@ async def get_ai_assistant_status() -> str:
     return str(data.get("status", "")).strip()
 
 
-async def submit_ai_assistant_inference(payload: Dict[str, Any]) -> Dict[str, Any]:
+async def stream_ai_assistant_status(
+    base_url: str = AI_ASSISTANT_API_URL,
+) -> AsyncGenerator[str, None]:
+    """Follow the AI Assistant status stream, yielding every status the agent pushes."""
+    status_stream_url = f"{base_url}/ai_assistant/status/stream"
+    client = await _get_http_client()
+    # The agent sends a heartbeat every 15 s, a longer silence means the connection is dead
+    async with client.stream("GET", status_stream_url, timeout=_timeout(60)) as response:
+        if response.status_code != 200:
+            body = await response.aread()
+            raise HTTPException(
+                status_code=502,
+                detail=f"AI Assistant status stream failed ({response.status_code}): {body.decode()}",
+            )
+        async for line in response.aiter_lines():
+            if not line.strip():
+                continue
+            try:
+                yield str(json.loads(line).get("status", "")).strip()
+            except json.JSONDecodeError:
+                logger.warning("Failed to parse status NDJSON line: %s", line)
+
+
+async def submit_ai_assistant_inference(
+    payload: Dict[str, Any],
+    base_url: str = AI_ASSISTANT_API_URL,
+) -> Dict[str, Any]:
     """Submit an inference request to AI Assistant."""
-    inference_url = f"{AI_ASSISTANT_API_URL}/ai_assistant/inference"
-    async with httpx.AsyncClient(timeout=20) as client:
-        response = await client.post(inference_url, json=payload)
+    inference_url = f"{base_url}/ai_assistant/inference"
+    client = await _get_http_client()
+    response = await client.post(inference_url, json=payload, timeout=_timeout(20))
     if response.status_code != 200:
         raise HTTPException(
             status_code=502,
@@ -345,30 +471,35 @@ async def submit_ai_assistant_inference(payload: Dict[str, Any]) -> Dict[str, An
 
 async def stream_ai_assistant_inference(
     payload: Dict[str, Any],
+    base_url: str = AI_ASSISTANT_API_URL,
 ) -> AsyncGenerator[Dict[str, Any], None]:
     """Stream NDJSON lines from the AI Assistant inference/stream endpoint."""
-    stream_url = f"{AI_ASSISTANT_API_URL}/ai_assistant/inference/stream"
-    async with httpx.AsyncClient(timeout=None) as client:
-        async with client.stream("POST", stream_url, json=payload) as response:
-            if response.status_code != 200:
-                body = await response.aread()
-                raise HTTPException(
-                    status_code=502,
-                    detail=f"AI Assistant stream failed ({response.status_code}): {body.decode()}",
-                )
-            async for line in response.aiter_lines():
-                if line.strip():
-                    try:
-                        yield json.loads(line)
-                    except json.JSONDecodeError:
-                        logger.warning("Failed to parse NDJSON line: %s", line)
-
-
-async def get_ai_assistant_inference(job_id: str) -> Dict[str, Any]:
+    stream_url = f"{base_url}/ai_assistant/inference/stream"
+    client = await _get_http_client()
+    # Tokens may take a long time to come, so only the connection setup is bounded
+    async with client.stream("POST", stream_url, json=payload, timeout=_timeout(None)) as response:
+        if response.status_code != 200:
+            body = await response.aread()
+            raise HTTPException(
+                status_code=502,
+                detail=f"AI Assistant stream failed ({response.status_code}): {body.decode()}",
+            )
+        async for line in response.aiter_lines():
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Failed to parse NDJSON line: %s", line)
+
+
+async def get_ai_assistant_inference(
+    job_id: str,
+    base_url: str = AI_ASSISTANT_API_URL,
+) -> Dict[str, Any]:
     """Get current inference status for a job id."""
-    inference_url = f"{AI_ASSISTANT_API_URL}/ai_assistant/inference/{job_id}"
-    async with httpx.AsyncClient(timeout=10) as client:
-        response = await client.get(inference_url)
+    inference_url = f"{base_url}/ai_assistant/inference/{job_id}"
+    client = await _get_http_client()
+    response = await client.get(inference_url, timeout=_timeout(10))
     if response.status_code != 200:
         raise HTTPException(
             status_code=502,
@@ -381,11 +512,11 @@ async def get_ai_assistant_inference(job_id: str) -> Dict[str, Any]:
     return data
 
 
-async def get_ai_assistant_conversation_summary() -> str:
+async def get_ai_assistant_conversation_summary(base_url: str = AI_ASSISTANT_API_URL) -> str:
     """Fetch the latest conversation summary from AI Assistant."""
-    summary_url = f"{AI_ASSISTANT_API_URL}/ai_assistant/conversation_summary"
-    async with httpx.AsyncClient(timeout=10) as client:
-        response = await client.get(summary_url)
+    summary_url = f"{base_url}/ai_assistant/conversation_summary"
+    client = await _get_http_client()
+    response = await client.get(summary_url, timeout=_timeout(10))
     if response.status_code != 200:
         raise HTTPException(
             status_code=502,
@@ -396,11 +527,13 @@ async def get_ai_assistant_conversation_summary() -> str:
     return str(data.get("conversation_summary", ""))
 
 
-async def get_ai_assistant_available_models() -> Dict[str, Any]:
+async def get_ai_assistant_available_models(
+    base_url: str = AI_ASSISTANT_API_URL,
+) -> Dict[str, Any]:
     """Fetch the current list of available inference models from AI Assistant."""
-    models_url = f"{AI_ASSISTANT_API_URL}/ai_assistant/available_models"
-    async with httpx.AsyncClient(timeout=10) as client:
-        response = await client.get(models_url)
+    models_url = f"{base_url}/ai_assistant/available_models"
+    client = await _get_http_client()
+    response = await client.get(models_url, timeout=_timeout(10))
     if response.status_code != 200:
         raise HTTPException(
             status_code=502,
@@ -409,14 +542,35 @@ async def get_ai_assistant_available_models() -> Dict[str, Any]:
     return response.json()
 
 
-async def get_ai_assistant_collections() -> Dict[str, Any]:
+async def get_ai_assistant_collections(
+    base_url: str = AI_ASSISTANT_API_URL,
+) -> Dict[str, Any]:
     """Fetch the current list of ChromaDB collections from AI Assistant."""
-    collections_url = f"{AI_ASSISTANT_API_URL}/ai_assistant/collections"
-    async with httpx.AsyncClient(timeout=10) as client:
-        response = await client.get(collections_url)
+    collections_url = f"{base_url}/ai_assistant/collections"
+    client = await _get_http_client()
+    response = await client.get(collections_url, timeout=_timeout(10))
     if response.status_code != 200:
         raise HTTPException(
             status_code=502,
             detail=f"AI Assistant collections fetch failed ({response.status_code}): {response.text}",
         )
     return response.json()
+
+
+async def invalidate_ai_assistant_collections(base_url: str = AI_ASSISTANT_API_URL) -> None:
+    """Ask AI Assistant to drop its cached collection list."""
+    invalidate_url = f"{base_url}/ai_assistant/collections/invalidate"
+    try:
+        client = await _get_http_client()
+        response = await client.post(invalidate_url, timeout=_timeout(5))
+    except httpx.HTTPError as exc:
+        raise HTTPException(
+            status_code=503,
+            detail=f"AI Assistant collections invalidation unavailable: {exc}",
+        ) from exc
+
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=502,
+            detail=f"AI Assistant collections invalidation failed ({response.status_code}): {response.text}",
+        )
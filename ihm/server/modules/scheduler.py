@@ -0,0 +1,179 @@
+"""Fair scheduling of inference requests across users."""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a user already has the maximum number of inferences waiting."""
+
+
+@dataclass
+class InferenceTicket:
+    """Place of one inference request in the scheduler."""
+
+    ticket_id: int
+    user_id: str
+    session_id: str
+    enqueued_at: float
+    granted: asyncio.Event = field(default_factory=asyncio.Event)
+    started_at: Optional[float] = None
+    released: bool = False
+
+
+class FairInferenceScheduler:
+    """Admit inferences in per-user round-robin order, with a bound on how many run at once.
+
+    Every user has a FIFO queue. When a slot frees up, the next user in the rotation gets it for
+    their oldest request and moves to the back of the rotation. A user sending many requests
+    therefore only delays others by one request per round.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 1,
+        max_queued_per_user: int = 0,
+        default_duration_seconds: float = 30.0,
+        duration_window: int = 50,
+    ) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        # 0 means no limit on how many requests a user may have waiting
+        self.max_queued_per_user = max_queued_per_user
+        self.default_duration_seconds = default_duration_seconds
+        self._queues: Dict[str, Deque[InferenceTicket]] = {}
+        self._rotation: Deque[str] = deque()
+        self._in_flight: Dict[int, InferenceTicket] = {}
+        self._durations: Deque[float] = deque(maxlen=duration_window)
+        self._ticket_ids = itertools.count(1)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of inferences currently running."""
+        return len(self._in_flight)
+
+    @property
+    def waiting(self) -> int:
+        """Number of inferences waiting for a slot."""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def set_max_concurrency(self, max_concurrency: int) -> None:
+        """Change how many inferences may run at once, granting new slots right away."""
+        self.max_concurrency = max(1, max_concurrency)
+        self._dispatch()
+
+    def enqueue(self, user_id: str, session_id: str) -> InferenceTicket:
+        """Queue an inference for a user, granting it right away when a slot is free."""
+        user_queue = self._queues.get(user_id)
+        if (
+            self.max_queued_per_user > 0
+            and user_queue is not None
+            and len(user_queue) >= self.max_queued_per_user
+        ):
+            raise QueueFullError(
+                f"User {user_id} already has {len(user_queue)} inference(s) waiting"
+            )
+
+        ticket = InferenceTicket(
+            ticket_id=next(self._ticket_ids),
+            user_id=user_id,
+            session_id=session_id,
+            enqueued_at=time.monotonic(),
+        )
+        if user_queue is None:
+            user_queue = self._queues[user_id] = deque()
+            self._rotation.append(user_id)
+        user_queue.append(ticket)
+        self._dispatch()
+        return ticket
+
+    def release(self, ticket: InferenceTicket) -> None:
+        """Free the slot of a finished inference, or drop a request that gave up waiting."""
+        if ticket.released:
+            return
+        ticket.released = True
+
+        if ticket.granted.is_set():
+            self._in_flight.pop(ticket.ticket_id, None)
+            if ticket.started_at is not None:
+                self._durations.append(time.monotonic() - ticket.started_at)
+        else:
+            user_queue = self._queues.get(ticket.user_id)
+            if user_queue is not None and ticket in user_queue:
+                user_queue.remove(ticket)
+                if not user_queue:
+                    del self._queues[ticket.user_id]
+                    self._rotation.remove(ticket.user_id)
+        self._dispatch()
+
+    def position(self, ticket: InferenceTicket) -> int:
+        """Return the 1-based position of a waiting ticket, 0 once it is running."""
+        if ticket.granted.is_set():
+            return 0
+        user_queue = self._queues.get(ticket.user_id)
+        if user_queue is None or ticket not in user_queue:
+            return 0
+
+        # Replay the round-robin: full rounds before the ticket's own, then the users ahead of it
+        rounds = user_queue.index(ticket)
+        user_rank = self._rotation.index(ticket.user_id)
+        ahead = 0
+        for rank, user_id in enumerate(self._rotation):
+            queued = len(self._queues[user_id])
+            ahead += min(queued, rounds)
+            if rank < user_rank and queued > rounds:
+                ahead += 1
+        return ahead + 1
+
+    def estimated_wait_seconds(self, ticket: InferenceTicket) -> Optional[float]:
+        """Estimate the wait of a ticket from the recent inference durations."""
+        position = self.position(ticket)
+        if position == 0:
+            return 0.0
+        average = (
+            sum(self._durations) / len(self._durations)
+            if self._durations
+            else self.default_duration_seconds
+        )
+        # Each wave of max_concurrency requests takes about one average inference
+        return math.ceil(position / self.max_concurrency) * average
+
+    async def wait(self, ticket: InferenceTicket, timeout: float) -> bool:
+        """Wait up to timeout seconds for the ticket to be granted."""
+        try:
+            await asyncio.wait_for(ticket.granted.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return ticket.granted.is_set()
+
+    def _dispatch(self) -> None:
+        """Grant free slots to the next users in the rotation."""
+        while len(self._in_flight) < self.max_concurrency and self._rotation:
+            user_id = self._rotation.popleft()
+            user_queue = self._queues[user_id]
+            ticket = user_queue.popleft()
+            if user_queue:
+                self._rotation.append(user_id)
+            else:
+                del self._queues[user_id]
+
+            ticket.started_at = time.monotonic()
+            self._in_flight[ticket.ticket_id] = ticket
+            ticket.granted.set()
+            logger.info(
+                "INFERENCE SLOT GRANTED - ticket_id=%s user_id=%s session_id=%s waited_ms=%s in_flight=%s waiting=%s",
+                ticket.ticket_id,
+                ticket.user_id,
+                ticket.session_id,
+                round((ticket.started_at - ticket.enqueued_at) * 1000, 1),
+                len(self._in_flight),
+                self.waiting,
+            )
@@ -5,52 +5,137 @@ import asyncio
 import json
 import logging
 import time
-from typing import Any, AsyncGenerator, Dict
+from datetime import datetime
+from typing import Any, AsyncGenerator, Dict, Optional
 
 from fastapi import HTTPException
 
 from ihm.server import state
-from ihm.server.config import SESSION_IDLE_TTL_SECONDS, USE_AI_ASSISTANT
+from ihm.server.config import (
+    AI_ASSISTANT_HEALTH_TIMEOUT_SECONDS,
+    AI_ASSISTANT_POOL_IDLE_SECONDS,
+    AI_ASSISTANT_WARM_END,
+    AI_ASSISTANT_WARM_MODE,
+    AI_ASSISTANT_WARM_START,
+    AI_ASSISTANT_WARM_WEEKDAYS,
+    INFERENCE_MAX_CONCURRENCY,
+    SESSION_IDLE_TTL_SECONDS,
+    SERVICES_READY_TTL_SECONDS,
+    USE_AI_ASSISTANT,
+)
+from ihm.server.modules.agent_pool import AgentInstance
 from ihm.server.modules.rest_api_client import (
+    get_ai_assistant_readiness,
     kill_ai_assistant_agent,
     start_ai_assistant_agent,
-    wait_for_ai_assistant_health,
+    wait_for_ai_assistant_ready,
 )
 
 logger = logging.getLogger(__name__)
 
+# Background start of an extra pool agent, at most one at a time.
+_scale_up_task: Optional[asyncio.Task[None]] = None
+
+
+def _resize_scheduler() -> None:
+    """Admit INFERENCE_MAX_CONCURRENCY inferences per running agent."""
+    state.inference_scheduler.set_max_concurrency(
+        INFERENCE_MAX_CONCURRENCY * max(1, state.agent_pool.running_count)
+    )
+
+
+async def _sync_pool_from_backend() -> None:
+    """Pick up the agent containers started or stopped by the other IHM workers."""
+    if not state.backend.shared:
+        return
+    if state.agent_pool.sync_running(await state.backend.running_containers()):
+        _resize_scheduler()
+        logger.info("POOL SYNCED - running_agents=%s", state.agent_pool.running_count)
+
+
+async def _record_started(agent: AgentInstance) -> None:
+    """Mark an agent as running and healthy, in the shared state first."""
+    await state.backend.set_container_running(agent.container_name, True)
+    state.agent_pool.mark_started(agent, SERVICES_READY_TTL_SECONDS)
+    _resize_scheduler()
+
+
+async def _record_stopped(agent: AgentInstance) -> None:
+    """Mark an agent as stopped, in the shared state first."""
+    await state.backend.set_container_running(agent.container_name, False)
+    state.agent_pool.mark_stopped(agent)
+    _resize_scheduler()
+
 
-async def _container_is_reachable() -> bool:
-    """Quickly check whether the shared AI Assistant container is reachable."""
+async def _container_is_reachable(agent: AgentInstance) -> bool:
+    """Quickly check whether an AI Assistant container is reachable and ready."""
     try:
-        await wait_for_ai_assistant_health(
+        await wait_for_ai_assistant_ready(
             timeout_seconds=8,
             poll_interval_seconds=1.0,
             log_timeout=False,
-            context="quick_reachability_probe",
+            context=f"quick_reachability_probe:{agent.container_name}",
+            base_url=agent.base_url,
         )
+        agent.mark_ready(SERVICES_READY_TTL_SECONDS)
         return True
     except HTTPException:
+        agent.mark_unready()
         return False
 
 
-def _prune_expired_sessions_locked(source: str) -> list[str]:
+async def _probe_agent(agent: AgentInstance) -> bool:
+    """Refresh the cached readiness of one agent with a single readiness request."""
+    if not agent.running:
+        agent.mark_unready()
+        return False
+    try:
+        readiness = await get_ai_assistant_readiness(base_url=agent.base_url)
+        if not readiness.get("ready"):
+            raise HTTPException(
+                status_code=503,
+                detail=f"subsystems loading {readiness.get('subsystems', {})}",
+            )
+    except HTTPException as exc:
+        if agent.is_ready():
+            logger.warning(
+                "READINESS PROBE FAILED - container=%s detail=%s",
+                agent.container_name,
+                exc.detail,
+            )
+        agent.mark_unready()
+        return False
+    agent.mark_ready(SERVICES_READY_TTL_SECONDS)
+    return True
+
+
+async def probe_services_ready() -> bool:
+    """Refresh the cached readiness of every agent, without taking the service lock."""
+    await _sync_pool_from_backend()
+    results = await asyncio.gather(*(_probe_agent(agent) for agent in state.agent_pool.agents))
+    return results[0]
+
+
+async def _prune_expired_sessions_locked(source: str) -> list[str]:
     """Drop idle sessions while already holding the shared service lock."""
-    expired_session_ids = state.expire_idle_sessions(SESSION_IDLE_TTL_SECONDS)
+    await _sync_pool_from_backend()
+    expired_session_ids = await state.expire_idle_sessions(SESSION_IDLE_TTL_SECONDS)
+    state.agent_pool.forget_sessions(expired_session_ids)
     if expired_session_ids:
         logger.warning(
             "EXPIRED_IDLE_SESSIONS - source=%s expired_session_ids=%s remaining_active_sessions=%s",
             source,
             expired_session_ids,
-            state.count_active_sessions(),
+            await state.count_active_sessions(),
         )
     return expired_session_ids
 
 
 async def _adopt_running_container_if_needed(user_id: str, session_id: str, source: str) -> bool:
-    """Reconcile in-memory state with an already running agent discovered via health."""
-    if await _container_is_reachable():
-        state.docker_container_running = True
+    """Reconcile in-memory state with an already running primary agent discovered via health."""
+    primary = state.agent_pool.primary
+    if await _container_is_reachable(primary):
+        await _record_started(primary)
         state.last_user_id = user_id
         logger.warning(
             "RECONCILED_CONTAINER_STATE - source=%s session_id=%s user_id=%s action=adopted_running_agent",
@@ -62,21 +147,212 @@ async def _adopt_running_container_if_needed(user_id: str, session_id: str, sour
     return False
 
 
-async def _start_container_and_wait_ready(user_id: str, session_id: str) -> None:
-    """Start the shared container and wait until health check succeeds."""
+async def _start_container_and_wait_ready(
+    agent: AgentInstance,
+    user_id: str,
+    session_id: str,
+) -> None:
+    """Start an agent container and wait until it can run inferences."""
     started_at = time.perf_counter()
-    await start_ai_assistant_agent(user_id=user_id, session_id=session_id)
-    await wait_for_ai_assistant_health(context=f"start_container:{session_id}")
-    state.docker_container_running = True
+    await start_ai_assistant_agent(
+        user_id=user_id,
+        session_id=session_id,
+        container_name=agent.container_name,
+        host_port=agent.host_port,
+    )
+    await _wait_container_ready(agent, user_id=user_id, session_id=session_id, started_at=started_at)
+
+
+async def _wait_container_ready(
+    agent: AgentInstance,
+    user_id: str,
+    session_id: str,
+    started_at: float,
+) -> None:
+    """Wait until a started agent container can run inferences and record it as running."""
+    readiness = await wait_for_ai_assistant_ready(
+        context=f"start_container:{session_id}",
+        base_url=agent.base_url,
+    )
+    await _record_started(agent)
     state.last_user_id = user_id
     logger.info(
-        "CONTAINER_READY - session_id=%s user_id=%s duration_ms=%s",
+        "CONTAINER_READY - session_id=%s user_id=%s container=%s subsystems=%s running_agents=%s duration_ms=%s",
         session_id,
         user_id,
+        agent.container_name,
+        readiness.get("subsystems", {}),
+        state.agent_pool.running_count,
         round((time.perf_counter() - started_at) * 1000, 1),
     )
 
 
+async def _scale_up(agent: AgentInstance, user_id: str, session_id: str) -> None:
+    """Start an extra pool agent, cleaning it up when it does not become healthy.
+
+    The agent is claimed in the state backend first, so two workers never start the same one.
+    Only a container created by this call is killed on failure.
+    """
+    claimed = False
+    created = False
+    try:
+        async with state.service_lock():
+            await _sync_pool_from_backend()
+            if not agent.running:
+                # Expires on its own if this worker dies while starting the agent
+                claimed = await state.backend.claim_container(
+                    agent.container_name,
+                    AI_ASSISTANT_HEALTH_TIMEOUT_SECONDS + 60,
+                )
+        if not claimed:
+            logger.info(
+                "SCALE UP SKIPPED - container=%s reason=started_by_another_worker",
+                agent.container_name,
+            )
+            return
+
+        started_at = time.perf_counter()
+        created = await start_ai_assistant_agent(
+            user_id=user_id,
+            session_id=session_id,
+            container_name=agent.container_name,
+            host_port=agent.host_port,
+        )
+        await _wait_container_ready(agent, user_id=user_id, session_id=session_id, started_at=started_at)
+    except HTTPException as exc:
+        logger.error(
+            "SCALE UP FAILED - container=%s created=%s detail=%s",
+            agent.container_name,
+            created,
+            exc.detail,
+        )
+        if created:
+            try:
+                await kill_ai_assistant_agent(
+                    user_id=user_id,
+                    session_id=session_id,
+                    container_name=agent.container_name,
+                )
+            except HTTPException as kill_exc:
+                logger.warning(
+                    "SCALE UP CLEANUP FAILED - container=%s detail=%s",
+                    agent.container_name,
+                    kill_exc.detail,
+                )
+    finally:
+        agent.starting = False
+        if claimed:
+            await state.backend.release_container_claim(agent.container_name)
+
+
+def request_scale_up(user_id: str, session_id: str) -> None:
+    """Start the next pool agent in the background when inferences wait and the pool can grow."""
+    global _scale_up_task
+    pool = state.agent_pool
+    if not USE_AI_ASSISTANT or not pool.primary.running or pool.scaling:
+        return
+    agent = pool.next_stopped()
+    if agent is None:
+        return
+
+    agent.starting = True
+    logger.info(
+        "SCALING UP - container=%s host_port=%s running_agents=%s waiting=%s",
+        agent.container_name,
+        agent.host_port,
+        pool.running_count,
+        state.inference_scheduler.waiting,
+    )
+    _scale_up_task = asyncio.create_task(_scale_up(agent, user_id=user_id, session_id=session_id))
+
+
+async def cancel_scale_up() -> None:
+    """Stop waiting for an extra agent being started."""
+    global _scale_up_task
+    if _scale_up_task is not None and not _scale_up_task.done():
+        _scale_up_task.cancel()
+        try:
+            await _scale_up_task
+        except asyncio.CancelledError:
+            pass
+    _scale_up_task = None
+
+
+async def scale_down_idle_agents(idle_seconds: float = AI_ASSISTANT_POOL_IDLE_SECONDS) -> list[str]:
+    """Stop the extra agents that served no request for idle_seconds."""
+    pool = state.agent_pool
+    user_id = state.last_user_id or "1"
+    stopped_containers = []
+    await _sync_pool_from_backend()
+    for agent in pool.idle_agents(idle_seconds):
+        # Out of the routing before the stop, no new inference may reach it
+        await _record_stopped(agent)
+        try:
+            await kill_ai_assistant_agent(
+                user_id=user_id,
+                session_id="idle-scale-down",
+                container_name=agent.container_name,
+            )
+        except HTTPException as exc:
+            logger.warning(
+                "SCALE DOWN FAILED - container=%s detail=%s",
+                agent.container_name,
+                exc.detail,
+            )
+            await _record_started(agent)
+            continue
+        stopped_containers.append(agent.container_name)
+
+    if stopped_containers:
+        logger.info(
+            "SCALED DOWN - containers=%s running_agents=%s",
+            stopped_containers,
+            pool.running_count,
+        )
+    return stopped_containers
+
+
+def warm_window_active(now: Optional[datetime] = None) -> bool:
+    """Return whether AI_ASSISTANT_WARM_MODE keeps the primary agent running now, with or without sessions."""
+    if AI_ASSISTANT_WARM_MODE == "always":
+        return True
+    if AI_ASSISTANT_WARM_MODE != "business_hours":
+        return False
+    now = now or datetime.now()
+    if now.weekday() not in AI_ASSISTANT_WARM_WEEKDAYS:
+        return False
+    current_time = now.time()
+    if AI_ASSISTANT_WARM_START <= AI_ASSISTANT_WARM_END:
+        return AI_ASSISTANT_WARM_START <= current_time < AI_ASSISTANT_WARM_END
+    # Window over midnight, e.g. 22:00-06:00
+    return current_time >= AI_ASSISTANT_WARM_START or current_time < AI_ASSISTANT_WARM_END
+
+
+async def keep_agent_warm() -> bool:
+    """Start the primary agent ahead of the first session while the warm window is open."""
+    if not USE_AI_ASSISTANT or not warm_window_active():
+        return False
+    primary = state.agent_pool.primary
+    if primary.running:
+        return False
+
+    user_id = state.last_user_id or "1"
+    session_id = "warm-up"
+    async with state.service_lock():
+        await _sync_pool_from_backend()
+        if primary.running:
+            return False
+        logger.info("WARMING UP - mode=%s container=%s", AI_ASSISTANT_WARM_MODE, primary.container_name)
+        if await _adopt_running_container_if_needed(
+            user_id=user_id,
+            session_id=session_id,
+            source="warm_up",
+        ):
+            return True
+        await _start_container_and_wait_ready(primary, user_id=user_id, session_id=session_id)
+        return True
+
+
 async def start_services_if_needed(user_id: str, session_id: str) -> None:
     """Start shared AI Assistant services if they are not running yet."""
     logger.info(
@@ -89,17 +365,18 @@ async def start_services_if_needed(user_id: str, session_id: str) -> None:
         logger.info("SKIPPING start; USE_AI_ASSISTANT is False")
         return
 
-    async with state.service_lock:
-        _prune_expired_sessions_locked(source="start_services_if_needed")
+    async with state.service_lock():
+        await _prune_expired_sessions_locked(source="start_services_if_needed")
 
-        if state.docker_container_running:
-            if await _container_is_reachable():
+        primary = state.agent_pool.primary
+        if primary.running:
+            if await _container_is_reachable(primary):
                 logger.info("SKIPPING start; shared AI Assistant container is already running")
                 return
             logger.warning(
                 "Shared container state is stale (flag=true, health unreachable). Restarting..."
             )
-            state.docker_container_running = False
+            await _record_stopped(primary)
 
         if await _adopt_running_container_if_needed(
             user_id=user_id,
@@ -108,7 +385,7 @@ async def start_services_if_needed(user_id: str, session_id: str) -> None:
         ):
             return
 
-        await _start_container_and_wait_ready(user_id=user_id, session_id=session_id)
+        await _start_container_and_wait_ready(primary, user_id=user_id, session_id=session_id)
         logger.info("SERVICES STARTED - shared container ready")
 
 
@@ -126,19 +403,29 @@ async def shutdown_services_if_idle(
         trigger,
     )
 
-    async with state.service_lock:
-        _prune_expired_sessions_locked(source=f"shutdown:{trigger}")
+    async with state.service_lock():
+        await _prune_expired_sessions_locked(source=f"shutdown:{trigger}")
 
-        if state.active_sessions:
+        active_sessions = await state.count_active_sessions()
+        if active_sessions:
             log_method = logger.debug if trigger == "background_sweep" else logger.info
             log_method(
                 "SKIPPING shutdown; active sessions still present (%s) trigger=%s",
-                state.count_active_sessions(),
+                active_sessions,
                 trigger,
             )
             return False
 
-        if not state.docker_container_running:
+        if trigger != "lifespan_shutdown" and warm_window_active():
+            log_method = logger.debug if trigger == "background_sweep" else logger.info
+            log_method(
+                "SKIPPING shutdown; keeping the agent warm (mode=%s) trigger=%s",
+                AI_ASSISTANT_WARM_MODE,
+                trigger,
+            )
+            return False
+
+        if not state.agent_pool.primary.running:
             if not await _adopt_running_container_if_needed(
                 user_id=user_id,
                 session_id=session_id,
@@ -151,12 +438,25 @@ async def shutdown_services_if_idle(
                 )
                 return False
 
+        # An agent still starting may already have a container
+        agents_to_stop = [
+            agent for agent in state.agent_pool.agents if agent.running or agent.starting
+        ]
+        await cancel_scale_up()
         try:
-            await kill_ai_assistant_agent(user_id=user_id, session_id=session_id)
+            for agent in agents_to_stop:
+                try:
+                    await kill_ai_assistant_agent(
+                        user_id=user_id,
+                        session_id=session_id,
+                        container_name=agent.container_name,
+                    )
+                finally:
+                    await _record_stopped(agent)
         finally:
-            state.docker_container_running = False
+            _resize_scheduler()
 
-        logger.info("SERVICES STOPPED - shared container stopped")
+        logger.info("SERVICES STOPPED - shared containers stopped")
         return True
 
 
@@ -168,17 +468,28 @@ async def ensure_services_ready(user_id: str, session_id: str) -> None:
         logger.info("SKIPPING readiness check; USE_AI_ASSISTANT is False")
         return
 
-    async with state.service_lock:
-        _prune_expired_sessions_locked(source="ensure_services_ready")
+    primary = state.agent_pool.primary
+    # Fast path: the container was seen healthy recently, no network I/O and no lock
+    if primary.is_ready():
+        logger.info("SERVICES READY - cached readiness")
+        return
+
+    async with state.service_lock():
+        await _prune_expired_sessions_locked(source="ensure_services_ready")
+
+        # Another request may have started or checked the container while this one waited for the lock
+        if primary.is_ready():
+            logger.info("SERVICES READY - cached readiness")
+            return
 
-        if state.docker_container_running:
-            if await _container_is_reachable():
+        if primary.running:
+            if await _container_is_reachable(primary):
                 logger.info("SERVICES READY - shared container healthy")
                 return
             logger.warning(
                 "Shared container state is stale during inference (flag=true, health unreachable). Restarting..."
             )
-            state.docker_container_running = False
+            await _record_stopped(primary)
 
         if await _adopt_running_container_if_needed(
             user_id=user_id,
@@ -188,26 +499,29 @@ async def ensure_services_ready(user_id: str, session_id: str) -> None:
             logger.info("SERVICES READY - adopted existing healthy agent")
             return
 
-        await _start_container_and_wait_ready(user_id=user_id, session_id=session_id)
+        await _start_container_and_wait_ready(primary, user_id=user_id, session_id=session_id)
         logger.info("SERVICES READY - shared container healthy")
 
 
 async def sweep_idle_sessions(source: str = "background_sweep") -> list[str]:
-    """Expire idle sessions and stop the shared container when nothing is active."""
+    """Expire idle sessions, then stop every container when nothing is active (and the agent need not stay
+    warm) or only the idle extra ones."""
     should_shutdown = False
     session_id = f"idle-sweep:{source}"
     user_id = state.last_user_id or "1"
 
-    async with state.service_lock:
-        expired_session_ids = _prune_expired_sessions_locked(source=source)
-        should_shutdown = not state.active_sessions
+    async with state.service_lock():
+        expired_session_ids = await _prune_expired_sessions_locked(source=source)
+        should_shutdown = not await state.count_active_sessions()
 
-    if should_shutdown:
+    if should_shutdown and not warm_window_active():
         await shutdown_services_if_idle(
             session_id=session_id,
             user_id=user_id,
             trigger=source,
         )
+    else:
+        await scale_down_idle_agents()
 
     return expired_session_ids
 
@@ -0,0 +1,505 @@
+"""Storage of the runtime state shared by the IHM server workers."""
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, TypedDict
+
+
+class SessionRecord(TypedDict):
+    """Runtime metadata for a browser session tracked by the backend."""
+
+    user_id: str
+    created_at: float
+    last_seen_at: float
+    last_source: str
+
+
+class StateBackend(ABC):
+    """Sessions, running containers and the lifecycle lock of the IHM server.
+
+    The in-memory backend only serves one worker. The SQLite and Redis backends keep the same
+    state outside the process, so several uvicorn workers agree on the session count and on
+    which agent containers run.
+    """
+
+    # Whether other processes see the same state
+    shared = False
+
+    @abstractmethod
+    def lock(self):
+        """Return an async context manager serializing container lifecycle operations."""
+
+    @abstractmethod
+    async def register_session(self, session_id: str, user_id: str, source: str) -> SessionRecord:
+        """Create or refresh a tracked session entry."""
+
+    @abstractmethod
+    async def get_session(self, session_id: str) -> Optional[SessionRecord]:
+        """Return a tracked session, None when unknown."""
+
+    @abstractmethod
+    async def save_session(self, session_id: str, record: SessionRecord) -> None:
+        """Store a session entry as is, its last_seen_at being the most recent of all sessions."""
+
+    @abstractmethod
+    async def remove_session(self, session_id: str) -> Optional[SessionRecord]:
+        """Remove a tracked session and return it."""
+
+    @abstractmethod
+    async def count_sessions(self, user_id: Optional[str] = None) -> int:
+        """Count tracked sessions, optionally filtered by user id."""
+
+    @abstractmethod
+    async def expire_idle_sessions(self, idle_ttl_seconds: float) -> list[str]:
+        """Drop sessions idle for at least idle_ttl_seconds and return their ids."""
+
+    @abstractmethod
+    async def clear_sessions(self) -> None:
+        """Drop every tracked session."""
+
+    @abstractmethod
+    async def running_containers(self) -> Dict[str, float]:
+        """Return the agent containers recorded as running, with the wall-clock time of their last use."""
+
+    @abstractmethod
+    async def set_container_running(self, container_name: str, running: bool) -> None:
+        """Record whether an agent container runs."""
+
+    @abstractmethod
+    async def touch_container(self, container_name: str) -> None:
+        """Record that a running agent container just served a request."""
+
+    @abstractmethod
+    async def claim_container(self, container_name: str, ttl_seconds: float) -> bool:
+        """Reserve the start of an agent container for ttl_seconds, False when another worker holds it."""
+
+    @abstractmethod
+    async def release_container_claim(self, container_name: str) -> None:
+        """Drop the start reservation of an agent container."""
+
+    async def close(self) -> None:
+        """Release the resources of the backend."""
+
+
+def _new_record(existing: Optional[SessionRecord], user_id: str, source: str) -> SessionRecord:
+    """Build the record of a session seen now, keeping its creation time."""
+    now = time.time()
+    return {
+        "user_id": user_id,
+        "created_at": existing["created_at"] if existing else now,
+        "last_seen_at": now,
+        "last_source": source,
+    }
+
+
+class MemoryStateBackend(StateBackend):
+    """State kept in the worker memory (single worker).
+
+    Sessions are ordered from the least to the most recently seen and counted per user, so
+    counting is constant time and expiry only visits the sessions it drops.
+    """
+
+    def __init__(self) -> None:
+        self._lock = asyncio.Lock()
+        self._sessions: OrderedDict[str, SessionRecord] = OrderedDict()
+        self._user_session_counts: Dict[str, int] = {}
+        self._containers: Dict[str, float] = {}
+        # Start reservations, as wall-clock expiry by container name
+        self._claims: Dict[str, float] = {}
+
+    def lock(self):
+        return self._lock
+
+    def _count_user(self, user_id: str, delta: int) -> None:
+        """Add delta to the session count of a user, dropping users left without sessions."""
+        count = self._user_session_counts.get(user_id, 0) + delta
+        if count > 0:
+            self._user_session_counts[user_id] = count
+        else:
+            self._user_session_counts.pop(user_id, None)
+
+    async def register_session(self, session_id: str, user_id: str, source: str) -> SessionRecord:
+        record = _new_record(self._sessions.get(session_id), user_id, source)
+        await self.save_session(session_id, record)
+        return record
+
+    async def get_session(self, session_id: str) -> Optional[SessionRecord]:
+        record = self._sessions.get(session_id)
+        # A copy, the user counts must see the user change in save_session
+        return record.copy() if record else None
+
+    async def save_session(self, session_id: str, record: SessionRecord) -> None:
+        previous = self._sessions.get(session_id)
+        if previous is None or previous["user_id"] != record["user_id"]:
+            if previous is not None:
+                self._count_user(previous["user_id"], -1)
+            self._count_user(record["user_id"], 1)
+        self._sessions[session_id] = record
+        self._sessions.move_to_end(session_id)
+
+    async def remove_session(self, session_id: str) -> Optional[SessionRecord]:
+        record = self._sessions.pop(session_id, None)
+        if record is not None:
+            self._count_user(record["user_id"], -1)
+        return record
+
+    async def count_sessions(self, user_id: Optional[str] = None) -> int:
+        if user_id is None:
+            return len(self._sessions)
+        return self._user_session_counts.get(user_id, 0)
+
+    async def expire_idle_sessions(self, idle_ttl_seconds: float) -> list[str]:
+        threshold = time.time() - idle_ttl_seconds
+        expired_session_ids = []
+        while self._sessions:
+            session_id, record = next(iter(self._sessions.items()))
+            if record["last_seen_at"] > threshold:
+                break
+            self._sessions.popitem(last=False)
+            self._count_user(record["user_id"], -1)
+            expired_session_ids.append(session_id)
+        return expired_session_ids
+
+    async def clear_sessions(self) -> None:
+        self._sessions.clear()
+        self._user_session_counts.clear()
+
+    async def running_containers(self) -> Dict[str, float]:
+        return dict(self._containers)
+
+    async def set_container_running(self, container_name: str, running: bool) -> None:
+        if running:
+            self._containers[container_name] = time.time()
+        else:
+            self._containers.pop(container_name, None)
+
+    async def touch_container(self, container_name: str) -> None:
+        if container_name in self._containers:
+            self._containers[container_name] = time.time()
+
+    async def claim_container(self, container_name: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        if self._claims.get(container_name, 0.0) > now:
+            return False
+        self._claims[container_name] = now + ttl_seconds
+        return True
+
+    async def release_container_claim(self, container_name: str) -> None:
+        self._claims.pop(container_name, None)
+
+
+class SQLiteStateBackend(StateBackend):
+    """State kept in a SQLite file, with a file lock shared by the workers of one machine."""
+
+    shared = True
+
+    def __init__(self, path: str, lock_poll_seconds: float = 0.05) -> None:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.lock_poll_seconds = lock_poll_seconds
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, created_at REAL NOT NULL, "
+                "last_seen_at REAL NOT NULL, last_source TEXT NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_user_id ON sessions (user_id)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_last_seen_at ON sessions (last_seen_at)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS containers "
+                "(container_name TEXT PRIMARY KEY, last_used_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS container_claims "
+                "(container_name TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+            )
+        # Queries run in worker threads so a busy database never stalls the event loop,
+        # the connection is shared by those threads one call at a time
+        self._connection_lock = threading.Lock()
+        self._lock_file = open(f"{path}.lock", "a+")
+        # The file lock is per process, tasks of this worker queue on the asyncio lock first
+        self._local_lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def lock(self) -> AsyncIterator[None]:
+        async with self._local_lock:
+            # Polled so a cancelled request never leaves a thread waiting for the lock
+            while True:
+                try:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(self.lock_poll_seconds)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _record(row: Any) -> SessionRecord:
+        """Convert a sessions row into a session record."""
+        return {
+            "user_id": row[0],
+            "created_at": row[1],
+            "last_seen_at": row[2],
+            "last_source": row[3],
+        }
+
+    def _fetch(self, sql: str, params: tuple = ()) -> list[Any]:
+        """Run a query on the shared connection and return its rows."""
+        with self._connection_lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    def _write(self, *statements: tuple[str, tuple]) -> int:
+        """Run statements in one transaction and return the rows changed by the last one."""
+        with self._connection_lock, self._connection:
+            rowcount = 0
+            for sql, params in statements:
+                rowcount = self._connection.execute(sql, params).rowcount
+            return rowcount
+
+    async def register_session(self, session_id: str, user_id: str, source: str) -> SessionRecord:
+        record = _new_record(await self.get_session(session_id), user_id, source)
+        await self.save_session(session_id, record)
+        return record
+
+    async def get_session(self, session_id: str) -> Optional[SessionRecord]:
+        rows = await asyncio.to_thread(
+            self._fetch,
+            "SELECT user_id, created_at, last_seen_at, last_source FROM sessions WHERE session_id = ?",
+            (session_id,),
+        )
+        return self._record(rows[0]) if rows else None
+
+    async def save_session(self, session_id: str, record: SessionRecord) -> None:
+        await asyncio.to_thread(
+            self._write,
+            (
+                "INSERT OR REPLACE INTO sessions "
+                "(session_id, user_id, created_at, last_seen_at, last_source) VALUES (?, ?, ?, ?, ?)",
+                (
+                    session_id,
+                    record["user_id"],
+                    record["created_at"],
+                    record["last_seen_at"],
+                    record["last_source"],
+                ),
+            ),
+        )
+
+    async def remove_session(self, session_id: str) -> Optional[SessionRecord]:
+        record = await self.get_session(session_id)
+        if record is not None:
+            await asyncio.to_thread(
+                self._write, ("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            )
+        return record
+
+    async def count_sessions(self, user_id: Optional[str] = None) -> int:
+        if user_id is None:
+            rows = await asyncio.to_thread(self._fetch, "SELECT COUNT(*) FROM sessions")
+        else:
+            rows = await asyncio.to_thread(
+                self._fetch, "SELECT COUNT(*) FROM sessions WHERE user_id = ?", (user_id,)
+            )
+        return int(rows[0][0])
+
+    async def expire_idle_sessions(self, idle_ttl_seconds: float) -> list[str]:
+        threshold = time.time() - idle_ttl_seconds
+        # Both statements range over the last_seen_at index, most calls find nothing and write nothing
+        rows = await asyncio.to_thread(
+            self._fetch, "SELECT session_id FROM sessions WHERE last_seen_at <= ?", (threshold,)
+        )
+        if rows:
+            await asyncio.to_thread(
+                self._write, ("DELETE FROM sessions WHERE last_seen_at <= ?", (threshold,))
+            )
+        return [row[0] for row in rows]
+
+    async def clear_sessions(self) -> None:
+        await asyncio.to_thread(self._write, ("DELETE FROM sessions", ()))
+
+    async def running_containers(self) -> Dict[str, float]:
+        rows = await asyncio.to_thread(
+            self._fetch, "SELECT container_name, last_used_at FROM containers"
+        )
+        return {row[0]: row[1] for row in rows}
+
+    async def set_container_running(self, container_name: str, running: bool) -> None:
+        if running:
+            statement = (
+                "INSERT OR REPLACE INTO containers (container_name, last_used_at) VALUES (?, ?)",
+                (container_name, time.time()),
+            )
+        else:
+            statement = ("DELETE FROM containers WHERE container_name = ?", (container_name,))
+        await asyncio.to_thread(self._write, statement)
+
+    async def touch_container(self, container_name: str) -> None:
+        await asyncio.to_thread(
+            self._write,
+            (
+                "UPDATE containers SET last_used_at = ? WHERE container_name = ?",
+                (time.time(), container_name),
+            ),
+        )
+
+    async def claim_container(self, container_name: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        inserted = await asyncio.to_thread(
+            self._write,
+            (
+                "DELETE FROM container_claims WHERE container_name = ? AND expires_at <= ?",
+                (container_name, now),
+            ),
+            (
+                "INSERT OR IGNORE INTO container_claims (container_name, expires_at) VALUES (?, ?)",
+                (container_name, now + ttl_seconds),
+            ),
+        )
+        return inserted == 1
+
+    async def release_container_claim(self, container_name: str) -> None:
+        await asyncio.to_thread(
+            self._write, ("DELETE FROM container_claims WHERE container_name = ?", (container_name,))
+        )
+
+    async def close(self) -> None:
+        with self._connection_lock:
+            self._connection.close()
+        self._lock_file.close()
+
+
+class RedisStateBackend(StateBackend):
+    """State kept in Redis (or any server speaking its protocol), shared by workers on several machines."""
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = "ihm", lock_timeout_seconds: float = 300.0) -> None:
+        import redis.asyncio as redis
+
+        self.url = url
+        self.prefix = prefix
+        self.lock_timeout_seconds = lock_timeout_seconds
+        self._client = redis.from_url(url, decode_responses=True)
+        # Session records, a sorted set of their last_seen_at and the session count of each user
+        self._sessions_key = f"{prefix}:sessions"
+        self._last_seen_key = f"{prefix}:sessions:last_seen"
+        self._user_counts_key = f"{prefix}:sessions:users"
+        self._containers_key = f"{prefix}:containers"
+
+    def lock(self):
+        # Expires on its own if the holder dies, so it must outlast the longest container start
+        return self._client.lock(f"{self.prefix}:service_lock", timeout=self.lock_timeout_seconds)
+
+    async def register_session(self, session_id: str, user_id: str, source: str) -> SessionRecord:
+        record = _new_record(await self.get_session(session_id), user_id, source)
+        await self.save_session(session_id, record)
+        return record
+
+    async def get_session(self, session_id: str) -> Optional[SessionRecord]:
+        value = await self._client.hget(self._sessions_key, session_id)
+        return json.loads(value) if value else None
+
+    async def save_session(self, session_id: str, record: SessionRecord) -> None:
+        previous = await self.get_session(session_id)
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.hset(self._sessions_key, session_id, json.dumps(record))
+            pipe.zadd(self._last_seen_key, {session_id: record["last_seen_at"]})
+            if previous is None or previous["user_id"] != record["user_id"]:
+                if previous is not None:
+                    pipe.hincrby(self._user_counts_key, previous["user_id"], -1)
+                pipe.hincrby(self._user_counts_key, record["user_id"], 1)
+            await pipe.execute()
+
+    async def _drop_sessions(self, session_ids: list[str], user_ids: list[str]) -> None:
+        """Remove sessions from the records and the last seen index, and count them out of their users."""
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.hdel(self._sessions_key, *session_ids)
+            pipe.zrem(self._last_seen_key, *session_ids)
+            for user_id in user_ids:
+                pipe.hincrby(self._user_counts_key, user_id, -1)
+            await pipe.execute()
+
+    async def remove_session(self, session_id: str) -> Optional[SessionRecord]:
+        record = await self.get_session(session_id)
+        if record is not None:
+            await self._drop_sessions([session_id], [record["user_id"]])
+        return record
+
+    async def count_sessions(self, user_id: Optional[str] = None) -> int:
+        if user_id is None:
+            return int(await self._client.hlen(self._sessions_key))
+        return max(0, int(await self._client.hget(self._user_counts_key, user_id) or 0))
+
+    async def expire_idle_sessions(self, idle_ttl_seconds: float) -> list[str]:
+        threshold = time.time() - idle_ttl_seconds
+        expired_session_ids = await self._client.zrangebyscore(self._last_seen_key, "-inf", threshold)
+        if not expired_session_ids:
+            return []
+        values = await self._client.hmget(self._sessions_key, expired_session_ids)
+        await self._drop_sessions(
+            expired_session_ids,
+            [json.loads(value)["user_id"] for value in values if value],
+        )
+        return expired_session_ids
+
+    async def clear_sessions(self) -> None:
+        await self._client.delete(self._sessions_key, self._last_seen_key, self._user_counts_key)
+
+    async def running_containers(self) -> Dict[str, float]:
+        values = await self._client.hgetall(self._containers_key)
+        return {container_name: float(value) for container_name, value in values.items()}
+
+    async def set_container_running(self, container_name: str, running: bool) -> None:
+        if running:
+            await self._client.hset(self._containers_key, container_name, time.time())
+        else:
+            await self._client.hdel(self._containers_key, container_name)
+
+    async def touch_container(self, container_name: str) -> None:
+        if await self._client.hexists(self._containers_key, container_name):
+            await self._client.hset(self._containers_key, container_name, time.time())
+
+    async def claim_container(self, container_name: str, ttl_seconds: float) -> bool:
+        return bool(
+            await self._client.set(
+                f"{self.prefix}:claims:{container_name}", 1, nx=True, ex=max(1, int(ttl_seconds))
+            )
+        )
+
+    async def release_container_claim(self, container_name: str) -> None:
+        await self._client.delete(f"{self.prefix}:claims:{container_name}")
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def create_state_backend(
+    kind: str,
+    sqlite_path: str,
+    redis_url: str,
+    lock_timeout_seconds: float,
+) -> StateBackend:
+    """Build the state backend selected by STATE_BACKEND."""
+    if kind == "sqlite":
+        return SQLiteStateBackend(sqlite_path)
+    if kind == "redis":
+        return RedisStateBackend(redis_url, lock_timeout_seconds=lock_timeout_seconds)
+    return MemoryStateBackend()
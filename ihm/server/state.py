@@ -1,33 +1,58 @@
 from __future__ import annotations
 
 """Shared runtime state for the FastAPI server."""
-import asyncio
 import time
-from typing import Dict, Optional, TypedDict
-
-
-class SessionRecord(TypedDict):
-    """Runtime metadata for a browser session tracked by the backend."""
-
-    user_id: str
-    created_at: float
-    last_seen_at: float
-    last_source: str
-
-
-# Maps session_id -> session metadata.
-active_sessions: Dict[str, SessionRecord] = {}
-
-# Global flag: we keep a single AI Assistant container for all sessions.
-docker_container_running: bool = False
-
-# Serializes container lifecycle operations across concurrent requests.
-service_lock = asyncio.Lock()
+from typing import Any, Dict, Optional, Tuple
+
+from ihm.server.config import (
+    AI_ASSISTANT_API_URL,
+    AI_ASSISTANT_CONTAINER_NAME,
+    AI_ASSISTANT_POOL_MAX_SIZE,
+    INFERENCE_DEFAULT_DURATION_SECONDS,
+    INFERENCE_MAX_CONCURRENCY,
+    INFERENCE_MAX_QUEUED_PER_USER,
+    STATE_BACKEND,
+    STATE_LOCK_TIMEOUT_SECONDS,
+    STATE_REDIS_URL,
+    STATE_SQLITE_PATH,
+)
+from ihm.server.modules.agent_pool import AgentPool
+from ihm.server.modules.scheduler import FairInferenceScheduler
+from ihm.server.modules.state_backend import SessionRecord, create_state_backend
+
+# Sessions, running containers and the lifecycle lock, shared by the workers unless STATE_BACKEND=memory.
+backend = create_state_backend(
+    STATE_BACKEND,
+    sqlite_path=STATE_SQLITE_PATH,
+    redis_url=STATE_REDIS_URL,
+    lock_timeout_seconds=STATE_LOCK_TIMEOUT_SECONDS,
+)
+
+# AI Assistant containers shared by all sessions; the primary one runs while any session is active.
+agent_pool = AgentPool(
+    base_url=AI_ASSISTANT_API_URL,
+    container_name=AI_ASSISTANT_CONTAINER_NAME,
+    max_size=AI_ASSISTANT_POOL_MAX_SIZE,
+    max_concurrency=INFERENCE_MAX_CONCURRENCY,
+)
+
+# Admits inferences in per-user round-robin order, up to the capacity of the running agents.
+inference_scheduler = FairInferenceScheduler(
+    max_concurrency=INFERENCE_MAX_CONCURRENCY,
+    max_queued_per_user=INFERENCE_MAX_QUEUED_PER_USER,
+    default_duration_seconds=INFERENCE_DEFAULT_DURATION_SECONDS,
+)
+
+# Last user seen by this worker, only used to label container operations.
+last_user_id: Optional[str] = None
 
-# Guards inferences to avoid context/status collisions in the shared container.
-inference_lock = asyncio.Lock()
+# Collection list served to the browser, as (monotonic expiry, collections payload).
+collections_cache: Optional[Tuple[float, Dict[str, Any]]] = None
 
-last_user_id: Optional[str] = None
+# Latest status pushed by the primary agent to the status listener (AI_ASSISTANT_STATUS_MODE=push).
+ai_assistant_status: str = ""
+ai_assistant_status_updated_at: float = 0.0
+ai_assistant_status_connected: bool = False
 
 
 def now_timestamp() -> float:
@@ -35,34 +60,31 @@ def now_timestamp() -> float:
     return time.time()
 
 
-def register_session(session_id: str, user_id: str, source: str) -> SessionRecord:
+def service_lock():
+    """Serialize container lifecycle operations across requests and workers."""
+    return backend.lock()
+
+
+async def register_session(session_id: str, user_id: str, source: str) -> SessionRecord:
     """Create or refresh a tracked session entry."""
-    now = now_timestamp()
-    existing = active_sessions.get(session_id)
-    record: SessionRecord = {
-        "user_id": user_id,
-        "created_at": existing["created_at"] if existing else now,
-        "last_seen_at": now,
-        "last_source": source,
-    }
-    active_sessions[session_id] = record
+    record = await backend.register_session(session_id=session_id, user_id=user_id, source=source)
 
     global last_user_id
     last_user_id = user_id
     return record
 
 
-def touch_session(
+async def touch_session(
     session_id: str,
     source: str,
     user_id: Optional[str] = None,
 ) -> Optional[SessionRecord]:
     """Refresh last-seen metadata for a session, creating it when user_id is provided."""
-    existing = active_sessions.get(session_id)
+    existing = await backend.get_session(session_id)
     if existing is None:
         if user_id is None:
             return None
-        return register_session(session_id=session_id, user_id=user_id, source=source)
+        return await register_session(session_id=session_id, user_id=user_id, source=source)
 
     existing["last_seen_at"] = now_timestamp()
     existing["last_source"] = source
@@ -70,29 +92,51 @@ def touch_session(
         existing["user_id"] = user_id
         global last_user_id
         last_user_id = user_id
+    await backend.save_session(session_id, existing)
     return existing
 
 
-def remove_session(session_id: str) -> Optional[SessionRecord]:
+def cache_collections(collections: Dict[str, Any], ttl_seconds: float) -> None:
+    """Serve the collection list from memory for the next ttl_seconds."""
+    global collections_cache
+    collections_cache = (time.monotonic() + ttl_seconds, collections)
+
+
+def cached_collections() -> Optional[Dict[str, Any]]:
+    """Return the cached collection list, None when missing or expired."""
+    if collections_cache is None or time.monotonic() >= collections_cache[0]:
+        return None
+    return collections_cache[1]
+
+
+def invalidate_collections_cache() -> None:
+    """Drop the cached collection list."""
+    global collections_cache
+    collections_cache = None
+
+
+def set_ai_assistant_status(status: str) -> None:
+    """Cache the latest status pushed by the AI Assistant agent."""
+    global ai_assistant_status, ai_assistant_status_updated_at
+    ai_assistant_status = status
+    ai_assistant_status_updated_at = now_timestamp()
+
+
+async def remove_session(session_id: str) -> Optional[SessionRecord]:
     """Remove a tracked session from runtime state."""
-    return active_sessions.pop(session_id, None)
+    return await backend.remove_session(session_id)
 
 
-def count_active_sessions(user_id: Optional[str] = None) -> int:
+async def count_active_sessions(user_id: Optional[str] = None) -> int:
     """Count tracked sessions, optionally filtered by user id."""
-    if user_id is None:
-        return len(active_sessions)
-    return sum(1 for session_data in active_sessions.values() if session_data["user_id"] == user_id)
+    return await backend.count_sessions(user_id=user_id)
 
 
-def expire_idle_sessions(idle_ttl_seconds: int) -> list[str]:
+async def expire_idle_sessions(idle_ttl_seconds: int) -> list[str]:
     """Drop sessions that have been idle for at least the configured TTL."""
-    now = now_timestamp()
-    expired_session_ids = [
-        session_id
-        for session_id, session_data in active_sessions.items()
-        if now - session_data["last_seen_at"] >= idle_ttl_seconds
-    ]
-    for session_id in expired_session_ids:
-        active_sessions.pop(session_id, None)
-    return expired_session_ids
+    return await backend.expire_idle_sessions(idle_ttl_seconds)
+
+
+async def clear_sessions() -> None:
+    """Drop every tracked session."""
+    await backend.clear_sessions()
@@ -20,10 +20,11 @@ def start_ai_assistant_agent_docker():
         return jsonify({"error": "Invalid input data", "details": e.errors()}), 400
 
     # Call the docker with the provided parameters
+    host_port = input_data.host_port or input_data.port
     try:
         command = [
             "docker", "run", "-d",
-            "-p", "8001:8001",
+            "-p", f"{host_port}:{input_data.port}",
             "--name", input_data.container_name,
             "ai_assistant_image",
             f"--port={input_data.port}",
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel
 
 
@@ -8,6 +9,8 @@ class AiAssistantInputData(BaseModel):
         BaseModel: _BaseModel_ from pydantic library.
     """
     port: int
+    # Port published on the host, defaults to the agent port. Distinct ports let several agents run side by side
+    host_port: Optional[int] = None
     db_ip_address: str
     inference_model_name: str
     container_name: str